@@ -5,15 +5,20 @@ A FastAPI backend for generating company leads with web scraping enhancement.
 Author: Senior Backend Engineer
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, ValidationError, validator
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 import uvicorn
 import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
+import uuid
 from enum import Enum
 import logging
 
@@ -29,8 +34,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from generate_health_insurance import GeminiClient
-from web_scraper import scrape_company_data
-from email_sender import get_email_sender
+from lead_generation import generate_leads_sync, lead_generation_error, validate_api_key
+from web_scraper import scrape_company_stream
+from email_sender import OutboundEmail, get_email_sender
+from email_attachments import (
+    EMAIL_MAX_ATTACHMENTS_BYTES, MAX_FORM_FIELD_BYTES, Attachment, AttachmentLimits, AttachmentTooLarge,
+    decode_attachment, parse_multipart_form
+)
+from job_store import JobProgress, get_job_store
+from email_outbox import EMAIL_OUTBOX_BATCH_SIZE, get_email_outbox, get_outbox_dispatcher
+from email_templates import CampaignTemplate
+from attachment_store import get_attachment_store
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -146,118 +160,153 @@ class HealthCheckResponse(BaseModel):
     gemini_api_configured: bool
 
 
-# ========== In-Memory Storage ==========
-# NOTE: This is in-memory and won't work with multiple workers (Docker uses 4 workers)
-# For production with async endpoints, use Redis or a database
-# Current frontend uses sync endpoint only for reliability
-job_storage = {}
+# Seconds without events before the lead stream sends a heartbeat
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', '15'))
 
 
-# ========== Helper Functions ==========
+# Threads for blocking work (LLM calls with retry sleeps, scraping, SMTP);
+# keeps the event loop free for /health and other requests
+API_BLOCKING_WORKERS = int(os.getenv('API_BLOCKING_WORKERS', '16'))
+blocking_executor = ThreadPoolExecutor(max_workers=API_BLOCKING_WORKERS, thread_name_prefix='api-blocking')
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the blocking_executor pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
 
-def validate_api_key():
-    """Validate that GEMINI_API_KEY is configured"""
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        raise HTTPException(
-            status_code=500,
-            detail="GEMINI_API_KEY not configured. Please set it in your .env file"
-        )
-    return True
 
+# ========== Job Queue ==========
+# Async jobs live in a store shared by all worker processes (SQLite by default,
+# see job_store.py), so any worker can run a job and answer status polls.
+# Each worker process runs JOB_WORKERS jobs at a time; with JOB_WORKERS=0 the
+# API only enqueues and `python -m worker` runs the jobs in its own processes.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+# Seconds a job interrupted by shutdown gets to stop before it is marked failed
+JOB_CANCEL_GRACE = float(os.getenv('JOB_CANCEL_GRACE', '5'))
+# Longest a status request may wait for a change, and how often it rechecks
+JOB_STATUS_MAX_WAIT = float(os.getenv('JOB_STATUS_MAX_WAIT', '30'))
+JOB_STATUS_WAIT_INTERVAL = float(os.getenv('JOB_STATUS_WAIT_INTERVAL', '0.5'))
 
-def generate_leads_sync(industry: str, number: int, country: str, enable_scraping: bool = False) -> Dict:
-    """Synchronous lead generation with automatic retry handling"""
+job_store = get_job_store()
+job_available = asyncio.Event()
+job_worker_tasks: List[asyncio.Task] = []
+
+# ========== Email Outbox ==========
+# /email/send only queues the message (see email_outbox.py); each worker process
+# runs a dispatcher that delivers due messages, unless EMAIL_OUTBOX_DISPATCHER is off
+EMAIL_OUTBOX_DISPATCHER = os.getenv('EMAIL_OUTBOX_DISPATCHER', 'true').lower() in ('1', 'true', 'yes')
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '2'))
+
+email_outbox = get_email_outbox()
+email_available = asyncio.Event()
+email_dispatcher_tasks: List[asyncio.Task] = []
+
+# Files uploaded once to /attachments and referenced by attachment_id
+attachment_store = get_attachment_store()
+
+
+# ========== Helper Functions ==========
+
+async def run_job(job: Dict):
+    """Run one claimed lead generation job and store its outcome"""
+    job_id = job['job_id']
+    params = job['params']
+    # Writes only land while this worker still holds the job (see job_store)
+    owner = job['worker_id']
+    progress = JobProgress(job_store, job_id, owner=owner)
+    future = blocking_executor.submit(
+        generate_leads_sync,
+        params['industry'],
+        params['number'],
+        params['country'],
+        params['enable_web_scraping'],
+        progress
+    )
     try:
-        validate_api_key()
-        
-        # Generate leads with AI (includes automatic retry logic for 503 errors)
-        logger.info(f"Starting lead generation: industry={industry}, number={number}, country={country}")
-        client = GeminiClient()
-        result = client.generate_companies(industry, number, country)
-        
-        # Enhance with web scraping if enabled
-        if enable_scraping:
-            logger.info("Enhancing results with web scraping...")
-            result = scrape_company_data(result)
-        
-        logger.info(f"Successfully generated {len(result.get('companies', []))} leads")
-        return result
-        
+        result = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        await stop_job(job_id, owner, progress, future)
+        raise
     except Exception as e:
-        error_msg = str(e)
-        error_lower = error_msg.lower()
-        
-        # Check if it's a 503/overload error (after retries exhausted)
-        is_503_error = (
-            '503' in error_msg or 
-            'overloaded' in error_lower or 
-            'unavailable' in error_lower or
-            'model is overloaded' in error_lower or
-            'service unavailable' in error_lower
-        )
-        
-        # Check if it's a rate limit error (429)
-        is_rate_limit = (
-            '429' in error_msg or
-            'rate limit' in error_lower or
-            'too many requests' in error_lower
+        stored = await run_blocking(
+            job_store.update, job_id, owner=owner,
+            status='failed', completed_at=datetime.utcnow().isoformat(), error=str(e)
         )
-        
-        # Check if it's a connection/timeout error
-        is_connection_error = (
-            'connection' in error_lower or
-            'timeout' in error_lower or
-            'network' in error_lower
+    else:
+        stored = await run_blocking(
+            job_store.update, job_id, owner=owner,
+            status='completed', completed_at=datetime.utcnow().isoformat(), result=result
         )
-        
-        if is_503_error:
-            logger.error(f"503/Service Unavailable error after retries: {error_msg}")
-            # Provide user-friendly message
-            user_message = (
-                "The AI service is currently overloaded. We've tried multiple times but the service is still unavailable. "
-                "Please try again in a few minutes."
-            )
-            raise HTTPException(
-                status_code=503,
-                detail=f"Lead generation failed: {user_message} (Error: {error_msg})"
-            )
-        elif is_rate_limit:
-            logger.error(f"Rate limit error: {error_msg}")
-            raise HTTPException(
-                status_code=429,
-                detail="Rate limit exceeded. Please wait a moment before trying again."
-            )
-        elif is_connection_error:
-            logger.error(f"Connection error: {error_msg}")
-            raise HTTPException(
-                status_code=503,
-                detail="Connection error. Please check your internet connection and try again."
-            )
-        else:
-            logger.error(f"Lead generation error: {error_msg}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Lead generation failed: {error_msg}"
-            )
+    if not stored:
+        logger.warning(f"Job {job_id} was handed to another worker, dropping this run's outcome")
 
 
-async def generate_leads_background(job_id: str, industry: str, number: int, country: str, enable_scraping: bool):
-    """Background task for lead generation"""
-    try:
-        job_storage[job_id]['status'] = 'processing'
-        job_storage[job_id]['started_at'] = datetime.utcnow().isoformat()
+async def stop_job(job_id: str, owner: str, progress: JobProgress, future):
+    """
+    Shutting down mid-job. The thread running it cannot be killed, so it is
+    told to stop at its next progress report and given JOB_CANCEL_GRACE
+    seconds: a job whose thread has stopped goes back to the queue, one
+    that is still running is marked failed, so it never runs twice.
+    """
+    # Store calls below run inline: the blocking pool may be full of running jobs
+    progress.cancel()
+    if not future.cancel():
+        await asyncio.wait([asyncio.wrap_future(future)], timeout=JOB_CANCEL_GRACE)
+    
+    if future.done() and not future.cancelled() and future.exception() is None:
+        # Finished before it noticed: keep the result
+        job_store.update(job_id, owner=owner, status='completed', completed_at=datetime.utcnow().isoformat(),
+                         result=future.result())
+    elif future.done():
+        if job_store.requeue(job_id, owner=owner):
+            logger.info(f"Returning interrupted job {job_id} to the queue")
+    else:
+        logger.warning(f"Job {job_id} did not stop within {JOB_CANCEL_GRACE:.0f}s, marking it failed")
+        job_store.update(job_id, owner=owner, status='failed', completed_at=datetime.utcnow().isoformat(),
+                         error="Interrupted by an API shutdown; please submit the job again")
+
+
+async def email_dispatcher():
+    """Deliver queued emails until cancelled"""
+    dispatcher = get_outbox_dispatcher()
+    while True:
+        try:
+            sent = await run_blocking(dispatcher.dispatch_once)
+        except Exception as e:
+            logger.error(f"Email dispatcher failed: {e}")
+            sent = 0
         
-        result = generate_leads_sync(industry, number, country, enable_scraping)
+        if not sent:
+            # Wake up early when this process queues an email
+            email_available.clear()
+            try:
+                await asyncio.wait_for(email_available.wait(), timeout=EMAIL_OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def job_worker(worker_id: str):
+    """Claim and run queued jobs until cancelled"""
+    while True:
+        try:
+            job = await run_blocking(job_store.claim_next, worker_id)
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} failed to claim a job: {e}")
+            job = None
         
-        job_storage[job_id]['status'] = 'completed'
-        job_storage[job_id]['completed_at'] = datetime.utcnow().isoformat()
-        job_storage[job_id]['result'] = result
+        if job is None:
+            # Wake up early when this process queues a job
+            job_available.clear()
+            try:
+                await asyncio.wait_for(job_available.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
         
-    except Exception as e:
-        job_storage[job_id]['status'] = 'failed'
-        job_storage[job_id]['error'] = str(e)
-        job_storage[job_id]['completed_at'] = datetime.utcnow().isoformat()
+        logger.info(f"Job worker {worker_id} running {job['job_id']}")
+        await run_job(job)
 
 
 # ========== API Endpoints ==========
@@ -303,7 +352,8 @@ async def generate_leads(request: LeadRequest):
     """
     try:
         # Generate leads
-        result = generate_leads_sync(
+        result = await run_blocking(
+            generate_leads_sync,
             industry=request.industry,
             number=request.number,
             country=request.country,
@@ -333,8 +383,123 @@ async def generate_leads(request: LeadRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+def company_event_payload(company: Dict, index: int) -> Dict:
+    """Serialize a company for a stream event through the CompanyLead model"""
+    try:
+        lead = CompanyLead(**company).model_dump(mode="json")
+    except ValidationError as e:
+        logger.warning(f"Streaming company that does not match CompanyLead: {e}")
+        lead = company
+    return {"index": index, "company": lead}
+
+
+def format_stream_event(event: str, data: Dict, stream_format: str) -> str:
+    """Encode one event as an NDJSON line or an SSE message"""
+    payload = json.dumps(data, default=str)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, "data": data}, default=str) + "\n"
+
+
+async def lead_event_stream(request: LeadRequest, stream_format: str) -> AsyncIterator[str]:
+    """
+    Generate leads as a stream of events:
+    - company: a company as soon as the LLM produced it
+    - enrichment: the same company (same index) after web scraping
+    - heartbeat: sent when nothing happened for STREAM_HEARTBEAT_SECONDS
+    - error: generation failed ({status_code, detail})
+    - metadata: final event, same fields as /api/v1/leads/generate
+    """
+    client = GeminiClient()
+    events = scrape_company_stream(
+        client.stream_companies(request.industry, request.number, request.country),
+        enable_scraping=request.enable_web_scraping
+    )
+    
+    # Pump events through a queue so heartbeats can be sent while idle
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def pump():
+        try:
+            async for item in events:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(None)
+    
+    pump_task = asyncio.ensure_future(pump())
+    indexes: Dict[int, int] = {}
+    counts = {"companies": 0, "enriched": 0, "scrape_failed": 0}
+    
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield format_stream_event("heartbeat", {"at": datetime.utcnow().isoformat()}, stream_format)
+                continue
+            
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                error = item if isinstance(item, HTTPException) else lead_generation_error(item)
+                yield format_stream_event("error", {"status_code": error.status_code, "detail": error.detail}, stream_format)
+                break
+            
+            event, company = item
+            if event == "company":
+                indexes[id(company)] = counts["companies"]
+                counts["companies"] += 1
+                yield format_stream_event("company", company_event_payload(company, indexes[id(company)]), stream_format)
+            elif event == "enriched":
+                counts["enriched"] += 1
+                yield format_stream_event("enrichment", company_event_payload(company, indexes[id(company)]), stream_format)
+            else:
+                counts["scrape_failed"] += 1
+        
+        yield format_stream_event("metadata", {
+            "industry": request.industry,
+            "country": request.country,
+            "requested_count": request.number,
+            "actual_count": counts["companies"],
+            "web_scraping_enabled": request.enable_web_scraping,
+            "enriched_count": counts["enriched"],
+            "scrape_failed_count": counts["scrape_failed"],
+            "generated_at": datetime.utcnow().isoformat()
+        }, stream_format)
+    finally:
+        pump_task.cancel()
+
+
+@app.post("/api/v1/leads/generate-stream", tags=["Leads"])
+async def generate_leads_stream(
+    request: LeadRequest,
+    format: str = Query(default="ndjson", pattern="^(ndjson|sse)$")
+):
+    """
+    Generate leads and stream them as they are produced.
+    
+    Same request body as /api/v1/leads/generate. The response is NDJSON
+    (one `{"event", "data"}` object per line) or Server-Sent Events
+    (`format=sse`). Events:
+    - **company**: `{index, company}` as soon as the AI produced it
+    - **enrichment**: `{index, company}` with scraped contact data (web scraping only)
+    - **heartbeat**: keeps proxies from closing an idle connection
+    - **error**: `{status_code, detail}` if generation failed
+    - **metadata**: final summary, same fields as the non-streaming endpoint
+    """
+    validate_api_key()
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        lead_event_stream(request, format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/v1/leads/generate-async", tags=["Leads"])
-async def generate_leads_async(request: LeadRequest, background_tasks: BackgroundTasks):
+async def generate_leads_async(request: LeadRequest):
     """
     Generate leads asynchronously (recommended for web scraping enabled).
     Returns a job ID to check status later.
@@ -344,28 +509,17 @@ async def generate_leads_async(request: LeadRequest, background_tasks: Backgroun
     try:
         validate_api_key()
         
-        # Generate unique job ID
-        job_id = f"job_{datetime.utcnow().timestamp()}_{request.industry[:10]}"
+        # Generate unique job ID (unique across worker processes)
+        job_id = f"job_{uuid.uuid4().hex}"
         
-        # Initialize job
-        job_storage[job_id] = {
-            "status": "queued",
+        # Queue the job; a job worker in any process picks it up
+        await run_blocking(job_store.create, job_id, {
             "industry": request.industry,
             "number": request.number,
             "country": request.country,
-            "enable_web_scraping": request.enable_web_scraping,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        
-        # Add to background tasks
-        background_tasks.add_task(
-            generate_leads_background,
-            job_id,
-            request.industry,
-            request.number,
-            request.country,
-            request.enable_web_scraping
-        )
+            "enable_web_scraping": request.enable_web_scraping
+        })
+        job_available.set()
         
         return {
             "success": True,
@@ -379,7 +533,12 @@ async def generate_leads_async(request: LeadRequest, background_tasks: Backgroun
 
 
 @app.get("/api/v1/leads/status/{job_id}", tags=["Leads"])
-async def get_job_status(job_id: str):
+async def get_job_status(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for the job to change (long poll)"),
+    version: Optional[int] = Query(default=None, description="Last version seen; wait returns once the job is past it"),
+    partial: bool = Query(default=True, description="Include companies generated so far while processing")
+):
     """
     Check the status of an async lead generation job.
     
@@ -388,15 +547,31 @@ async def get_job_status(job_id: str):
     - processing: Job is currently running
     - completed: Job finished successfully
     - failed: Job encountered an error
+    
+    While processing, `progress` holds per-company counters (stage, generated,
+    to_scrape, scraped, failed) and `partial_result` the companies so far.
+    
+    Long poll: pass the `version` from the previous response and `wait=N`;
+    the request returns as soon as the job changes, or after N seconds
+    (at most JOB_STATUS_MAX_WAIT) with the same version.
     """
-    if job_id not in job_storage:
+    job = await run_blocking(job_store.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = job_storage[job_id]
+    deadline = asyncio.get_running_loop().time() + min(wait, JOB_STATUS_MAX_WAIT)
+    while (version is not None and job.get('version', 0) <= version
+           and job['status'] not in ('completed', 'failed')
+           and asyncio.get_running_loop().time() < deadline):
+        await asyncio.sleep(JOB_STATUS_WAIT_INTERVAL)
+        job = await run_blocking(job_store.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
     
     response = {
         "job_id": job_id,
         "status": job['status'],
+        "version": job.get('version', 0),
         "created_at": job['created_at']
     }
     
@@ -408,6 +583,9 @@ async def get_job_status(job_id: str):
         response['completed_at'] = job.get('completed_at')
     elif job['status'] == 'processing':
         response['started_at'] = job.get('started_at')
+        response['progress'] = job.get('progress', {'stage': 'generating', 'generated': 0})
+        if partial and job.get('partial_result'):
+            response['partial_result'] = job['partial_result']
     
     return response
 
@@ -421,11 +599,10 @@ async def export_leads(
     Export leads in different formats (json or csv).
     Currently only JSON is supported.
     """
-    if job_id not in job_storage:
+    job = await run_blocking(job_store.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = job_storage[job_id]
-    
     if job['status'] != 'completed':
         raise HTTPException(
             status_code=400, 
@@ -440,6 +617,9 @@ async def export_leads(
 
 # ========== Email Endpoints ==========
 
+# Recipients accepted by one /email/send-bulk call
+EMAIL_BULK_MAX_RECIPIENTS = int(os.getenv('EMAIL_BULK_MAX_RECIPIENTS', '500'))
+
 class EmailAttachment(BaseModel):
     """Email attachment model"""
     filename: str = Field(..., description="Original filename")
@@ -454,109 +634,432 @@ class EmailRequest(BaseModel):
     subject: str = Field(..., min_length=1, description="Email subject")
     body: str = Field(..., min_length=1, description="Email body (HTML supported)")
     attachments: Optional[List[EmailAttachment]] = Field(default=None, description="List of attachments (base64 encoded)")
+    attachment_ids: Optional[List[str]] = Field(default=None, description="IDs of files uploaded to /api/v1/attachments")
 
 
-@app.post("/api/v1/email/send", tags=["Email"])
+class BulkEmailRecipient(BaseModel):
+    """One recipient of a bulk send, optionally with its own subject/body"""
+    to_email: str = Field(..., description="Recipient email address")
+    subject: Optional[str] = Field(default=None, description="Overrides the shared subject")
+    body: Optional[str] = Field(default=None, description="Overrides the shared body")
+
+
+class BulkEmailRequest(BaseModel):
+    """Request model for sending one message to many leads"""
+    from_email: str = Field(..., description="Sender email address")
+    subject: str = Field(..., min_length=1, description="Email subject")
+    body: str = Field(..., min_length=1, description="Email body (HTML supported)")
+    recipients: List[BulkEmailRecipient] = Field(
+        ..., min_items=1, max_items=EMAIL_BULK_MAX_RECIPIENTS, description="Leads to email"
+    )
+    attachments: Optional[List[EmailAttachment]] = Field(default=None, description="List of attachments (base64 encoded)")
+    attachment_ids: Optional[List[str]] = Field(default=None, description="IDs of files uploaded to /api/v1/attachments")
+    cc_sender: bool = Field(default=False, description="CC the sender on every message")
+
+
+class EmailCampaignRequest(BaseModel):
+    """Request model for a mail-merge campaign over a list of leads"""
+    from_email: str = Field(..., description="Sender email address")
+    subject: str = Field(..., min_length=1, description="Subject template, e.g. 'Coverage for {{company_name}}'")
+    body: str = Field(..., min_length=1, description="Body template (HTML supported), e.g. 'Hi {{company_name}} team'")
+    leads: Optional[List[CompanyLead]] = Field(default=None, description="Leads to email")
+    job_id: Optional[str] = Field(default=None, description="Email the leads of a completed lead generation job instead")
+    attachments: Optional[List[EmailAttachment]] = Field(default=None, description="List of attachments (base64 encoded)")
+    attachment_ids: Optional[List[str]] = Field(default=None, description="IDs of files uploaded to /api/v1/attachments")
+    cc_sender: bool = Field(default=False, description="CC the sender on every message")
+    dry_run: bool = Field(default=False, description="Only render the emails and return them, send nothing")
+
+
+def job_leads(companies: List[Any]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    A lead job's companies validated one by one through CompanyLead: the valid
+    leads, and a skipped result for each company the LLM got wrong
+    """
+    leads, invalid = [], []
+    for company in companies:
+        try:
+            leads.append(CompanyLead(**company).model_dump(mode="json"))
+        except (ValidationError, TypeError) as e:
+            name = company.get('company_name') if isinstance(company, dict) else None
+            if isinstance(e, ValidationError):
+                reason = '; '.join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+            else:
+                reason = "not an object"
+            logger.warning(f"Campaign lead {name!r} does not match CompanyLead: {reason}")
+            invalid.append({"company_name": name, "status": "skipped", "reason": f"Invalid lead data ({reason})"})
+    return leads, invalid
+
+
+def lead_email(lead: Dict) -> Optional[str]:
+    """Best address for a lead: scraped contact email, then the LLM's guess, then any other found"""
+    return lead.get('contact_email') or lead.get('contact_email_llm') or next(iter(lead.get('additional_emails') or []), None)
+
+
+def stored_attachments(attachment_ids: Optional[List[str]], limits: AttachmentLimits) -> List[Attachment]:
+    """Attachments uploaded to /api/v1/attachments, counted against the limits"""
+    attachments = []
+    for attachment_id in attachment_ids or []:
+        attachment = attachment_store.get(attachment_id)
+        if attachment is None:
+            raise ValueError(f"Unknown attachment_id {attachment_id} (never uploaded or evicted; upload it again)")
+        limits.start_file(attachment.filename)
+        limits.check(attachment.filename, attachment.size, attachment.size)
+        attachments.append(attachment)
+    return attachments
+
+
+def decode_attachments(attachments: Optional[List[EmailAttachment]],
+                       attachment_ids: Optional[List[str]] = None) -> List[Attachment]:
+    """
+    Stored attachments by ID plus base64 attachments decoded into memory,
+    together held to the attachment size limits
+    """
+    limits = AttachmentLimits()
+    decoded = stored_attachments(attachment_ids, limits)
+    for attachment in attachments or []:
+        decoded.append(decode_attachment(attachment.filename, attachment.content, attachment.mimetype, limits))
+        # Keep only the decoded bytes, not the base64 text as well
+        attachment.content = ""
+    return decoded
+
+
+def email_error(e: Exception) -> HTTPException:
+    """Map a failure to accept an email to an HTTPException"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, AttachmentTooLarge):
+        logger.error(f"Email attachment rejected: {str(e)}")
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, ValueError):
+        logger.error(f"Email validation error: {str(e)}")
+        return HTTPException(status_code=400, detail=str(e))
+    logger.error(f"Unexpected email error: {str(e)}")
+    return HTTPException(status_code=500, detail="Failed to queue email. Please check your email configuration.")
+
+
+async def queue_email(from_email: str, to_email: str, subject: str, body: str,
+                      attachments: List[Attachment]) -> Dict:
+    """Store one email in the outbox (CC to the sender) and wake the dispatcher"""
+    # Fails fast (400) when no email service is configured
+    await run_blocking(get_email_sender)
+    
+    # CC the user so they get a copy of what they sent
+    email = OutboundEmail(
+        from_email=from_email,
+        to_email=to_email,
+        subject=subject,
+        contents=body,
+        attachments=attachments,
+        cc_email=from_email
+    )
+    message = await run_blocking(email_outbox.enqueue, email)
+    email_available.set()
+    
+    logger.info(f"Email {message['message_id']} queued for {to_email}")
+    return {
+        "success": True,
+        "message": f"Email to {to_email} queued for delivery",
+        "message_id": message['message_id'],
+        "status": message['status'],
+        "status_url": f"/api/v1/email/status/{message['message_id']}",
+        "to": to_email,
+        "from": from_email,
+        "cc": from_email,
+        "attachments_count": len(attachments),
+        "queued_at": message['created_at'],
+        "note": f"A copy of this email will be sent to {from_email}"
+    }
+
+
+@app.post("/api/v1/email/send", tags=["Email"], status_code=202)
 async def send_email(request: EmailRequest):
     """
-    Send an email to a lead.
+    Queue an email to a lead.
     
     - **to_email**: Recipient's email address
     - **from_email**: Your email address (for reference)
     - **subject**: Email subject line
     - **body**: Email body content (HTML supported)
-    - **attachments**: Optional list of attachments
+    - **attachments**: Optional list of attachments (base64; /email/send-upload takes raw files)
+    - **attachment_ids**: Optional IDs of files uploaded once to /api/v1/attachments
     
-    Returns success status and message.
+    The email is stored in the outbox and delivered in the background, with
+    retries and provider failover; track it with /api/v1/email/status/{message_id}.
     """
     try:
         logger.info(f"Email send request: from={request.from_email}, to={request.to_email}")
-        email_sender = get_email_sender()
-        
-        # Process attachments (convert base64 to files)
-        import base64
-        import tempfile
-        import os as os_module
-        
-        attachment_files = []
-        temp_files = []
+        attachments = await run_blocking(decode_attachments, request.attachments, request.attachment_ids)
+        return await queue_email(request.from_email, request.to_email, request.subject, request.body, attachments)
+    except Exception as e:
+        raise email_error(e)
+
+
+@app.post(
+    "/api/v1/email/send-upload",
+    tags=["Email"],
+    status_code=202,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["to_email", "from_email", "subject", "body"],
+        "properties": {
+            "to_email": {"type": "string"},
+            "from_email": {"type": "string"},
+            "subject": {"type": "string"},
+            "body": {"type": "string"},
+            "attachment_ids": {"type": "string", "description": "Comma-separated IDs from /api/v1/attachments"},
+            "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+        }
+    }}}}}
+)
+async def send_email_upload(request: Request):
+    """
+    Queue an email to a lead, with attachments uploaded as multipart/form-data
+    (same fields as /email/send, files in one or more `files` parts, and
+    attachment_ids comma-separated).
+    
+    Files are read straight into memory without base64 encoding; the upload
+    is rejected with 413 as soon as it crosses the attachment size limits.
+    """
+    try:
+        content_length = int(request.headers.get('content-length') or 0)
+        if content_length > EMAIL_MAX_ATTACHMENTS_BYTES + MAX_FORM_FIELD_BYTES:
+            raise AttachmentTooLarge("Upload is larger than the attachment size limit")
         
-        if request.attachments:
-            for attachment in request.attachments:
-                try:
-                    # Decode base64 content
-                    file_content = base64.b64decode(attachment.content)
-                    
-                    # Create temporary file
-                    temp_file = tempfile.NamedTemporaryFile(
-                        delete=False,
-                        suffix=f"_{attachment.filename}",
-                        mode='wb'
-                    )
-                    temp_file.write(file_content)
-                    temp_file.close()
-                    
-                    attachment_files.append(temp_file.name)
-                    temp_files.append(temp_file.name)
-                    
-                except Exception as e:
-                    print(f"⚠️ Failed to process attachment {attachment.filename}: {str(e)}")
+        limits = AttachmentLimits()
+        fields, attachments = await parse_multipart_form(request, limits)
+        missing = [name for name in ('to_email', 'from_email', 'subject', 'body') if not fields.get(name)]
+        if missing:
+            raise ValueError(f"Missing form fields: {', '.join(missing)}")
+        attachment_ids = [item.strip() for item in fields.get('attachment_ids', '').split(',') if item.strip()]
+        attachments = await run_blocking(stored_attachments, attachment_ids, limits) + attachments
         
-        # Send email (from_email is now used properly)
-        # CC the user so they get a copy of what they sent
-        logger.info(f"Sending email via email service...")
-        result = email_sender.send_email(
-            from_email=request.from_email,
-            to_email=request.to_email,
-            subject=request.subject,
-            contents=request.body,
-            attachments=attachment_files if attachment_files else None,
-            cc_email=request.from_email  # User gets a copy
+        logger.info(f"Email upload request: from={fields['from_email']}, to={fields['to_email']}, files={len(attachments)}")
+        return await queue_email(fields['from_email'], fields['to_email'], fields['subject'], fields['body'], attachments)
+    except Exception as e:
+        raise email_error(e)
+
+
+@app.post(
+    "/api/v1/attachments",
+    tags=["Email"],
+    status_code=201,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["files"],
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}}
+    }}}}}
+)
+async def upload_attachments(request: Request):
+    """
+    Upload files once and reference them by attachment_id in /email/send,
+    /email/send-upload and /email/send-bulk instead of sending them again.
+    
+    The ID is the SHA-256 of the file, so re-uploading the same file returns
+    the same ID, with the filename and type of the first upload. Least
+    recently used files are evicted when the store is full; a request naming
+    an evicted ID fails with 400.
+    """
+    try:
+        _, attachments = await parse_multipart_form(request)
+        if not attachments:
+            raise ValueError("No files uploaded")
+        stored = [await run_blocking(attachment_store.put, attachment) for attachment in attachments]
+        logger.info(f"Stored {len(stored)} attachments: {[item['attachment_id'][:12] for item in stored]}")
+        return {"success": True, "attachments": stored}
+    except Exception as e:
+        raise email_error(e)
+
+
+@app.get("/api/v1/attachments/{attachment_id}", tags=["Email"])
+async def get_attachment(attachment_id: str):
+    """Filename, MIME type and size of an uploaded attachment"""
+    metadata = await run_blocking(attachment_store.metadata, attachment_id)
+    if not metadata:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return metadata
+
+
+@app.get("/api/v1/email/status/{message_id}", tags=["Email"])
+async def get_email_status(message_id: str):
+    """
+    Delivery status of a queued email: queued, sending, sent or failed,
+    with the attempts made, the provider used and the last error.
+    """
+    message = await run_blocking(email_outbox.get, message_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return {
+        "message_id": message_id,
+        "status": message['status'],
+        "to": message['email']['to_email'],
+        "attempts": message['attempts'],
+        "method": message.get('method'),
+        "last_error": message.get('last_error'),
+        "created_at": message['created_at'],
+        "sent_at": message.get('sent_at'),
+        "failed_at": message.get('failed_at'),
+        "next_attempt_at": (
+            datetime.utcfromtimestamp(message['next_attempt_at']).isoformat()
+            if message['status'] == 'queued' else None
         )
-        
-        logger.info(f"Email send result: {result}")
-        logger.info(f"Result type: {type(result)}, Success: {result.get('success')}")
-        
-        # Clean up temporary files
-        for temp_file in temp_files:
-            try:
-                os_module.unlink(temp_file)
-            except Exception as cleanup_error:
-                logger.warning(f"Failed to cleanup temp file: {cleanup_error}")
-        
-        # Check if result is a dict and has success key
-        if not isinstance(result, dict):
-            logger.error(f"Invalid result type: {type(result)}, value: {result}")
-            raise HTTPException(status_code=500, detail="Email service returned invalid response")
-        
-        if result.get("success") is True:
-            logger.info("Email sent successfully, returning success response")
-            response_data = {
+    }
+
+
+@app.post("/api/v1/email/send-bulk", tags=["Email"], status_code=202)
+async def send_bulk_email(request: BulkEmailRequest):
+    """
+    Queue an email to many leads in one call.
+    
+    - **from_email**: Your email address
+    - **subject** / **body**: Shared message, each recipient may override them
+    - **recipients**: Up to EMAIL_BULK_MAX_RECIPIENTS leads
+    - **attachments**: Optional list of attachments, sent to every recipient
+    - **attachment_ids**: Optional IDs of files uploaded once to /api/v1/attachments
+    - **cc_sender**: CC yourself on every message (off by default)
+    
+    All recipients are stored in the outbox in one transaction and delivered
+    in the background, batched per provider call with retries and failover;
+    track each with /api/v1/email/status/{message_id}.
+    """
+    logger.info(f"Bulk email request: from={request.from_email}, recipients={len(request.recipients)}")
+    try:
+        # Fails fast (400) when no email service is configured
+        await run_blocking(get_email_sender)
+        # One in-memory copy of each attachment, shared by every message
+        attachments = await run_blocking(decode_attachments, request.attachments, request.attachment_ids)
+        emails = [
+            OutboundEmail(
+                from_email=request.from_email,
+                to_email=recipient.to_email,
+                subject=recipient.subject or request.subject,
+                contents=recipient.body or request.body,
+                attachments=attachments,
+                cc_email=request.from_email if request.cc_sender else None
+            )
+            for recipient in request.recipients
+        ]
+        messages = await run_blocking(email_outbox.enqueue_many, emails)
+    except Exception as e:
+        raise email_error(e)
+    email_available.set()
+    
+    logger.info(f"Bulk email from {request.from_email}: {len(messages)} emails queued")
+    return {
+        "success": True,
+        "total": len(messages),
+        "queued": len(messages),
+        "attachments_count": len(attachments),
+        "queued_at": datetime.utcnow().isoformat(),
+        "results": [
+            {"to_email": email.to_email, "message_id": message['message_id'], "status": message['status'],
+             "status_url": f"/api/v1/email/status/{message['message_id']}"}
+            for email, message in zip(emails, messages)
+        ]
+    }
+
+
+def queue_campaign(template: CampaignTemplate, leads: List[Dict], request: EmailCampaignRequest,
+                   attachments: List[Attachment]) -> List[Dict]:
+    """Render each lead and queue it in the outbox, EMAIL_OUTBOX_BATCH_SIZE emails per transaction"""
+    results = []
+    pending = []
+    
+    def flush():
+        if not pending:
+            return
+        messages = email_outbox.enqueue_many([email for _, email in pending])
+        for (lead, email), message in zip(pending, messages):
+            results.append({"company_name": lead.get('company_name'), "to_email": email.to_email,
+                            "message_id": message['message_id'], "status": "queued"})
+        pending.clear()
+    
+    for lead, subject, body in template.render_all(leads):
+        to_email = lead_email(lead)
+        if not to_email:
+            flush()
+            results.append({"company_name": lead.get('company_name'), "status": "skipped",
+                            "reason": "Lead has no contact email"})
+            continue
+        pending.append((lead, OutboundEmail(
+            from_email=request.from_email,
+            to_email=to_email,
+            subject=subject,
+            contents=body,
+            attachments=attachments,
+            cc_email=request.from_email if request.cc_sender else None
+        )))
+        if len(pending) >= EMAIL_OUTBOX_BATCH_SIZE:
+            flush()
+    flush()
+    return results
+
+
+@app.post("/api/v1/email/campaign", tags=["Email"], status_code=202)
+async def send_email_campaign(request: EmailCampaignRequest):
+    """
+    Send a personalized email to every lead in one call (mail merge).
+    
+    - **subject** / **body**: Templates with `{{field}}` placeholders over the
+      lead fields (company_name, headquarters_location, key_products_services,
+      social_media.linkedin, ...); `{{field | fallback}}` for empty fields
+    - **leads**: The leads to email, or **job_id** of a completed lead job
+    - **attachments** / **attachment_ids**: Sent with every email
+    - **dry_run**: Return the rendered emails without sending
+    
+    Each lead goes to its contact email (leads without one are skipped, as
+    are job companies that do not match the lead model). The templates are
+    compiled once and the emails queued in the outbox as they render; track
+    each with /api/v1/email/status/{message_id}.
+    """
+    if request.job_id:
+        job = await run_blocking(job_store.get, request.job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job['status'] != 'completed':
+            raise HTTPException(status_code=400, detail=f"Job is not completed yet. Current status: {job['status']}")
+        companies = (job.get('result') or {}).get('companies') or []
+        # LLM output: one malformed company is skipped, not the whole campaign
+        leads, invalid = job_leads(companies)
+    elif request.leads:
+        leads = [lead.model_dump(mode="json") for lead in request.leads]
+        invalid = []
+    else:
+        raise HTTPException(status_code=400, detail="Provide leads or a job_id")
+    if len(leads) > EMAIL_BULK_MAX_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {EMAIL_BULK_MAX_RECIPIENTS} leads per campaign")
+    
+    try:
+        template = CampaignTemplate(request.subject, request.body, CompanyLead.model_fields)
+        if request.dry_run:
+            return {
                 "success": True,
-                "message": f"Email sent successfully to {request.to_email}",
-                "method": result.get("method", "unknown"),
-                "to": request.to_email,
-                "from": request.from_email,
-                "cc": request.from_email,
-                "attachments_count": len(attachment_files) if attachment_files else 0,
-                "sent_at": datetime.utcnow().isoformat(),
-                "note": f"A copy of this email was sent to {request.from_email}"
+                "dry_run": True,
+                "emails": [
+                    {"company_name": lead.get('company_name'), "to_email": lead_email(lead), "subject": subject, "body": body}
+                    for lead, subject, body in template.render_all(leads)
+                ],
+                "skipped": invalid
             }
-            logger.info(f"Returning response: {response_data}")
-            return response_data
-        else:
-            error_msg = result.get("message", "Unknown error occurred")
-            logger.error(f"Email sending marked as failed: {error_msg}")
-            raise HTTPException(status_code=500, detail=error_msg)
-            
-    except HTTPException:
-        raise  # Re-raise HTTP exceptions as-is
-    except ValueError as e:
-        logger.error(f"Email validation error: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+        
+        # Fails fast (400) when no email service is configured
+        await run_blocking(get_email_sender)
+        attachments = await run_blocking(decode_attachments, request.attachments, request.attachment_ids)
+        results = await run_blocking(queue_campaign, template, leads, request, attachments) + invalid
     except Exception as e:
-        logger.error(f"Unexpected email error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to send email. Please check your email configuration.")
+        raise email_error(e)
+    email_available.set()
+    
+    queued = sum(1 for result in results if result["status"] == "queued")
+    logger.info(f"Campaign from {request.from_email}: {queued}/{len(results)} emails queued")
+    return {
+        "success": queued > 0,
+        "total": len(results),
+        "queued": queued,
+        "skipped": len(results) - queued,
+        "attachments_count": len(attachments),
+        "queued_at": datetime.utcnow().isoformat(),
+        "results": results
+    }
 
 
 @app.post("/api/v1/email/generate-content", tags=["Email"])
@@ -629,6 +1132,18 @@ async def startup_event():
     logger.info(f"CORS Allowed Origins: {ALLOWED_ORIGINS}")
     logger.info(f"Gemini API Key: {'✅ Configured' if os.getenv('GEMINI_API_KEY') else '❌ Missing'}")
     logger.info(f"Email Service: {'✅ Configured' if os.getenv('EMAIL_USER') or os.getenv('SENDGRID_API_KEY') else '⚠️ Not configured'}")
+    logger.info(f"Blocking work pool: {API_BLOCKING_WORKERS} threads")
+    if JOB_WORKERS > 0:
+        logger.info(f"Job store: {job_store.stats()}, {JOB_WORKERS} job workers")
+    else:
+        logger.info(f"Job store: {job_store.stats()}, enqueue only (jobs run by `python -m worker`)")
+    for i in range(JOB_WORKERS):
+        worker_id = f"{os.getpid()}-{i}"
+        job_worker_tasks.append(asyncio.create_task(job_worker(worker_id)))
+    logger.info(f"Attachment store: {attachment_store.stats()}")
+    logger.info(f"Email outbox: {email_outbox.stats()}, dispatcher {'on' if EMAIL_OUTBOX_DISPATCHER else 'off'}")
+    if EMAIL_OUTBOX_DISPATCHER:
+        email_dispatcher_tasks.append(asyncio.create_task(email_dispatcher()))
     logger.info("="*60)
 
 
@@ -636,6 +1151,12 @@ async def startup_event():
 async def shutdown_event():
     """Run on API shutdown"""
     logger.info("🛑 Lead Generator API Shutting Down...")
+    tasks = job_worker_tasks + email_dispatcher_tasks
+    for task in tasks:
+        task.cancel()
+    # Let interrupted jobs be requeued (or marked failed) before the pool goes
+    await asyncio.gather(*tasks, return_exceptions=True)
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
 
 
 # ========== Run Server ==========
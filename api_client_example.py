@@ -90,11 +90,19 @@ class LeadGeneratorClient:
             print(response.json())
             return None
     
-    def get_job_status(self, job_id: str):
-        """Check the status of an async job"""
+    def get_job_status(self, job_id: str, wait: float = 0, version: int = None):
+        """
+        Check the status of an async job
+        
+        With `version` from a previous response and `wait` seconds, the server
+        holds the request until the job changes (long poll).
+        """
         endpoint = f"{self.base_url}/api/{API_VERSION}/leads/status/{job_id}"
         
-        response = self.session.get(endpoint)
+        params = {"wait": wait}
+        if version is not None:
+            params["version"] = version
+        response = self.session.get(endpoint, params=params, timeout=wait + 30)
         
         if response.status_code == 200:
             return response.json()
@@ -102,29 +110,46 @@ class LeadGeneratorClient:
             print(f"❌ Error: {response.status_code}")
             return None
     
-    def wait_for_job(self, job_id: str, poll_interval: int = 5, max_wait: int = 600):
+    def wait_for_job(self, job_id: str, poll_interval: int = 25, max_wait: int = 600, on_partial=None):
         """
         Wait for an async job to complete
         
+        Uses long polling: each status request returns as soon as the job
+        changes, so progress is printed as it happens without blind polling.
+        
         Args:
             job_id: Job ID to wait for
-            poll_interval: Seconds between status checks
+            poll_interval: Longest seconds a single status request waits for a change
             max_wait: Maximum seconds to wait
+            on_partial: Optional callback receiving the companies generated so far
         
         Returns:
             Job result or None if timeout/error
         """
         print(f"⏳ Waiting for job {job_id} to complete...")
         
-        elapsed = 0
-        while elapsed < max_wait:
-            status = self.get_job_status(job_id)
+        start = time.time()
+        version = None
+        while time.time() - start < max_wait:
+            status = self.get_job_status(job_id, wait=poll_interval, version=version)
             
             if not status:
                 return None
             
+            version = status.get('version')
             current_status = status['status']
-            print(f"   Status: {current_status} (elapsed: {elapsed}s)")
+            elapsed = int(time.time() - start)
+            progress = status.get('progress')
+            if progress:
+                print(f"   Status: {current_status} - {progress.get('stage')}: "
+                      f"{progress.get('generated', 0)} generated, "
+                      f"{progress.get('scraped', 0)}/{progress.get('to_scrape', 0)} scraped, "
+                      f"{progress.get('failed', 0)} failed (elapsed: {elapsed}s)")
+            else:
+                print(f"   Status: {current_status} (elapsed: {elapsed}s)")
+            
+            if on_partial and status.get('partial_result'):
+                on_partial(status['partial_result'].get('companies', []))
             
             if current_status == 'completed':
                 print("✅ Job completed!")
@@ -132,9 +157,6 @@ class LeadGeneratorClient:
             elif current_status == 'failed':
                 print(f"❌ Job failed: {status.get('error')}")
                 return None
-            
-            time.sleep(poll_interval)
-            elapsed += poll_interval
         
         print("⏰ Timeout waiting for job")
         return None
@@ -201,7 +223,7 @@ def example_2_async_with_scraping():
         job_id = job_info['job_id']
         
         # Wait for completion
-        result = client.wait_for_job(job_id, poll_interval=3)
+        result = client.wait_for_job(job_id)
         
         if result:
             companies = result['companies']
@@ -0,0 +1,207 @@
+"""
+Attachment Store
+Content-addressed store for attachments that are sent again and again (the
+same brochure on every email of a campaign): upload once, then reference
+the returned attachment_id instead of re-sending the file.
+
+1. The attachment_id is the SHA-256 of the bytes, so uploading the same file
+   twice stores it once; an ID keeps the filename and MIME type it was first
+   uploaded with, so every message referencing it gets the same file
+2. Bytes live in a SQLite file shared by every API worker, bounded by
+   ATTACHMENT_STORE_MAX_BYTES with least recently used eviction
+3. An in-process LRU (ATTACHMENT_STORE_MEMORY_BYTES) keeps the Attachment
+   objects themselves, so their base64 / MIME encoding is done once and
+   reused by every message that references them
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from cache import CACHE_DIR
+from email_attachments import Attachment
+
+ATTACHMENT_STORE_PATH = os.getenv('ATTACHMENT_STORE_PATH', os.path.join(CACHE_DIR, 'attachments.sqlite3'))
+ATTACHMENT_STORE_MAX_BYTES = int(os.getenv('ATTACHMENT_STORE_MAX_BYTES', str(500 * 1024 * 1024)))
+ATTACHMENT_STORE_MEMORY_BYTES = int(os.getenv('ATTACHMENT_STORE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+
+ATTACHMENT_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def attachment_id(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class AttachmentStore:
+    """Attachments by content hash: SQLite on disk, encoded Attachments in memory"""
+    def __init__(self, path: str = ATTACHMENT_STORE_PATH, max_bytes: int = ATTACHMENT_STORE_MAX_BYTES,
+                 memory_bytes: int = ATTACHMENT_STORE_MEMORY_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory: "OrderedDict[str, Attachment]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS attachments (
+                    attachment_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    mimetype TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS attachments_last_access ON attachments (last_access)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, attachment: Attachment):
+        """Keep an Attachment (and the encodings it memoizes) in the in-process LRU"""
+        if attachment.size > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= previous.size
+            self._memory[key] = attachment
+            self._memory_size += attachment.size
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= evicted.size
+
+    def put(self, attachment: Attachment) -> Dict:
+        """
+        Store an attachment. Storing the same bytes again only marks them as
+        used: the stored filename and type are kept, since earlier messages
+        and clients may already reference this ID.
+        """
+        key = attachment_id(attachment.content)
+        now = time.time()
+        with self._connect() as conn:
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO attachments VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, attachment.filename, attachment.mimetype, attachment.size, attachment.content,
+                 datetime.utcnow().isoformat(), now)
+            ).rowcount
+            if not inserted:
+                conn.execute('UPDATE attachments SET last_access = ? WHERE attachment_id = ?', (now, key))
+                filename, mimetype = conn.execute(
+                    'SELECT filename, mimetype FROM attachments WHERE attachment_id = ?', (key,)
+                ).fetchone()
+        if inserted:
+            self._remember(key, attachment)
+            self.evict()
+            return {'attachment_id': key, 'deduplicated': False, **attachment.metadata()}
+        return {'attachment_id': key, 'deduplicated': True, 'filename': filename, 'mimetype': mimetype,
+                'size': attachment.size}
+
+    def get(self, key: str) -> Optional[Attachment]:
+        """The attachment for an id, or None if it was never stored or has been evicted"""
+        if not ATTACHMENT_ID_RE.match(key or ''):
+            return None
+        with self._lock:
+            attachment = self._memory.get(key)
+            if attachment is not None:
+                self._memory.move_to_end(key)
+
+        with self._connect() as conn:
+            if attachment is not None:
+                touched = conn.execute(
+                    'UPDATE attachments SET last_access = ? WHERE attachment_id = ?', (time.time(), key)
+                ).rowcount
+                if touched:
+                    return attachment
+                # Evicted from the shared store by another worker
+                self._forget(key)
+                return None
+            row = conn.execute(
+                'SELECT filename, mimetype, content FROM attachments WHERE attachment_id = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE attachments SET last_access = ? WHERE attachment_id = ?', (time.time(), key))
+
+        attachment = Attachment(row[0], bytes(row[2]), row[1])
+        self._remember(key, attachment)
+        return attachment
+
+    def metadata(self, key: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT filename, mimetype, size, created_at FROM attachments WHERE attachment_id = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'attachment_id': key, 'filename': row[0], 'mimetype': row[1], 'size': row[2], 'created_at': row[3]}
+
+    def _forget(self, key: str):
+        with self._lock:
+            attachment = self._memory.pop(key, None)
+            if attachment is not None:
+                self._memory_size -= attachment.size
+
+    def delete(self, key: str) -> bool:
+        self._forget(key)
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM attachments WHERE attachment_id = ?', (key,)).rowcount > 0
+
+    def evict(self):
+        """Drop least recently used attachments until the store fits in max_bytes"""
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM attachments').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            doomed = []
+            for key, size in conn.execute('SELECT attachment_id, size FROM attachments ORDER BY last_access'):
+                if total <= self.max_bytes:
+                    break
+                doomed.append(key)
+                total -= size
+            conn.executemany('DELETE FROM attachments WHERE attachment_id = ?', [(key,) for key in doomed])
+        for key in doomed:
+            self._forget(key)
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM attachments').fetchone()
+        return {
+            'attachments': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'memory': {'attachments': len(self._memory), 'bytes': self._memory_size, 'max_bytes': self.memory_bytes}
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_attachment_store() -> AttachmentStore:
+    """Get or create the shared attachment store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AttachmentStore()
+    return _store
@@ -0,0 +1,160 @@
+"""
+Crawl Politeness Benchmark
+Starts local stub websites on several loopback hosts (127.0.0.1, 127.0.0.2, ...)
+and scrapes them the way scrape_company_data does, then reports per host:
+- requests served and the smallest gap between two of them (must respect
+  SCRAPE_HOST_RATE, or Retry-After after a 429)
+- total crawl time, compared with the time the old fixed sleeps would take
+
+Every stub site has a homepage linking to a few contact pages; one contact
+page answers the first request with 429 + Retry-After. robots.txt disallows
+/about everywhere and sets a Crawl-delay on the first host. --byte-budget
+caps the bytes read per company (see CrawlBudget) and reports the pages it
+skipped.
+
+Usage:
+    python benchmark_crawl.py                      # 4 hosts, 2 companies per host
+    python benchmark_crawl.py --hosts 8 --rate 2   # 8 hosts, 2 requests/s per host
+    python benchmark_crawl.py --byte-budget 150    # stop each crawl after ~150 bytes
+"""
+
+import argparse
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import MemoryCache
+from rate_limiter import HostScheduler
+from robots import RobotsCache
+from web_scraper import WebScraper, CrawlBudget, HostSlots, SCRAPE_BYTE_BUDGET, SCRAPE_MAX_WORKERS
+
+CONTACT_PAGES = ('contact', 'about', 'support')
+RETRY_AFTER_SECONDS = 1
+CRAWL_DELAY_SECONDS = 2
+
+
+class StubSite(BaseHTTPRequestHandler):
+    """A tiny company website that records when each request arrived"""
+    requests_log = defaultdict(list)  # host -> [(monotonic time, path)]
+    throttled = set()                 # hosts that already sent their 429
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        host = self.headers.get('Host', '')
+        path = self.path.split('?')[0]
+        with self.lock:
+            self.requests_log[host].append((time.monotonic(), path))
+            throttle = path == '/support' and host not in self.throttled
+            if throttle:
+                self.throttled.add(host)
+
+        if throttle:
+            self.send_response(429)
+            self.send_header('Retry-After', str(RETRY_AFTER_SECONDS))
+            self.end_headers()
+            return
+
+        if path == '/robots.txt':
+            body = 'User-agent: *\nDisallow: /about\n'
+            if host.startswith('127.0.0.1:'):
+                body += f'Crawl-delay: {CRAWL_DELAY_SECONDS}\n'
+            body += f'Sitemap: http://{host}/sitemap.xml\n'
+        elif path == '/':
+            links = ''.join(f'<a href="/{page}">{page.title()}</a>' for page in CONTACT_PAGES)
+            body = f'<html><body><h1>{host}</h1>{links}</body></html>'
+        elif path.strip('/') in CONTACT_PAGES:
+            site = host.split(':')[0].replace('.', '-')
+            body = f'<html><body>Write to info@site-{site}.io</body></html>'
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_hosts(count: int):
+    """Serve StubSite on 127.0.0.1..127.0.0.N, each on its own free port"""
+    servers = []
+    for i in range(count):
+        server = ThreadingHTTPServer((f'127.0.0.{i + 1}', 0), StubSite)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def min_gap(times):
+    times = sorted(times)
+    return min((b - a for a, b in zip(times, times[1:])), default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=4, help='Stub hosts')
+    parser.add_argument('--companies-per-host', type=int, default=2,
+                        help='Companies sharing each host (e.g. subsidiaries on one domain)')
+    parser.add_argument('--rate', type=float, default=1.0, help='Requests per second per host')
+    parser.add_argument('--byte-budget', type=int, default=SCRAPE_BYTE_BUDGET, help='Bytes per company, 0 = no limit')
+    args = parser.parse_args()
+
+    servers = start_stub_hosts(args.hosts)
+    scheduler = HostScheduler(rate=args.rate, burst=1)
+    urls = []
+    for server in servers:
+        host, port = server.server_address
+        urls.extend(f'http://{host}:{port}/?company={n}' for n in range(args.companies_per_host))
+
+    host_slots = HostSlots()
+    robots = RobotsCache(MemoryCache(ttl=3600))
+
+    def scrape(url):
+        with host_slots.for_url(url):
+            budget = CrawlBudget(byte_budget=args.byte_budget)
+            return WebScraper(cache=False, scheduler=scheduler, robots=robots, budget=budget).scrape_website(url)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=SCRAPE_MAX_WORKERS) as pool:
+        results = list(pool.map(scrape, urls))
+    elapsed = time.monotonic() - start
+
+    print("\n" + "=" * 60)
+    print(f"{'host':<22}{'requests':>10}{'min gap s':>12}{'waited s':>12}")
+    print("=" * 60)
+    scheduler_stats = scheduler.stats()
+    for host, log in sorted(StubSite.requests_log.items()):
+        waited = scheduler_stats.get(host, {}).get('wait_seconds', 0.0)
+        print(f"{host:<22}{len(log):>10}{min_gap(t for t, _ in log):>12.2f}{waited:>12.2f}")
+    print("=" * 60)
+
+    found = sum(1 for r in results if r.get('contact_email'))
+    # Old behaviour: 1s sleep before every contact page, 2s between companies
+    legacy = len(urls) * (len(CONTACT_PAGES) * 1 + 2)
+    print(f"Scraped {len(urls)} companies on {args.hosts} hosts in {elapsed:.1f}s "
+          f"({found} with an email); fixed sleeps alone took ~{legacy}s")
+    print(f"Allowed rate: {args.rate}/s per host -> min gap {1 / args.rate:.2f}s "
+          f"(Crawl-delay {CRAWL_DELAY_SECONDS}s on 127.0.0.1, Retry-After {RETRY_AFTER_SECONDS}s once per host)")
+    blocked = sum(r['page_stats']['robots_blocked'] for r in results)
+    about_hits = sum(1 for log in StubSite.requests_log.values() for _, path in log if path == '/about')
+    print(f"robots.txt: {blocked} URLs skipped, {about_hits} requests to disallowed /about")
+    crawl = [r['crawl_stats'] for r in results]
+    print(f"Crawl budget: {sum(c['pages_fetched'] for c in crawl)} pages fetched, "
+          f"{sum(c['pages_skipped'] for c in crawl)} skipped, "
+          f"~{sum(c['time_saved_seconds'] for c in crawl):.1f}s saved "
+          f"(stop reasons: {sorted(set(str(c['stop_reason']) for c in crawl))})")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
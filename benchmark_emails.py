@@ -0,0 +1,94 @@
+"""
+Email Extraction Benchmark
+Runs the original per-call extraction (pattern rebuilt on every call,
+substring filter over every excluded pattern) and email_extractor's batch
+API over a synthetic corpus of page texts, checks they agree, and reports
+the time per corpus and per MB.
+
+The corpus mixes pages with many addresses (staff directories, footers
+repeating placeholders) and pages with none, like a real crawl.
+
+Usage:
+    python benchmark_emails.py                     # 2000 pages
+    python benchmark_emails.py --pages 10000 -n 5  # bigger corpus, 5 repetitions
+"""
+
+import argparse
+import random
+import re
+import time
+
+from email_extractor import EmailExtractor
+
+WORDS = ('coverage plan members claims network provider benefits premium deductible '
+         'policy health dental vision family individual employer quote support office').split()
+PLACEHOLDERS = ('name@example.com', 'you@yourcompany.com', 'user@domain.com',
+                'logo@2x.png', 'placeholder@acme.io', 'jane@test.com')
+
+
+def legacy_extract_emails(text: str):
+    """WebScraper.extract_emails before email_extractor"""
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    emails = set(re.findall(email_pattern, text))
+    excluded_patterns = ['example.com', 'domain.com', 'email.com', 'yourcompany.com',
+                         'company.com', 'test.com', 'sample.com', 'placeholder']
+    filtered_emails = set()
+    for email in emails:
+        if not any(pattern in email.lower() for pattern in excluded_patterns):
+            if not email.lower().endswith(('.png', '.jpg', '.gif', '.svg')):
+                filtered_emails.add(email)
+    return filtered_emails
+
+
+def build_corpus(pages: int, words_per_page: int, seed: int = 7):
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(pages):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        if n % 3:  # two pages in three mention addresses
+            domain = f'insurer{n % 97}.org'
+            for i in range(rng.randint(5, 60)):
+                address = (rng.choice(PLACEHOLDERS) if i % 4 == 0
+                           else f'{rng.choice(WORDS)}{i}@{domain}')
+                words.insert(rng.randrange(len(words)), address)
+        corpus.append(' '.join(words))
+    return corpus
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=2000, help='Page texts in the corpus')
+    parser.add_argument('--words', type=int, default=1500, help='Words per page')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='Repetitions (best time is reported)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.pages, args.words)
+    megabytes = sum(len(text) for text in corpus) / 1e6
+    extractor = EmailExtractor()
+
+    legacy = [legacy_extract_emails(text) for text in corpus]
+    batch = extractor.extract_batch(corpus)
+    mismatches = sum(1 for old, new in zip(legacy, batch) if old != new)
+
+    legacy_time = best_of(lambda: [legacy_extract_emails(text) for text in corpus], args.repeat)
+    batch_time = best_of(lambda: EmailExtractor().extract_batch(corpus), args.repeat)
+
+    print(f"Corpus: {args.pages} pages, {megabytes:.1f} MB, "
+          f"{sum(len(emails) for emails in batch)} emails kept")
+    print(f"{'':<12}{'total s':>10}{'ms/page':>10}{'MB/s':>10}")
+    for name, elapsed in (('legacy', legacy_time), ('batch', batch_time)):
+        print(f"{name:<12}{elapsed:>10.3f}{elapsed / args.pages * 1000:>10.3f}{megabytes / elapsed:>10.1f}")
+    print(f"Speedup: {legacy_time / batch_time:.2f}x, pages with different results: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Scraper Micro-Benchmark
+Measures per-page CPU time (parse + link/email extraction) on saved HTML pages:
+the original multi-pass BeautifulSoup extraction versus the single-pass
+classifier on every installed parser backend.
+
+Usage:
+    python benchmark_scraper.py                    # synthetic large homepage
+    python benchmark_scraper.py saved/*.html       # your saved HTML fixtures
+    python benchmark_scraper.py -n 50 page.html    # repetitions per page
+"""
+
+import argparse
+import re
+import time
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from html_parsers import available_parsers, get_parser
+from web_scraper import WebScraper, ScrapedPage
+
+BASE_URL = "https://www.example-health.org/"
+
+
+def synthetic_homepage(sections: int = 400) -> str:
+    """A large homepage: mega-menu, many product links, socials and a fat footer"""
+    parts = ["<html><head><title>Example Health</title></head><body><nav>"]
+    for i in range(sections):
+        parts.append(f'<a href="/products/plan-{i}">Plan {i}</a>')
+        parts.append(f'<a href="https://cdn.example-health.org/docs/{i}.pdf">Brochure {i}</a>')
+        parts.append(f'<p>Coverage details for plan {i}, call us or write to claims{i}@example-health.org.</p>')
+    parts.append('</nav><footer>')
+    parts.append('<a href="/contact-us">Contact Us</a><a href="/about">About</a><a href="/support">Help</a>')
+    parts.append('<a href="mailto:info@example-health.org?subject=Hi">Email</a>')
+    parts.append('<a href="https://www.linkedin.com/company/example-health">LinkedIn</a>')
+    parts.append('<a href="https://twitter.com/intent/tweet?url=x">Share</a><a href="https://x.com/examplehealth">X</a>')
+    parts.append('<a href="https://www.facebook.com/examplehealth">Facebook</a>')
+    parts.append('<a href="https://www.youtube.com/@examplehealth">YouTube</a>')
+    parts.append('</footer></body></html>')
+    return "".join(parts)
+
+
+def legacy_extract(scraper: WebScraper, html: str, base_url: str):
+    """The original multi-pass extraction: one find_all per extractor"""
+    soup = BeautifulSoup(html, 'html.parser')
+    emails = scraper.extract_emails(soup.get_text())
+    for mailto in soup.find_all('a', href=re.compile(r'^mailto:', re.IGNORECASE)):
+        email_match = re.search(r'mailto:([^\?\"\'>\s]+)', mailto['href'], re.IGNORECASE)
+        if email_match:
+            emails.add(email_match.group(1))
+
+    social = {}
+    for link in soup.find_all('a', href=True):
+        href = link['href'].lower()
+        for platform, needle in (('linkedin', 'linkedin.com/company'), ('twitter', 'twitter.com'),
+                                 ('facebook', 'facebook.com'), ('instagram', 'instagram.com'),
+                                 ('youtube', 'youtube.com')):
+            if needle in href and platform not in social:
+                social[platform] = link['href']
+
+    contact = []
+    keywords = ['contact', 'contact-us', 'contactus', 'about', 'about-us',
+                'support', 'help', 'get-in-touch', 'reach-us', 'connect']
+    for link in soup.find_all('a', href=True):
+        href = link['href'].lower()
+        text = link.get_text().lower()
+        if any(keyword in href or keyword in text for keyword in keywords):
+            full_url = urljoin(base_url, link['href'])
+            if urlparse(full_url).netloc == urlparse(base_url).netloc and full_url not in contact:
+                contact.append(full_url)
+    return emails, social, contact[:5]
+
+
+def time_per_page(func, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', help='Saved HTML files (default: synthetic homepage)')
+    parser.add_argument('-n', '--repeat', type=int, default=20, help='Repetitions per page')
+    args = parser.parse_args()
+
+    if args.pages:
+        fixtures = []
+        for path in args.pages:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                fixtures.append((path, f.read()))
+    else:
+        fixtures = [('synthetic homepage', synthetic_homepage())]
+
+    parsers = available_parsers()
+    scrapers = {name: WebScraper(fetcher=object(), parser=get_parser(name)) for name in parsers}  # never fetch
+    width = 36 + 15 * (len(parsers) + 1)
+
+    print("=" * width)
+    print(f"{'page':<30}{'KB':>6}{'legacy ms':>15}" + "".join(f"{name + ' ms':>15}" for name in parsers))
+    print("=" * width)
+    for name, html in fixtures:
+        row = f"{name[-30:]:<30}{len(html) // 1024:>6}"
+        legacy = scrapers['html.parser']
+        row += f"{time_per_page(lambda: legacy_extract(legacy, html, BASE_URL), args.repeat):>15.2f}"
+        for scraper in scrapers.values():
+            page_ms = time_per_page(
+                lambda: scraper.extract_page(ScrapedPage(BASE_URL, html, len(html), scraper.parser)),
+                args.repeat
+            )
+            row += f"{page_ms:>15.2f}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Caches
+1. SQLiteCache - persistent key/value cache shared by every worker process on a host:
+   - per-entry TTL, with expired entries still readable for revalidation
+   - LRU eviction bounded by entry count and total stored bytes
+   - JSON values plus a small JSON metadata dict (e.g. ETag/Last-Modified)
+2. MemoryCache - in-process LRU with the same interface
+3. TieredCache - MemoryCache in front of a SQLiteCache
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+
+
+class CacheEntry:
+    """A cached value and its bookkeeping"""
+    def __init__(self, key: str, value: Any, metadata: Dict, stored_at: float, expires_at: float):
+        self.key = key
+        self.value = value
+        self.metadata = metadata
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class SQLiteCache:
+    """
+    Key/value cache in a SQLite file.
+
+    Each call opens its own short-lived connection, so one instance can be
+    shared between threads, and several processes can use the same file.
+    """
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = 10000,
+        max_bytes: int = 100 * 1024 * 1024,
+        path: Optional[str] = None
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path or os.path.join(CACHE_DIR, f'{name}.sqlite3')
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[CacheEntry]:
+        """Look up an entry; expired entries are only returned with allow_expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value, metadata, stored_at, expires_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+
+        value, metadata, stored_at, expires_at = row
+        entry = CacheEntry(key, json.loads(value), json.loads(metadata), stored_at, expires_at)
+        if not entry.is_fresh and not allow_expired:
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[float] = None):
+        """Store a value, then evict least recently used entries over the limits"""
+        now = time.time()
+        value_json = json.dumps(value)
+        metadata_json = json.dumps(metadata or {})
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, value_json, metadata_json, len(value_json) + len(metadata_json),
+                 now, now + (self.ttl if ttl is None else ttl), now)
+            )
+        self.evict()
+
+    def touch(self, key: str, ttl: Optional[float] = None):
+        """Extend an entry's lifetime, e.g. after a 304 Not Modified"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE entries SET stored_at = ?, expires_at = ?, last_access = ? WHERE key = ?',
+                (now, now + (self.ttl if ttl is None else ttl), now, key)
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def evict(self):
+        """Drop least recently used entries until both limits hold"""
+        with self._lock, self._connect() as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            rows = conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall()
+            doomed = []
+            for key, size in rows:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                count -= 1
+                total -= size
+            conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def purge_expired(self, grace: float = 0) -> int:
+        """Delete entries expired for longer than `grace` seconds"""
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM entries WHERE expires_at < ?', (time.time() - grace,)).rowcount
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': count, 'bytes': total, 'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with TTL.
+
+    Values are deep-copied in and out so callers can mutate what they get
+    back, just as with values decoded from SQLiteCache.
+    """
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        if not entry.is_fresh and not allow_expired:
+            return None
+        return CacheEntry(key, copy.deepcopy(entry.value), dict(entry.metadata), entry.stored_at, entry.expires_at)
+
+    def set(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[float] = None,
+            expires_at: Optional[float] = None):
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        entry = CacheEntry(key, copy.deepcopy(value), dict(metadata or {}), now, expires_at)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {'entries': len(self._entries), 'max_entries': self.max_entries}
+
+
+class TieredCache:
+    """In-process MemoryCache in front of a SQLiteCache shared across workers"""
+    def __init__(self, memory: MemoryCache, shared: SQLiteCache):
+        self.memory = memory
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        entry = self.shared.get(key)
+        if entry is not None:
+            # Keep the shared expiry so the tiers agree on freshness
+            self.memory.set(key, entry.value, entry.metadata, expires_at=entry.expires_at)
+        return entry
+
+    def set(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[float] = None):
+        self.shared.set(key, value, metadata, ttl)
+        self.memory.set(key, value, metadata, ttl)
+
+    def delete(self, key: str):
+        self.shared.delete(key)
+        self.memory.delete(key)
+
+    def stats(self) -> Dict:
+        return {'memory': self.memory.stats(), 'shared': self.shared.stats()}
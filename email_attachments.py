@@ -0,0 +1,200 @@
+"""
+Email Attachments
+Attachments kept in memory from upload to send, so nothing is written to a
+temp file and read back:
+1. Attachment - filename, MIME type and bytes; its base64 text (SendGrid)
+   and serialized MIME part (SMTP) are computed once and reused by every
+   message the same Attachment object goes out with
+2. decode_attachment - base64 attachments from JSON requests, size-checked
+   before decoding
+3. parse_multipart_form - multipart/form-data uploads (raw bytes, no base64
+   inflation) streamed straight into memory, with the limits enforced while
+   reading (pip install python-multipart)
+
+Limits per email: EMAIL_MAX_ATTACHMENTS files, EMAIL_MAX_ATTACHMENT_BYTES per
+file and EMAIL_MAX_ATTACHMENTS_BYTES in total (base64 in the MIME message adds
+a third, and Gmail rejects messages over 25 MB).
+"""
+
+import base64
+import binascii
+import hashlib
+import mimetypes
+import os
+from email.mime.base import MIMEBase
+from typing import Dict, List, Optional, Tuple
+
+EMAIL_MAX_ATTACHMENTS = int(os.getenv('EMAIL_MAX_ATTACHMENTS', '10'))
+EMAIL_MAX_ATTACHMENT_BYTES = int(os.getenv('EMAIL_MAX_ATTACHMENT_BYTES', str(10 * 1024 * 1024)))
+EMAIL_MAX_ATTACHMENTS_BYTES = int(os.getenv('EMAIL_MAX_ATTACHMENTS_BYTES', str(18 * 1024 * 1024)))
+# Text fields of a multipart request (to_email, subject, body, ...)
+MAX_FORM_FIELD_BYTES = 1024 * 1024
+
+
+class AttachmentTooLarge(ValueError):
+    """An attachment, or all of them together, exceeds the configured limits"""
+
+
+class Attachment:
+    """One attachment held in memory"""
+    def __init__(self, filename: str, content: bytes, mimetype: Optional[str] = None):
+        self.filename = os.path.basename(filename or '') or 'attachment'
+        self.content = content
+        if not mimetype or mimetype == 'application/octet-stream':
+            mimetype = mimetypes.guess_type(self.filename)[0] or 'application/octet-stream'
+        self.mimetype = mimetype
+        self._digest = None
+        self._base64 = None
+        self._mime_part = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the bytes"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.content).hexdigest()
+        return self._digest
+
+    def key(self) -> tuple:
+        """Equal for attachments that would be sent identically"""
+        return (self.digest, self.filename, self.mimetype)
+
+    def base64(self) -> str:
+        """The bytes as one base64 string, encoded once"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.content).decode('ascii')
+        return self._base64
+
+    def mime_part(self) -> str:
+        """
+        The attachment as a serialized MIME part (headers and base64 body),
+        rendered once; serializing the body is most of the cost of building
+        a message, so it is not repeated per message
+        """
+        if self._mime_part is None:
+            maintype, _, subtype = self.mimetype.partition('/')
+            # RFC 2231 encoding only for names that need it
+            name = self.filename if self.filename.isascii() else ('utf-8', '', self.filename)
+            part = MIMEBase(maintype, subtype or 'octet-stream', name=name)
+            part.set_payload(base64.encodebytes(self.content).decode('ascii'))
+            part['Content-Transfer-Encoding'] = 'base64'
+            part.add_header('Content-Disposition', 'attachment', filename=name)
+            self._mime_part = part.as_string()
+        return self._mime_part
+
+    def metadata(self) -> Dict:
+        return {'filename': self.filename, 'mimetype': self.mimetype, 'size': self.size}
+
+
+class AttachmentLimits:
+    """Running size and count checks for the attachments of one email"""
+    def __init__(self, max_count: int = EMAIL_MAX_ATTACHMENTS, max_file: int = EMAIL_MAX_ATTACHMENT_BYTES,
+                 max_total: int = EMAIL_MAX_ATTACHMENTS_BYTES):
+        self.max_count = max_count
+        self.max_file = max_file
+        self.max_total = max_total
+        self.count = 0
+        self.total = 0
+
+    def start_file(self, filename: str):
+        self.count += 1
+        if self.count > self.max_count:
+            raise AttachmentTooLarge(f"Too many attachments (limit {self.max_count})")
+
+    def check(self, filename: str, file_size: int, added: int):
+        """Account for `added` more bytes of a file that is now file_size bytes"""
+        self.total += added
+        if file_size > self.max_file:
+            raise AttachmentTooLarge(f"Attachment {filename} is larger than {self.max_file / (1024 * 1024):.1f} MB")
+        if self.total > self.max_total:
+            raise AttachmentTooLarge(f"Attachments are larger than {self.max_total / (1024 * 1024):.1f} MB in total")
+
+
+def decode_attachment(filename: str, content: str, mimetype: Optional[str],
+                      limits: AttachmentLimits) -> Attachment:
+    """Decode one base64 attachment; the size is checked before decoding"""
+    limits.start_file(filename)
+    limits.check(filename, len(content) * 3 // 4, 0)
+    try:
+        data = base64.b64decode(content)
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Attachment {filename} is not valid base64")
+    limits.check(filename, len(data), len(data))
+    return Attachment(filename, data, mimetype)
+
+
+async def parse_multipart_form(request, limits: Optional[AttachmentLimits] = None) -> Tuple[Dict[str, str], List[Attachment]]:
+    """
+    Read a multipart/form-data request body chunk by chunk.
+
+    Returns (text fields, file parts as Attachments). Raises ValueError for
+    a malformed body and AttachmentTooLarge as soon as a limit is crossed.
+    """
+    try:
+        from python_multipart.multipart import MultipartParser, parse_options_header
+    except ImportError:
+        # The python_multipart module name is new in 0.0.13
+        raise ImportError("python-multipart>=0.0.13 not installed. Run: pip install -U 'python-multipart>=0.0.13'")
+
+    limits = limits or AttachmentLimits()
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or not params.get(b'boundary'):
+        raise ValueError("Expected a multipart/form-data body")
+
+    fields: Dict[str, str] = {}
+    files: List[Attachment] = []
+    part = {}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, field=b'', value=b'', data=bytearray())
+
+    def on_header_field(data, start, end):
+        part['field'] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part['value'] += data[start:end]
+
+    def on_header_end():
+        part['headers'][part['field'].decode('latin-1').lower()] = part['value']
+        part['field'] = part['value'] = b''
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part['headers'].get('content-disposition', b''))
+        part['name'] = disposition.get(b'name', b'').decode()
+        filename = disposition.get(b'filename')
+        part['filename'] = filename.decode() if filename is not None else None
+        if part['filename'] is not None:
+            limits.start_file(part['filename'])
+
+    def on_part_data(data, start, end):
+        chunk = data[start:end]
+        part['data'] += chunk
+        if part['filename'] is not None:
+            limits.check(part['filename'], len(part['data']), len(chunk))
+        elif len(part['data']) > MAX_FORM_FIELD_BYTES:
+            raise AttachmentTooLarge(f"Form field {part['name']} is too large")
+
+    def on_part_end():
+        if part['filename'] is None:
+            fields[part['name']] = part['data'].decode('utf-8')
+        elif part['filename'] or part['data']:  # skip empty file inputs
+            mimetype = part['headers'].get('content-type', b'').decode('latin-1') or None
+            files.append(Attachment(part['filename'], bytes(part['data']), mimetype))
+
+    parser = MultipartParser(params[b'boundary'], {
+        'on_part_begin': on_part_begin,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+    return fields, files
@@ -0,0 +1,364 @@
+"""
+Email Outbox
+Durable queue of outbound emails, so sending never waits on SMTP or SendGrid
+inside an API request:
+1. EmailOutbox - messages in a SQLite file shared by every API worker process;
+   claim_due() leases due messages to one dispatcher, and a dispatcher that
+   dies mid-send hands them back once EMAIL_OUTBOX_LEASE expires
+2. OutboxDispatcher - delivers claimed messages through EmailSender.send_bulk
+   (which fails over between providers) and retries transient failures with
+   exponential backoff, up to EMAIL_OUTBOX_MAX_ATTEMPTS
+
+A message goes queued -> sending -> sent, or back to queued with a later
+next_attempt_at, or to failed. Attachment bytes are stored in the same
+database (no loose files), once per distinct content however many messages
+carry them, until the last message using them is finished. Finished
+messages expire after EMAIL_OUTBOX_TTL seconds.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from cache import CACHE_DIR
+from email_attachments import Attachment
+from email_sender import OutboundEmail, get_email_sender
+
+EMAIL_OUTBOX_DIR = os.getenv('EMAIL_OUTBOX_DIR', os.path.join(CACHE_DIR, 'outbox'))
+EMAIL_OUTBOX_PATH = os.getenv('EMAIL_OUTBOX_PATH', os.path.join(EMAIL_OUTBOX_DIR, 'outbox.sqlite3'))
+EMAIL_OUTBOX_TTL = float(os.getenv('EMAIL_OUTBOX_TTL', str(7 * 24 * 3600)))
+# Seconds after which a 'sending' message whose dispatcher died is sent again
+EMAIL_OUTBOX_LEASE = float(os.getenv('EMAIL_OUTBOX_LEASE', '300'))
+# Messages claimed per dispatch; they go out as one bulk send
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+# Retry schedule: EMAIL_RETRY_BASE_DELAY * 2^(attempt - 1), capped, +-20% jitter
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv('EMAIL_RETRY_BASE_DELAY', '30'))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv('EMAIL_RETRY_MAX_DELAY', '3600'))
+
+FINISHED_STATUSES = ('sent', 'failed')
+
+
+class EmailOutbox:
+    """Outbound messages in a SQLite file, claimed with a lease"""
+    def __init__(self, path: str = EMAIL_OUTBOX_PATH, ttl: float = EMAIL_OUTBOX_TTL,
+                 lease: float = EMAIL_OUTBOX_LEASE):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    message_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    claimed_at REAL,
+                    expires_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS messages_expiry ON messages (expires_at)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS message_attachments (
+                    message_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    PRIMARY KEY (message_id, position)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS message_attachments_digest ON message_attachments (digest)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS attachment_blobs (
+                    digest TEXT PRIMARY KEY,
+                    content BLOB NOT NULL
+                )
+            ''')
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; writes that read first open their own transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, email: OutboundEmail) -> Dict:
+        return self.enqueue_many([email])[0]
+
+    def enqueue_many(self, emails: List[OutboundEmail]) -> List[Dict]:
+        """Queue several emails in one transaction"""
+        now = time.time()
+        created_at = datetime.utcnow().isoformat()
+        messages = [{
+            'message_id': email.message_id,
+            'status': 'queued',
+            'email': email.to_dict(),
+            'attempts': 0,
+            'method': None,
+            'last_error': None,
+            'created_at': created_at,
+            'next_attempt_at': now,
+        } for email in emails]
+        self.purge_expired()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO messages (message_id, status, data, next_attempt_at) VALUES (?, ?, ?, ?)',
+                    [(message['message_id'], 'queued', json.dumps(message), now) for message in messages]
+                )
+                attachments = [(email.message_id, position, attachment)
+                               for email in emails
+                               for position, attachment in enumerate(email.attachments)
+                               if isinstance(attachment, Attachment)]
+                # One row per distinct file, however many emails carry it
+                blobs = {attachment.digest: attachment.content for _, _, attachment in attachments}
+                conn.executemany(
+                    'INSERT OR IGNORE INTO attachment_blobs (digest, content) VALUES (?, ?)', blobs.items()
+                )
+                conn.executemany(
+                    'INSERT INTO message_attachments (message_id, position, digest) VALUES (?, ?, ?)',
+                    [(message_id, position, attachment.digest) for message_id, position, attachment in attachments]
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return messages
+
+    def load_emails(self, messages: List[Dict], shared: Optional[Dict[tuple, Attachment]] = None) -> List[OutboundEmail]:
+        """
+        The messages' emails with their attachments read back into memory.
+        Messages carrying the same file share one Attachment, so it is read
+        and encoded once per batch (pass the same `shared` dict to share it
+        across calls).
+        """
+        shared = {} if shared is None else shared
+        emails = []
+        with self._connect() as conn:
+            for message in messages:
+                digests = dict(conn.execute(
+                    'SELECT position, digest FROM message_attachments WHERE message_id = ?', (message['message_id'],)
+                ).fetchall())
+                data = dict(message['email'])
+                attachments = []
+                for position, item in enumerate(data.get('attachments') or []):
+                    if not isinstance(item, dict):
+                        attachments.append(item)
+                        continue
+                    key = (digests[position], item['filename'], item['mimetype'])
+                    if key not in shared:
+                        content = conn.execute(
+                            'SELECT content FROM attachment_blobs WHERE digest = ?', (digests[position],)
+                        ).fetchone()[0]
+                        shared[key] = Attachment(item['filename'], bytes(content), item['mimetype'])
+                    attachments.append(shared[key])
+                data['attachments'] = attachments
+                emails.append(OutboundEmail.from_dict(data))
+        return emails
+
+    def get(self, message_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM messages WHERE message_id = ?', (message_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim_due(self, limit: int = EMAIL_OUTBOX_BATCH_SIZE,
+                  max_attempts: int = EMAIL_OUTBOX_MAX_ATTEMPTS) -> List[Dict]:
+        """
+        Lease up to `limit` due messages, oldest first, and count the attempt.
+        A message whose lease expired after its last allowed attempt (e.g. the
+        send kept killing the dispatcher) is marked failed instead.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    '''SELECT data FROM messages
+                       WHERE (status = 'queued' AND next_attempt_at <= ?)
+                          OR (status = 'sending' AND claimed_at < ?)
+                       ORDER BY next_attempt_at LIMIT ?''',
+                    (now, now - self.lease, limit)
+                ).fetchall()
+                messages = []
+                for (data,) in rows:
+                    message = json.loads(data)
+                    if message['attempts'] >= max_attempts:
+                        message.update(status='failed', failed_at=datetime.utcnow().isoformat(),
+                                       last_error=f"No result after {message['attempts']} attempts "
+                                                  f"(last error: {message.get('last_error')})")
+                        conn.execute(
+                            'UPDATE messages SET status = ?, data = ?, expires_at = ? WHERE message_id = ?',
+                            ('failed', json.dumps(message), now + self.ttl, message['message_id'])
+                        )
+                        self._release_attachments(conn, message['message_id'])
+                        print(f"❌ Outbox: giving up on {message['message_id']}: {message['last_error']}")
+                        continue
+                    message['status'] = 'sending'
+                    message['attempts'] += 1
+                    conn.execute(
+                        'UPDATE messages SET status = ?, data = ?, claimed_at = ? WHERE message_id = ?',
+                        ('sending', json.dumps(message), now, message['message_id'])
+                    )
+                    messages.append(message)
+                conn.execute('COMMIT')
+                return messages
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def update(self, message_id: str, **fields) -> Optional[Dict]:
+        """Merge fields into a message; finishing it starts its TTL and drops its attachment bytes"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT data FROM messages WHERE message_id = ?', (message_id,)).fetchone()
+                message = None
+                if row is not None:
+                    message = json.loads(row[0])
+                    message.update(fields)
+                    expires_at = time.time() + self.ttl if message['status'] in FINISHED_STATUSES else None
+                    conn.execute(
+                        '''UPDATE messages SET status = ?, data = ?, next_attempt_at = ?, expires_at = ?
+                           WHERE message_id = ?''',
+                        (message['status'], json.dumps(message), message['next_attempt_at'], expires_at, message_id)
+                    )
+                    if expires_at is not None:
+                        self._release_attachments(conn, message_id)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return message
+
+    @staticmethod
+    def _release_attachments(conn, message_id: str):
+        """Unlink a message's attachments, deleting bytes no other message uses"""
+        digests = [row[0] for row in conn.execute(
+            'SELECT DISTINCT digest FROM message_attachments WHERE message_id = ?', (message_id,)
+        )]
+        conn.execute('DELETE FROM message_attachments WHERE message_id = ?', (message_id,))
+        conn.executemany(
+            '''DELETE FROM attachment_blobs WHERE digest = ?
+               AND NOT EXISTS (SELECT 1 FROM message_attachments WHERE digest = attachment_blobs.digest)''',
+            [(digest,) for digest in digests]
+        )
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM messages WHERE expires_at < ?', (time.time(),)).rowcount
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM messages GROUP BY status').fetchall()
+        return {'path': self.path, 'messages': dict(rows)}
+
+
+class OutboxDispatcher:
+    """Delivers due outbox messages in batches, with retries and backoff"""
+    def __init__(
+        self,
+        outbox: EmailOutbox,
+        sender_factory: Callable = get_email_sender,
+        batch_size: int = EMAIL_OUTBOX_BATCH_SIZE,
+        max_attempts: int = EMAIL_OUTBOX_MAX_ATTEMPTS,
+        base_delay: float = EMAIL_RETRY_BASE_DELAY,
+        max_delay: float = EMAIL_RETRY_MAX_DELAY
+    ):
+        self.outbox = outbox
+        self.sender_factory = sender_factory
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def dispatch_once(self) -> int:
+        """Send one batch of due messages; returns how many were claimed"""
+        messages = self.outbox.claim_due(self.batch_size, self.max_attempts)
+        if not messages:
+            return 0
+
+        # Load one message at a time, so one that cannot be read back fails
+        # alone instead of stranding the whole batch in 'sending'
+        shared: Dict[tuple, Attachment] = {}
+        loaded, emails = [], []
+        for message in messages:
+            try:
+                emails.extend(self.outbox.load_emails([message], shared))
+                loaded.append(message)
+            except Exception as e:
+                # A locked database is worth retrying; missing attachment bytes
+                # or a corrupt stored email will never load
+                self._record(message, {'success': False, 'permanent': not isinstance(e, sqlite3.OperationalError),
+                                       'method': None, 'message': f"Could not load message: {e!r}"})
+
+        if emails:
+            try:
+                results = self.sender_factory().send_bulk(emails)
+            except Exception as e:
+                # No provider could be set up; keep the messages for later
+                results = [{'success': False, 'permanent': False, 'method': None, 'message': str(e)}] * len(emails)
+
+            for message, result in zip(loaded, results):
+                self._record(message, result)
+        return len(messages)
+
+    def _record(self, message: Dict, result: Dict):
+        message_id = message['message_id']
+        if result['success']:
+            self.outbox.update(message_id, status='sent', method=result['method'], last_error=None,
+                               sent_at=datetime.utcnow().isoformat())
+            return
+
+        if result['permanent'] or message['attempts'] >= self.max_attempts:
+            print(f"❌ Outbox: giving up on {message_id} after {message['attempts']} attempts: {result['message']}")
+            self.outbox.update(message_id, status='failed', method=result['method'], last_error=result['message'],
+                               failed_at=datetime.utcnow().isoformat())
+            return
+
+        delay = self.retry_delay(message['attempts'])
+        print(f"⚠️ Outbox: {message_id} failed ({result['message']}), retrying in {delay:.0f}s")
+        self.outbox.update(message_id, status='queued', method=result['method'], last_error=result['message'],
+                           next_attempt_at=time.time() + delay)
+
+
+# Singleton instances
+_outbox = None
+_dispatcher = None
+_outbox_lock = threading.Lock()
+
+def get_email_outbox() -> EmailOutbox:
+    """Get or create the shared email outbox"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = EmailOutbox()
+    return _outbox
+
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    """Get or create this process's outbox dispatcher"""
+    global _dispatcher
+    outbox = get_email_outbox()
+    with _outbox_lock:
+        if _dispatcher is None:
+            _dispatcher = OutboxDispatcher(outbox)
+    return _dispatcher
@@ -3,15 +3,225 @@ Email Sender Service
 Supports multiple sending methods:
 1. SendGrid (Recommended - allows custom sender emails)
 2. Yagmail with Reply-To (Fallback method)
+
+Bulk sends go through OutboxEngine: SendGrid batches recipients of the same
+message into one API call (personalizations), Yagmail reuses a small pool of
+logged-in SMTP connections, and both run concurrently within a per-provider
+send rate.
 """
 
 import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
 import yagmail
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Union
 from dotenv import load_dotenv
+from yagmail.headers import resolve_addresses
+from yagmail.message import prepare_message
+from yagmail.validate import validate_email_with_regex
+
+from email_attachments import Attachment
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
+# Logged-in SMTP connections kept for reuse; idle ones are checked with NOOP
+# before reuse after EMAIL_SMTP_IDLE_CHECK seconds
+EMAIL_SMTP_POOL_SIZE = int(os.getenv('EMAIL_SMTP_POOL_SIZE', '3'))
+EMAIL_SMTP_IDLE_CHECK = float(os.getenv('EMAIL_SMTP_IDLE_CHECK', '30'))
+# Provider calls per second (an SMTP message, or a SendGrid API request)
+EMAIL_SMTP_RATE = float(os.getenv('EMAIL_SMTP_RATE', '2'))
+EMAIL_SENDGRID_RATE = float(os.getenv('EMAIL_SENDGRID_RATE', '10'))
+# Recipients per SendGrid request (the API allows up to 1000 personalizations)
+EMAIL_SENDGRID_BATCH_SIZE = int(os.getenv('EMAIL_SENDGRID_BATCH_SIZE', '500'))
+# Provider calls in flight per bulk send
+EMAIL_SEND_CONCURRENCY = int(os.getenv('EMAIL_SEND_CONCURRENCY', '4'))
+# Consecutive failed sends after which a provider is skipped (other providers
+# are tried first) for EMAIL_FAILOVER_COOLDOWN seconds
+EMAIL_FAILOVER_THRESHOLD = int(os.getenv('EMAIL_FAILOVER_THRESHOLD', '3'))
+EMAIL_FAILOVER_COOLDOWN = float(os.getenv('EMAIL_FAILOVER_COOLDOWN', '120'))
+
+# Failures of a single message that leave the SMTP session usable
+SMTP_MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError,
+    ValueError, TypeError
+)
+
+
+class OutboundEmail:
+    """One message to one recipient, as queued for bulk sending"""
+    def __init__(
+        self,
+        from_email: str,
+        to_email: str,
+        subject: str,
+        contents: str,
+        attachments: List[Union[Attachment, str]] = None,
+        cc_email: str = None,
+        message_id: str = None
+    ):
+        self.from_email = from_email
+        self.to_email = to_email
+        self.subject = subject
+        self.contents = contents
+        self.attachments = attachments or []
+        self.cc_email = cc_email
+        self.message_id = message_id or uuid.uuid4().hex
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly fields; in-memory attachments are reduced to their metadata"""
+        data = dict(self.__dict__)
+        data['attachments'] = [
+            attachment.metadata() if isinstance(attachment, Attachment) else attachment
+            for attachment in self.attachments
+        ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'OutboundEmail':
+        return cls(**data)
+
+    def content_key(self) -> tuple:
+        """Messages with equal keys differ only in recipients"""
+        return (self.from_email, self.subject, self.contents, tuple(
+            attachment.key() if isinstance(attachment, Attachment) else attachment
+            for attachment in self.attachments
+        ))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    Failures that neither a retry nor another provider will fix: recipients
+    or content rejected with a 5xx SMTP reply, or an HTTP 400/413 from SendGrid
+    """
+    for e in (error, error.__cause__):
+        if isinstance(e, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in e.recipients.values())
+        if isinstance(e, smtplib.SMTPDataError):
+            return e.smtp_code >= 500
+        if getattr(e, 'status_code', None) in (400, 413):
+            return True
+    return False
+
+
+def send_result(email: OutboundEmail, method: str, error: Exception = None, permanent: bool = False) -> dict:
+    """Per-recipient outcome reported by bulk sends"""
+    return {
+        "message_id": email.message_id,
+        "to": email.to_email,
+        "cc": email.cc_email,
+        "success": error is None,
+        "permanent": permanent,  # failed for good, do not retry
+        "method": method,
+        "message": "Email sent" if error is None else str(error)
+    }
+
+
+class ProviderHealth:
+    """Consecutive failures of one provider; after `threshold` it cools down"""
+    def __init__(self, threshold: int = EMAIL_FAILOVER_THRESHOLD, cooldown: float = EMAIL_FAILOVER_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.down_until = 0.0
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.down_until = time.monotonic() + self.cooldown
+
+
+class SMTPConnectionPool:
+    """
+    Logged-in yagmail clients shared by concurrent sends.
+
+    yagmail's own send() logs in again on every call; pooled clients stay
+    connected and send through the SMTP session directly. A connection that
+    fails for any reason other than the message itself (SMTP_MESSAGE_ERRORS)
+    is closed and replaced on next use.
+    """
+    def __init__(self, factory: Callable[[], yagmail.SMTP], size: int = EMAIL_SMTP_POOL_SIZE,
+                 idle_check: float = EMAIL_SMTP_IDLE_CHECK):
+        self.factory = factory
+        self.size = max(1, size)
+        self.idle_check = idle_check
+        self._idle = queue.LifoQueue()  # (client, last used), most recent first
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.stats = {'connections_opened': 0, 'connections_reused': 0, 'connections_dropped': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _alive(client) -> bool:
+        try:
+            return client.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError, AttributeError):
+            return False
+
+    def _checkout(self):
+        try:
+            client, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            client = None
+        if client is not None and time.monotonic() - last_used > self.idle_check and not self._alive(client):
+            self._close(client)
+            client = None
+        if client is None:
+            client = self.factory()
+            client.login()
+            self._count('connections_opened')
+        else:
+            self._count('connections_reused')
+        return client
+
+    def _close(self, client):
+        self._count('connections_dropped')
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """A logged-in client, returned to the pool unless the connection failed"""
+        with self._slots:
+            client = self._checkout()
+            try:
+                yield client
+            except SMTP_MESSAGE_ERRORS:
+                self._idle.put((client, time.monotonic()))
+                raise
+            except Exception:
+                self._close(client)
+                raise
+            self._idle.put((client, time.monotonic()))
+
+    def close(self):
+        while True:
+            try:
+                client, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(client)
+
 
 class SendGridEmailSender:
     """SendGrid email sender - allows sending from any verified email"""
@@ -32,6 +242,56 @@ class SendGridEmailSender:
             raise ValueError("Please set SENDGRID_API_KEY in .env file")
         
         self.client = SendGridAPIClient(self.api_key)
+        self.bucket = TokenBucket(EMAIL_SENDGRID_RATE, burst=EMAIL_SEND_CONCURRENCY)
+        self.max_concurrency = EMAIL_SEND_CONCURRENCY
+    
+    def batches(self, emails: List[OutboundEmail]) -> List[List[OutboundEmail]]:
+        """Group recipients of identical messages, up to EMAIL_SENDGRID_BATCH_SIZE per request"""
+        groups: Dict[tuple, List[OutboundEmail]] = {}
+        for email in emails:
+            groups.setdefault(email.content_key(), []).append(email)
+        return [
+            group[i:i + EMAIL_SENDGRID_BATCH_SIZE]
+            for group in groups.values()
+            for i in range(0, len(group), EMAIL_SENDGRID_BATCH_SIZE)
+        ]
+    
+    def send_batch(self, batch: List[OutboundEmail]):
+        """One API request; each recipient gets their own personalization (To and CC)"""
+        from sendgrid.helpers.mail import Cc, Personalization
+        
+        first = batch[0]
+        message = self.Mail(
+            from_email=self.Email(first.from_email),
+            subject=first.subject,
+            html_content=self.Content("text/html", first.contents)
+        )
+        for email in batch:
+            personalization = Personalization()
+            personalization.add_to(self.To(email.to_email))
+            # SendGrid rejects an address repeated within one personalization
+            if email.cc_email and email.cc_email.lower() != email.to_email.lower():
+                personalization.add_cc(Cc(email.cc_email))
+            message.add_personalization(personalization)
+        self._add_attachments(message, first.attachments)
+        self.client.send(message)
+        print(f"✅ SendGrid: Email sent to {len(batch)} recipients from {first.from_email}")
+    
+    @staticmethod
+    def _add_attachments(message, attachments: List[Union[Attachment, str]]):
+        """Attach in-memory attachments (or file paths) to a SendGrid message"""
+        from sendgrid.helpers.mail import Attachment as SendGridAttachment, Disposition, FileContent, FileName, FileType
+        
+        for attachment in attachments or []:
+            if not isinstance(attachment, Attachment):
+                with open(attachment, 'rb') as f:
+                    attachment = Attachment(attachment, f.read())
+            message.add_attachment(SendGridAttachment(
+                FileContent(attachment.base64()),
+                FileName(attachment.filename),
+                FileType(attachment.mimetype),
+                Disposition('attachment')
+            ))
     
     def send_email(
         self,
@@ -39,7 +299,7 @@ class SendGridEmailSender:
         to_email: Union[str, List[str]],
         subject: str,
         contents: str,
-        attachments: List[str] = None,
+        attachments: List[Union[Attachment, str]] = None,
         cc_email: str = None
     ) -> bool:
         """Send email via SendGrid from any verified email"""
@@ -58,6 +318,7 @@ class SendGridEmailSender:
                 message.add_cc(Cc(cc_email))
                 print(f"📧 CC: {cc_email}")
             
+            self._add_attachments(message, attachments)
             response = self.client.send(message)
             print(f"✅ SendGrid: Email sent to {to_email} from {from_email}")
             if cc_email:
@@ -69,7 +330,7 @@ class SendGridEmailSender:
             # Log more details for debugging
             import traceback
             print(f"Full traceback: {traceback.format_exc()}")
-            raise Exception(error_msg)  # Raise instead of returning False
+            raise Exception(error_msg) from e  # Raise instead of returning False
 
 
 class YagmailEmailSender:
@@ -82,42 +343,107 @@ class YagmailEmailSender:
             raise ValueError("Please set EMAIL_USER and EMAIL_PASSWORD in .env file")
         
         # Get SMTP settings from environment or use defaults
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '465'))  # Default to 465 (SSL)
+        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+        self.smtp_port = int(os.getenv('SMTP_PORT', '465'))  # Default to 465 (SSL)
+        
+        if self.smtp_port == 465:
+            # SSL/TLS on port 465 (recommended for Render.com)
+            print(f"📧 Yagmail configured: {self.smtp_server}:465 (SSL)")
+        elif self.smtp_port == 587:
+            # STARTTLS on port 587 (works locally, may be blocked on cloud)
+            print(f"⚠️  Yagmail configured: {self.smtp_server}:587 (STARTTLS)")
+            print(f"⚠️  Note: Port 587 may be blocked on cloud providers like Render.com")
+        else:
+            print(f"📧 Yagmail configured: {self.smtp_server}:{self.smtp_port}")
         
-        # Configure based on port
-        if smtp_port == 465:
-            # Use SSL/TLS on port 465 (recommended for Render.com)
-            self.yag = yagmail.SMTP(
+        # Connections are opened on first use and then reused
+        self.pool = SMTPConnectionPool(self._connect)
+        self.bucket = TokenBucket(EMAIL_SMTP_RATE, burst=self.pool.size)
+        self.max_concurrency = self.pool.size
+    
+    def _connect(self) -> yagmail.SMTP:
+        """A new (not yet logged-in) yagmail client for the configured server"""
+        if self.smtp_port == 465:
+            return yagmail.SMTP(
                 user=self.email_user,
                 password=self.email_password,
-                host=smtp_server,
+                host=self.smtp_server,
                 port=465,
                 smtp_starttls=False,
                 smtp_ssl=True
             )
-            print(f"📧 Yagmail configured: {smtp_server}:465 (SSL)")
-        elif smtp_port == 587:
-            # Use STARTTLS on port 587 (works locally, may be blocked on cloud)
-            self.yag = yagmail.SMTP(
+        if self.smtp_port == 587:
+            return yagmail.SMTP(
                 user=self.email_user,
                 password=self.email_password,
-                host=smtp_server,
+                host=self.smtp_server,
                 port=587,
                 smtp_starttls=True,
                 smtp_ssl=False
             )
-            print(f"⚠️  Yagmail configured: {smtp_server}:587 (STARTTLS)")
-            print(f"⚠️  Note: Port 587 may be blocked on cloud providers like Render.com")
-        else:
-            # Custom port
-            self.yag = yagmail.SMTP(
-                user=self.email_user,
-                password=self.email_password,
-                host=smtp_server,
-                port=smtp_port
+        return yagmail.SMTP(
+            user=self.email_user,
+            password=self.email_password,
+            host=self.smtp_server,
+            port=self.smtp_port
+        )
+    
+    @staticmethod
+    def _prepare(yag: yagmail.SMTP, to_email, subject: str, contents: str, attachments, headers: dict, cc_list):
+        """
+        yag.prepare_send, except that in-memory attachments are spliced in
+        as their cached, already serialized MIME parts instead of being
+        encoded and serialized by yagmail for every message
+        """
+        in_memory = [attachment for attachment in attachments or [] if isinstance(attachment, Attachment)]
+        paths = [attachment for attachment in attachments or [] if not isinstance(attachment, Attachment)] or None
+        if not in_memory:
+            return yag.prepare_send(to=to_email, subject=subject, contents=contents,
+                                    attachments=paths, headers=headers, cc=cc_list)
+        
+        addresses = resolve_addresses(yag.user, yag.useralias, to_email, cc_list, None)
+        if yag.soft_email_validation:
+            for address in addresses["recipients"]:
+                validate_email_with_regex(address)
+        message = prepare_message(yag.user, yag.useralias, addresses, subject, contents, paths, headers, yag.encoding)
+        # A boundary of our own (base64 never contains '=' runs like it), so
+        # the parts can go in as text just before the closing delimiter
+        boundary = f"==============={uuid.uuid4().hex}=="
+        message.set_boundary(boundary)
+        head, closing, tail = message.as_string().rpartition(f"--{boundary}--")
+        parts = "".join(f"--{boundary}\n{attachment.mime_part()}\n" for attachment in in_memory)
+        return addresses["recipients"], head + parts + closing + tail
+    
+    def _send(self, to_email, subject: str, contents: str, attachments, headers: dict, cc_list):
+        """Send over a pooled connection; a dropped session is re-established once"""
+        with self.pool.connection() as yag:
+            recipients, message = self._prepare(yag, to_email, subject, contents, attachments, headers, cc_list)
+            try:
+                refused = yag.smtp.sendmail(yag.user, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                yag.login()
+                refused = yag.smtp.sendmail(yag.user, recipients, message)
+        # sendmail only raises when every recipient is refused; a refused
+        # lead is a failure even if the CC copy went out
+        to_list = [to_email] if isinstance(to_email, str) else list(to_email)
+        if any(address in refused for address in to_list):
+            raise smtplib.SMTPRecipientsRefused(refused)
+    
+    def batches(self, emails: List[OutboundEmail]) -> List[List[OutboundEmail]]:
+        """SMTP sends one message per recipient"""
+        return [[email] for email in emails]
+    
+    def send_batch(self, batch: List[OutboundEmail]):
+        for email in batch:
+            self._send(
+                email.to_email,
+                email.subject,
+                email.contents,
+                email.attachments or None,
+                {'Reply-To': email.from_email},
+                [email.cc_email] if email.cc_email else None
             )
-            print(f"📧 Yagmail configured: {smtp_server}:{smtp_port}")
+        print(f"✅ Yagmail: Email sent to {', '.join(email.to_email for email in batch)}")
     
     def send_email(
         self,
@@ -125,7 +451,7 @@ class YagmailEmailSender:
         to_email: Union[str, List[str]],
         subject: str,
         contents: str,
-        attachments: List[str] = None,
+        attachments: List[Union[Attachment, str]] = None,
         cc_email: str = None
     ) -> bool:
         """
@@ -153,13 +479,13 @@ class YagmailEmailSender:
                 cc_list = [cc_email] if isinstance(cc_email, str) else cc_email
                 print(f"📧 CC: {cc_email}")
             
-            self.yag.send(
-                to=to_email,
-                subject=subject,
-                contents=contents,  # Clean content without banners
-                attachments=attachments,
-                headers=headers,
-                cc=cc_list
+            self._send(
+                to_email,
+                subject,
+                contents,  # Clean content without banners
+                attachments,
+                headers,
+                cc_list
             )
             
             print(f"✅ Yagmail: Email sent to {to_email} (on behalf of {from_email})")
@@ -173,7 +499,45 @@ class YagmailEmailSender:
             # Log more details for debugging
             import traceback
             print(f"Full traceback: {traceback.format_exc()}")
-            raise Exception(error_msg)  # Raise instead of returning False
+            raise Exception(error_msg) from e  # Raise instead of returning False
+
+
+class OutboxEngine:
+    """
+    Sends many messages through one provider: batches them (see the
+    provider's batches()), runs up to EMAIL_SEND_CONCURRENCY batches at once
+    and paces provider calls with its token bucket.
+    """
+    def __init__(self, provider, method: str, concurrency: int = EMAIL_SEND_CONCURRENCY):
+        self.provider = provider
+        self.method = method
+        self.concurrency = max(1, min(concurrency, getattr(provider, 'max_concurrency', concurrency)))
+    
+    def _send_batch(self, batch: List[OutboundEmail]) -> List[dict]:
+        wait = self.provider.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            self.provider.send_batch(batch)
+        except Exception as e:
+            print(f"❌ {self.method} failed for {len(batch)} recipients: {str(e)}")
+            # A rejected multi-recipient request may be one bad address; only
+            # single messages are failed for good
+            permanent = len(batch) == 1 and is_permanent_error(e)
+            return [send_result(email, self.method, e, permanent) for email in batch]
+        return [send_result(email, self.method) for email in batch]
+    
+    def send(self, emails: List[OutboundEmail]) -> List[dict]:
+        """Send all emails; returns one result per email, in order"""
+        if not emails:
+            return []
+        batches = self.provider.batches(emails)
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            for batch_results in pool.map(self._send_batch, batches):
+                for result in batch_results:
+                    results[result["message_id"]] = result
+        return [results[email.message_id] for email in emails]
 
 
 class EmailSender:
@@ -181,37 +545,57 @@ class EmailSender:
     Smart email sender that tries multiple methods:
     1. SendGrid (if API key provided) - RECOMMENDED for production
     2. Yagmail with Reply-To (if Gmail credentials provided) - Good for testing
+    
+    Every configured method is kept. A method that keeps failing is skipped
+    for EMAIL_FAILOVER_COOLDOWN seconds and sends fail over to the next one.
     """
     def __init__(self):
-        self.sender = None
-        self.method = None
+        # method -> sender, in order of preference
+        self.providers = {}
         
-        # Try SendGrid first (production method)
+        # SendGrid first (production method), then Yagmail
         try:
-            self.sender = SendGridEmailSender()
-            self.method = "sendgrid"
+            self.providers["sendgrid"] = SendGridEmailSender()
             print("✅ Email Service: SendGrid (sends from user's actual email)")
-        except (ImportError, ValueError) as e:
-            # Fall back to Yagmail
-            try:
-                self.sender = YagmailEmailSender()
-                self.method = "yagmail"
+        except (ImportError, ValueError):
+            pass
+        try:
+            self.providers["yagmail"] = YagmailEmailSender()
+            if self.providers.keys() == {"yagmail"}:
                 print("✅ Email Service: Yagmail (uses Reply-To header)")
                 print("   💡 Tip: For production, use SendGrid to send from actual user emails")
-            except ValueError:
-                raise ValueError(
-                    "❌ No email service configured!\n\n"
-                    "Choose one option:\n\n"
-                    "OPTION 1 (Recommended for Production):\n"
-                    "  - Get SendGrid API key: https://sendgrid.com\n"
-                    "  - Add to .env: SENDGRID_API_KEY=your_key\n"
-                    "  - Verify sender emails in SendGrid dashboard\n"
-                    "  - pip install sendgrid\n\n"
-                    "OPTION 2 (Good for Testing):\n"
-                    "  - Add to .env: EMAIL_USER=your@gmail.com\n"
-                    "  - Add to .env: EMAIL_PASSWORD=app_password\n"
-                    "  - Note: Emails will be sent 'on behalf of' user\n"
-                )
+            else:
+                print("✅ Email Service: Yagmail configured as failover")
+        except ValueError:
+            pass
+        
+        if not self.providers:
+            raise ValueError(
+                "❌ No email service configured!\n\n"
+                "Choose one option:\n\n"
+                "OPTION 1 (Recommended for Production):\n"
+                "  - Get SendGrid API key: https://sendgrid.com\n"
+                "  - Add to .env: SENDGRID_API_KEY=your_key\n"
+                "  - Verify sender emails in SendGrid dashboard\n"
+                "  - pip install sendgrid\n\n"
+                "OPTION 2 (Good for Testing):\n"
+                "  - Add to .env: EMAIL_USER=your@gmail.com\n"
+                "  - Add to .env: EMAIL_PASSWORD=app_password\n"
+                "  - Note: Emails will be sent 'on behalf of' user\n"
+            )
+        
+        # Preferred method
+        self.method = next(iter(self.providers))
+        self.sender = self.providers[self.method]
+        self.outboxes = {method: OutboxEngine(provider, method) for method, provider in self.providers.items()}
+        self.health = {method: ProviderHealth() for method in self.providers}
+    
+    def methods(self) -> List[str]:
+        """Methods to try, in order: healthy ones by preference, then the rest by recovery time"""
+        healthy = [method for method in self.providers if self.health[method].available]
+        resting = sorted((method for method in self.providers if method not in healthy),
+                         key=lambda method: self.health[method].down_until)
+        return healthy + resting
     
     def send_email(
         self,
@@ -219,65 +603,99 @@ class EmailSender:
         to_email: Union[str, List[str]],
         subject: str,
         contents: str,
-        attachments: List[str] = None,
+        attachments: List[Union[Attachment, str]] = None,
         cc_email: str = None
     ) -> dict:
         """
-        Send email using configured method.
+        Send email using the first working method.
         
         Args:
             from_email: User's email address (actual sender or Reply-To)
             to_email: Recipient email address
             subject: Email subject
             contents: Email body (HTML supported)
-            attachments: Optional file paths
+            attachments: Optional Attachments (in memory) or file paths
             cc_email: Optional CC email address (user gets a copy)
             
         Returns:
             dict: {success: bool, method: str, message: str}
         """
-        try:
-            # This will now raise an exception if it fails
-            success = self.sender.send_email(
-                from_email=from_email,
-                to_email=to_email,
-                subject=subject,
-                contents=contents,
-                attachments=attachments,
-                cc_email=cc_email
-            )
+        errors = []
+        method = self.method
+        for method in self.methods():
+            try:
+                # Raises if the send fails
+                self.providers[method].send_email(
+                    from_email=from_email,
+                    to_email=to_email,
+                    subject=subject,
+                    contents=contents,
+                    attachments=attachments,
+                    cc_email=cc_email
+                )
+            except Exception as e:
+                errors.append(str(e))
+                if is_permanent_error(e):
+                    break
+                self.health[method].record(False)
+                continue
             
-            # If we get here, it succeeded
-            message = f"Email sent successfully via {self.method}"
+            self.health[method].record(True)
+            message = f"Email sent successfully via {method}"
             if cc_email:
                 message += f" (copy sent to {cc_email})"
             
             return {
                 "success": True,
-                "method": self.method,
+                "method": method,
                 "message": message,
                 "from": from_email,
                 "to": to_email,
                 "cc": cc_email
             }
-        except Exception as e:
-            # Now we have the actual error message
-            return {
-                "success": False,
-                "method": self.method,
-                "message": str(e),  # Use the actual error message
-                "from": from_email,
-                "to": to_email,
-                "cc": cc_email
-            }
+        
+        return {
+            "success": False,
+            "method": method,
+            "message": "; ".join(errors),  # Every provider's actual error
+            "from": from_email,
+            "to": to_email,
+            "cc": cc_email
+        }
+    
+    def send_bulk(self, emails: List[OutboundEmail]) -> List[dict]:
+        """
+        Send many emails concurrently within each provider's rate limit;
+        recipients that fail with a transient error are retried on the next
+        method.
+        
+        Returns:
+            list: one {message_id, to, cc, success, permanent, method, message} per email
+        """
+        results = {}
+        pending = list(emails)
+        for method in self.methods():
+            if not pending:
+                break
+            retry = []
+            for email, result in zip(pending, self.outboxes[method].send(pending)):
+                results[email.message_id] = result
+                if not result["success"] and not result["permanent"]:
+                    retry.append(email)
+            # Healthy unless every recipient failed transiently
+            self.health[method].record(len(retry) < len(pending))
+            pending = retry
+        return [results[email.message_id] for email in emails]
 
 
 # Singleton instance
 _email_sender = None
+_email_sender_lock = threading.Lock()
 
 def get_email_sender():
     """Get or create email sender singleton"""
     global _email_sender
-    if _email_sender is None:
-        _email_sender = EmailSender()
+    with _email_sender_lock:
+        if _email_sender is None:
+            _email_sender = EmailSender()
     return _email_sender
@@ -0,0 +1,96 @@
+"""
+Email Templates
+Mail merge for campaigns: one subject/body template rendered for every lead.
+1. EmailTemplate - {{field}} placeholders over lead fields, parsed once into
+   literal text and field lookups, so rendering a lead is a join rather than
+   a regex pass; {{field | fallback}} is used when the field is empty,
+   {{social_media.linkedin}} reaches into nested fields and list fields are
+   joined with ", "
+2. compile_template - compiled templates cached by source, so a template
+   reused across campaigns is parsed only once per process
+3. CampaignTemplate.render_all - renders leads lazily, one at a time, so a
+   campaign is queued as it renders instead of after every body is built
+
+Values are HTML-escaped in bodies (the lead data is scraped or generated,
+not trusted) and inserted as-is in subjects.
+"""
+
+import html
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*(?:\|\s*(.*?)\s*)?\}\}')
+# Compiled templates kept per process
+EMAIL_TEMPLATE_CACHE_SIZE = int(os.getenv('EMAIL_TEMPLATE_CACHE_SIZE', '128'))
+
+
+class EmailTemplate:
+    """A template parsed into literal text and (field path, fallback) lookups"""
+    def __init__(self, source: str, escape: bool = False, fields: Optional[Iterable[str]] = None):
+        self.source = source
+        self.escape = escape
+        # Literal text with an empty slot per placeholder, and what fills each slot
+        self.parts: List[str] = []
+        self.lookups: List[Tuple[int, Tuple[str, ...], str]] = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            self.parts.append(source[position:match.start()])
+            self.lookups.append((len(self.parts), tuple(match.group(1).split('.')), match.group(2) or ''))
+            self.parts.append('')
+            position = match.end()
+        self.parts.append(source[position:])
+
+        if fields is not None:
+            known = set(fields)
+            unknown = sorted({'.'.join(path) for path in self.placeholders() if path[0] not in known})
+            if unknown:
+                raise ValueError(f"Unknown template fields: {', '.join(unknown)}")
+
+    def placeholders(self) -> List[Tuple[str, ...]]:
+        return [path for _, path, _ in self.lookups]
+
+    @staticmethod
+    def _lookup(lead: Dict, path: Tuple[str, ...]) -> Any:
+        value = lead
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def render(self, lead: Dict) -> str:
+        rendered = list(self.parts)
+        for slot, path, fallback in self.lookups:
+            value = self._lookup(lead, path)
+            if isinstance(value, (list, tuple)):
+                value = ', '.join(str(item) for item in value if item)
+            text = str(value) if value not in (None, '') else fallback
+            rendered[slot] = html.escape(text) if self.escape else text
+        return ''.join(rendered)
+
+
+@lru_cache(maxsize=EMAIL_TEMPLATE_CACHE_SIZE)
+def compile_template(source: str, escape: bool = False, fields: Optional[Tuple[str, ...]] = None) -> EmailTemplate:
+    """Get the compiled template for a source (raises ValueError for unknown fields)"""
+    return EmailTemplate(source, escape, fields)
+
+
+class CampaignTemplate:
+    """Subject and body templates rendered together for each lead"""
+    def __init__(self, subject: str, body: str, fields: Optional[Iterable[str]] = None):
+        fields = tuple(sorted(fields)) if fields is not None else None
+        self.subject = compile_template(subject, False, fields)
+        self.body = compile_template(body, True, fields)
+
+    def render(self, lead: Dict) -> Tuple[str, str]:
+        # Header values cannot contain line breaks
+        subject = ' '.join(self.subject.render(lead).split())
+        return subject, self.body.render(lead)
+
+    def render_all(self, leads: Iterable[Dict]) -> Iterator[Tuple[Dict, str, str]]:
+        """(lead, subject, body) for each lead, rendered as they are consumed"""
+        for lead in leads:
+            subject, body = self.render(lead)
+            yield lead, subject, body
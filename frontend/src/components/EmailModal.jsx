@@ -10,6 +10,31 @@ import 'react-quill/dist/quill.snow.css'
 import axios from 'axios'
 import { API_BASE_URL, API_ENDPOINTS } from '../config/api'
 
+// The API queues emails and delivers them in the background; wait this long
+// for the outcome before telling the user it is still on its way
+const DELIVERY_WAIT_MS = 15000
+const DELIVERY_POLL_MS = 1500
+
+async function waitForDelivery(messageId) {
+  const deadline = Date.now() + DELIVERY_WAIT_MS
+  let status = null
+  while (Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, DELIVERY_POLL_MS))
+    try {
+      const response = await axios.get(API_BASE_URL + API_ENDPOINTS.emailStatus(messageId))
+      status = response.data
+    } catch (error) {
+      // The email is queued either way; report it as on its way
+      console.error('Email status error:', error)
+      return status
+    }
+    if (status.status === 'sent' || status.status === 'failed') {
+      break
+    }
+  }
+  return status
+}
+
 export default function EmailModal({ company, onClose }) {
   const [fromEmail, setFromEmail] = useState('')
   const [subject, setSubject] = useState(`Partnership Opportunity with ${company.company_name}`)
@@ -127,8 +152,16 @@ export default function EmailModal({ company, onClose }) {
         const attachmentInfo = attachments.length > 0 
           ? ` with ${attachments.length} attachment(s)` 
           : ''
-        alert(`✅ Email sent successfully${attachmentInfo}!\n\n📧 Sent to: ${toEmail}\n📬 CC copy sent to: ${fromEmail}`)
-        onClose()
+        const delivery = await waitForDelivery(response.data.message_id)
+        if (delivery?.status === 'sent') {
+          alert(`✅ Email sent successfully${attachmentInfo}!\n\n📧 Sent to: ${toEmail}\n📬 CC copy sent to: ${fromEmail}`)
+          onClose()
+        } else if (delivery?.status === 'failed') {
+          alert(`❌ The email to ${toEmail} could not be delivered.\n\nError: ${delivery.last_error || 'Unknown error'}`)
+        } else {
+          alert(`📨 Email queued${attachmentInfo} and will be delivered shortly.\n\n📧 To: ${toEmail}\n📬 CC copy to: ${fromEmail}\n\nIt is retried automatically if the mail server is busy.`)
+          onClose()
+        }
       }
     } catch (error) {
       console.error('Email send error:', error)
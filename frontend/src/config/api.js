@@ -25,6 +25,7 @@ export const API_ENDPOINTS = {
   generateLeadsAsync: '/api/v1/leads/generate-async',
   jobStatus: (jobId) => `/api/v1/leads/status/${jobId}`,
   sendEmail: '/api/v1/email/send',
+  emailStatus: (messageId) => `/api/v1/email/status/${messageId}`,
   generateEmailContent: '/api/v1/email/generate-content'
 }
 
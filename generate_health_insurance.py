@@ -1,14 +1,246 @@
 import os
 import json
 import time
+import asyncio
 import logging
-from openai import OpenAI, APIError, APIConnectionError, RateLimitError
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from openai import OpenAI, AsyncOpenAI, APIError, APIConnectionError, RateLimitError
 from dotenv import load_dotenv
 
+from cache import MemoryCache, SQLiteCache, TieredCache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Bump when the generate_companies prompt changes so old answers are not reused
+PROMPT_VERSION = 1
+
+# Response cache for generate_companies: in-process tier + SQLite tier shared
+# by all workers on the host
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000'))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '200'))
+
+# Sharded generation: companies per LLM call and concurrent calls
+LLM_SHARD_SIZE = int(os.getenv('LLM_SHARD_SIZE', '10'))
+LLM_SHARD_WORKERS = int(os.getenv('LLM_SHARD_WORKERS', '5'))
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Get or create the shared LLM response cache (None if disabled)"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = TieredCache(
+                MemoryCache(ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MEMORY_ENTRIES),
+                SQLiteCache('llm_responses', ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+            )
+    return _llm_cache
+
+
+def companies_cache_key(industry: str, country: str) -> str:
+    """
+    Cache key for a generate_companies query.
+
+    The count is deliberately not part of the key: one entry per
+    (prompt version, industry, country) holds the largest list generated so
+    far, and smaller requests are served by slicing it.
+    """
+    normalize = lambda value: ' '.join(str(value).lower().split())
+    return f"companies:v{PROMPT_VERSION}:{normalize(industry)}:{normalize(country)}"
+
+
+def cached_companies(cache, industry: str, number: int, country: str):
+    """Return a cached result covering `number` companies, sliced to size, or None"""
+    key = companies_cache_key(industry, country)
+    entry = cache.get(key)
+    # Another worker may have stored a larger list in the shared tier
+    if entry is not None and entry.metadata.get('requested', 0) < number and hasattr(cache, 'shared'):
+        entry = cache.shared.get(key)
+    if entry is None or entry.metadata.get('requested', 0) < number:
+        return None
+    result = entry.value
+    result['companies'] = result.get('companies', [])[:number]
+    logger.info(f"LLM cache hit: {key} (requested {number}, cached {entry.metadata.get('requested')})")
+    return result
+
+_COMPANY_SUFFIXES = re.compile(
+    r'\b(inc|incorporated|llc|ltd|limited|corp|corporation|co|company|plc|group|holdings|sa|ag|gmbh)\b'
+)
+
+
+def company_keys(company):
+    """Normalized name and domain used to spot the same company twice"""
+    keys = set()
+    name = (company.get('company_name') or '').lower()
+    name = re.sub(r'[^a-z0-9 ]+', ' ', name.replace('&', ' and '))
+    name = ' '.join(_COMPANY_SUFFIXES.sub(' ', name).split())
+    if name:
+        keys.add(f"name:{name}")
+    website = company.get('website_url') or ''
+    if website:
+        netloc = urlparse(website if '//' in website else f"//{website}").netloc.lower()
+        if netloc.startswith('www.'):
+            netloc = netloc[4:]
+        if netloc:
+            keys.add(f"domain:{netloc}")
+    return keys
+
+
+def dedupe_companies(companies):
+    """Drop companies whose normalized name or domain was already seen"""
+    seen = set()
+    unique = []
+    for company in companies:
+        if not isinstance(company, dict):
+            continue
+        keys = company_keys(company)
+        if keys & seen:
+            continue
+        seen |= keys
+        unique.append(company)
+    return unique
+
+
+def classify_api_error(e):
+    """
+    Classify an API exception.
+    
+    Returns:
+        (error_code, retryable) - only 503/overload, 429/rate limit and
+        connection errors are worth retrying
+    """
+    error_str = str(e).lower()
+    
+    # Try to extract status code from various exception attributes
+    error_code = None
+    if hasattr(e, 'status_code'):
+        error_code = e.status_code
+    elif hasattr(e, 'response') and hasattr(e.response, 'status_code'):
+        error_code = e.response.status_code
+    elif hasattr(e, 'code'):
+        error_code = e.code
+    
+    # Check if it's a 503 or overload error
+    is_503_error = (
+        error_code == 503 or
+        '503' in str(e) or
+        'overloaded' in error_str or
+        'unavailable' in error_str or
+        'service unavailable' in error_str or
+        'model is overloaded' in error_str
+    )
+    
+    # Check if it's a rate limit error (429)
+    try:
+        is_rate_limit_type = isinstance(e, RateLimitError)
+    except (NameError, TypeError):
+        is_rate_limit_type = False
+    
+    is_rate_limit = (
+        error_code == 429 or
+        is_rate_limit_type or
+        'rate limit' in error_str or
+        'too many requests' in error_str
+    )
+    
+    # Check if it's a connection error
+    try:
+        is_connection_error_type = isinstance(e, APIConnectionError)
+    except (NameError, TypeError):
+        is_connection_error_type = False
+    
+    is_connection_error = (
+        is_connection_error_type or
+        'connection' in error_str or
+        'timeout' in error_str or
+        'network' in error_str
+    )
+    
+    return error_code, (is_503_error or is_rate_limit or is_connection_error)
+
+
+class CompanyStreamParser:
+    """
+    Incremental parser for a streamed {"companies": [...]} answer.
+    
+    feed() takes raw text chunks as they arrive and returns every company
+    object that became complete. Only the new characters are scanned, with
+    string/escape tracking so braces inside values don't confuse it.
+    Markdown fences and any text around the JSON are ignored.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0          # next character to scan
+        self.in_array = False      # inside the "companies" array
+        self.depth = 0             # brace depth of the current object
+        self.object_start = None
+        self.in_string = False
+        self.escaped = False
+        self.finished = False
+    
+    def feed(self, chunk):
+        self.buffer += chunk
+        companies = []
+        
+        if not self.in_array:
+            key = self.buffer.find('"companies"')
+            bracket = self.buffer.find('[', key) if key != -1 else -1
+            if bracket == -1:
+                return companies
+            self.in_array = True
+            self.position = bracket + 1
+        
+        buffer = self.buffer
+        while self.position < len(buffer) and not self.finished:
+            char = buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                if self.depth == 0:
+                    self.object_start = self.position
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    raw = buffer[self.object_start:self.position + 1]
+                    try:
+                        companies.append(json.loads(raw))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Skipping unparseable company in stream: {e}")
+                    self.object_start = None
+            elif char == ']' and self.depth == 0:
+                self.finished = True
+            self.position += 1
+        
+        # Drop text that can no longer be part of an object
+        if self.object_start is None:
+            self.buffer = buffer[self.position:]
+            self.position = 0
+        elif self.object_start > 0:
+            self.buffer = buffer[self.object_start:]
+            self.position -= self.object_start
+            self.object_start = 0
+        return companies
+
+
 class GeminiClient:
     def __init__(self):
         # Gemini's OpenAI-compatible endpoint
@@ -18,8 +250,13 @@ class GeminiClient:
             api_key=os.getenv('GEMINI_API_KEY'),
             base_url=base_url
         )
+        # Used by stream_companies
+        self.async_client = AsyncOpenAI(
+            api_key=os.getenv('GEMINI_API_KEY'),
+            base_url=base_url
+        )
     
-    def generate_companies(self, industry, number, country, max_retries=5, initial_delay=2):
+    def generate_companies(self, industry, number, country, max_retries=5, initial_delay=2, use_cache=True):
         """
         Generate companies with automatic retry logic for 503 errors.
         
@@ -29,6 +266,7 @@ class GeminiClient:
             country: Country to focus on
             max_retries: Maximum number of retry attempts (default: 5)
             initial_delay: Initial delay in seconds before first retry (default: 2)
+            use_cache: Serve/store results in the LLM response cache (default: True)
         
         Returns:
             JSON response with companies data
@@ -36,8 +274,173 @@ class GeminiClient:
         Raises:
             Exception: If all retries are exhausted
         """
-        prompt = f"""
+        cache = get_llm_cache() if use_cache else None
+        if cache:
+            cached = cached_companies(cache, industry, number, country)
+            if cached is not None:
+                return cached
+        
+        prompt = self.build_companies_prompt(industry, number, country)
+        response_text = self._complete(prompt, max_retries, initial_delay)
+        json_response = self._parse_companies(response_text)
+        if cache and isinstance(json_response, dict) and json_response.get('companies'):
+            cache.set(companies_cache_key(industry, country), json_response, {'requested': number})
+        return json_response
+    
+    async def stream_companies(self, industry, number, country, max_retries=5, initial_delay=2, use_cache=True):
+        """
+        Async generator yielding each company as soon as the model has produced it.
+        
+        Uses a streamed chat completion and CompanyStreamParser, so the first
+        lead arrives after a few seconds instead of after the whole list.
+        Connection/overload errors are retried with backoff only until the
+        first company has been yielded; later errors are raised.
+        
+        Yields:
+            dict: one company object at a time (same shape as generate_companies)
+        """
+        cache = get_llm_cache() if use_cache else None
+        if cache:
+            cached = cached_companies(cache, industry, number, country)
+            if cached is not None:
+                for company in cached['companies']:
+                    yield company
+                return
+        
+        prompt = self.build_companies_prompt(industry, number, country)
+        companies = []
+        
+        for attempt in range(max_retries):
+            parser = CompanyStreamParser()
+            try:
+                stream = await self.async_client.chat.completions.create(
+                    model="gemini-2.5-flash",
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if not text:
+                        continue
+                    for company in parser.feed(text):
+                        if isinstance(company, dict):
+                            companies.append(company)
+                            yield company
+                break
+            except Exception as e:
+                error_code, retryable = classify_api_error(e)
+                if companies or not retryable or attempt == max_retries - 1:
+                    logger.error(f"Streaming generation failed: {e}")
+                    raise Exception(f"Error code: {error_code or 'UNKNOWN'} - {str(e)}")
+                delay = min(initial_delay * (2 ** attempt), 60)
+                logger.warning(
+                    f"API error (attempt {attempt + 1}/{max_retries}): {e}. "
+                    f"Retrying in {delay} seconds..."
+                )
+                await asyncio.sleep(delay)
+        
+        if cache and companies:
+            cache.set(companies_cache_key(industry, country), {'companies': companies}, {'requested': number})
+    
+    def generate_companies_sharded(self, industry, number, country, shard_size=LLM_SHARD_SIZE,
+                                   max_workers=LLM_SHARD_WORKERS, max_retries=5, initial_delay=2,
+                                   use_cache=True, on_shard=None):
+        """
+        Generate a large list as several small concurrent LLM calls.
+        
+        N is split into chunks of `shard_size` and each chunk prompt asks for
+        a different rank range (#1-#25, #26-#50, ...), so the shards run
+        concurrently without knowing each other's results. Overlaps between
+        ranges are removed afterwards by normalized name/domain, and a single
+        top-up call, which excludes every name collected so far, fills any gap
+        left by duplicates or failed shards. Latency is close to that of one
+        small call, and one failing shard no longer loses the whole batch.
+        
+        Requests of at most `shard_size` companies use generate_companies.
+        on_shard(companies), if given, is called with each shard's companies
+        as it arrives (before deduplication), e.g. to report progress.
+        
+        Returns:
+            JSON response with companies data (same shape as generate_companies)
+        """
+        if number <= shard_size:
+            return self.generate_companies(industry, number, country, max_retries, initial_delay, use_cache)
+        
+        cache = get_llm_cache() if use_cache else None
+        if cache:
+            cached = cached_companies(cache, industry, number, country)
+            if cached is not None:
+                return cached
+        
+        shards = []
+        for start in range(0, number, shard_size):
+            count = min(shard_size, number - start)
+            shards.append((start + 1, start + count))
+        logger.info(f"Sharded generation: {number} companies in {len(shards)} calls of up to {shard_size}")
+        
+        shard_results = [[] for _ in shards]
+        errors = []
+        
+        def run_shard(first, last):
+            hint = (
+                f"Rank the {industry} companies in {country} by size and market presence, "
+                f"and return only those ranked #{first} to #{last}."
+            )
+            return self._generate_shard(industry, last - first + 1, country, hint, max_retries, initial_delay)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards)))) as pool:
+            futures = {pool.submit(run_shard, first, last): index for index, (first, last) in enumerate(shards)}
+            for future in as_completed(futures):
+                try:
+                    shard_results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.warning(f"Shard failed: {e}")
+                    errors.append(e)
+                    continue
+                # Outside the try: an error raised by the callback (e.g. the job
+                # was cancelled) is not a shard failure and must propagate
+                if on_shard:
+                    on_shard(shard_results[futures[future]])
+        
+        # Keep rank order across shards
+        companies = dedupe_companies([company for shard in shard_results for company in shard])
+        
+        # Top up once if duplicates or failed shards left us short
+        missing = number - len(companies)
+        if missing > 0 and companies:
+            exclude = ', '.join(c.get('company_name') for c in companies if c.get('company_name'))
+            hint = f"Do not include any of these companies: {exclude}." if exclude else ""
+            try:
+                companies = dedupe_companies(
+                    companies + self._generate_shard(industry, missing, country, hint, max_retries, initial_delay)
+                )
+            except Exception as e:
+                logger.warning(f"Top-up call failed: {e}")
+                errors.append(e)
+        
+        if not companies:
+            raise errors[-1] if errors else Exception("Sharded generation returned no companies")
+        
+        result = {'companies': companies[:number]}
+        if cache and not errors:
+            cache.set(companies_cache_key(industry, country), result, {'requested': number})
+        return result
+    
+    def _generate_shard(self, industry, number, country, extra_instructions, max_retries, initial_delay):
+        """One uncached generation call; returns the list of companies"""
+        prompt = self.build_companies_prompt(industry, number, country, extra_instructions)
+        result = self._parse_companies(self._complete(prompt, max_retries, initial_delay))
+        if not isinstance(result, dict) or 'companies' not in result:
+            raise Exception(result.get('error', 'Invalid response') if isinstance(result, dict) else 'Invalid response')
+        return result['companies']
+    
+    def build_companies_prompt(self, industry, number, country, extra_instructions=""):
+        """Prompt asking for `number` companies as JSON (extra_instructions narrows the list)"""
+        return f"""
         You are a professional lead generation expert. Generate a comprehensive list of {number} companies in the {industry} industry that are based in or operate in {country}.
+        {extra_instructions}
         
         **IMPORTANT: You must return your response as a valid JSON object only. Do not include any markdown formatting, code blocks, or additional text outside the JSON.**
         
@@ -81,6 +484,8 @@ class GeminiClient:
         Remember: Return ONLY the JSON object, no additional text or formatting.
         """
         
+    def _complete(self, prompt, max_retries=5, initial_delay=2):
+        """Run a chat completion with exponential backoff; returns the response text"""
         last_exception = None
         
         for attempt in range(max_retries):
@@ -100,55 +505,10 @@ class GeminiClient:
                 
             except Exception as e:
                 last_exception = e
-                error_str = str(e).lower()
-                
-                # Try to extract status code from various exception attributes
-                error_code = None
-                if hasattr(e, 'status_code'):
-                    error_code = e.status_code
-                elif hasattr(e, 'response') and hasattr(e.response, 'status_code'):
-                    error_code = e.response.status_code
-                elif hasattr(e, 'code'):
-                    error_code = e.code
-                
-                # Check if it's a 503 or overload error
-                is_503_error = (
-                    error_code == 503 or
-                    '503' in str(e) or
-                    'overloaded' in error_str or
-                    'unavailable' in error_str or
-                    'service unavailable' in error_str or
-                    'model is overloaded' in error_str
-                )
-                
-                # Check if it's a rate limit error (429)
-                try:
-                    is_rate_limit_type = isinstance(e, RateLimitError)
-                except (NameError, TypeError):
-                    is_rate_limit_type = False
-                
-                is_rate_limit = (
-                    error_code == 429 or
-                    is_rate_limit_type or
-                    'rate limit' in error_str or
-                    'too many requests' in error_str
-                )
-                
-                # Check if it's a connection error
-                try:
-                    is_connection_error_type = isinstance(e, APIConnectionError)
-                except (NameError, TypeError):
-                    is_connection_error_type = False
-                
-                is_connection_error = (
-                    is_connection_error_type or
-                    'connection' in error_str or
-                    'timeout' in error_str or
-                    'network' in error_str
-                )
+                error_code, retryable = classify_api_error(e)
                 
                 # Only retry on 503, 429, or connection errors
-                if not (is_503_error or is_rate_limit or is_connection_error):
+                if not retryable:
                     # Don't retry on other errors
                     logger.error(f"Non-retryable error: {e}")
                     raise Exception(f"Error code: {error_code or 'UNKNOWN'} - {str(e)}")
@@ -176,8 +536,10 @@ class GeminiClient:
             # This shouldn't happen, but just in case
             raise Exception(f"Failed to get response after {max_retries} attempts")
         
-        response_text = response.choices[0].message.content
-        
+        return response.choices[0].message.content
+    
+    def _parse_companies(self, response_text):
+        """Parse the model's JSON answer, tolerating markdown code fences"""
         # Clean up the response if it contains markdown code blocks
         if "```json" in response_text:
             response_text = response_text.split("```json")[1].split("```")[0].strip()
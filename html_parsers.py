@@ -0,0 +1,136 @@
+"""
+HTML Parser Backends
+The scraper only needs a page's visible text and its (href, link_text) anchors,
+so parsing is pluggable:
+1. selectolax - lexbor C parser, fastest (pip install selectolax)
+2. lxml - libxml2 C parser (pip install lxml)
+3. html.parser - BeautifulSoup with Python's built-in parser (always available)
+
+Pick one with SCRAPER_PARSER=selectolax|lxml|html.parser, or leave it on
+"auto" to use the fastest one installed. <script>/<style> contents are
+excluded from page text by every backend, matching BeautifulSoup.get_text().
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+from bs4 import BeautifulSoup
+
+SCRAPER_PARSER = os.getenv('SCRAPER_PARSER', 'auto')
+
+
+class HTMLParserBackend:
+    """BeautifulSoup with the pure-Python html.parser (fallback backend)"""
+    name = 'html.parser'
+
+    def parse(self, html: str) -> Any:
+        return BeautifulSoup(html, 'html.parser')
+
+    def text(self, document: Any) -> str:
+        return document.get_text()
+
+    def anchors(self, document: Any) -> List[Tuple[str, str]]:
+        return [(link['href'], link.get_text()) for link in document.find_all('a', href=True)]
+
+
+class LxmlBackend:
+    """lxml.html parser - C-backed, no BeautifulSoup tree"""
+    name = 'lxml'
+
+    def __init__(self):
+        try:
+            import lxml.html
+            from lxml.etree import ParserError
+            self.lxml_html = lxml.html
+            self.ParserError = ParserError
+        except ImportError:
+            raise ImportError("lxml not installed. Run: pip install lxml")
+
+    def parse(self, html: str) -> Any:
+        try:
+            document = self.lxml_html.fromstring(html)
+        except ValueError:
+            # Strings with an XML encoding declaration must be passed as bytes
+            document = self.lxml_html.fromstring(html.encode('utf-8'))
+        except self.ParserError:
+            # Empty document
+            document = self.lxml_html.fromstring('<html></html>')
+        for element in document.xpath('//script|//style'):
+            element.drop_tree()
+        return document
+
+    def text(self, document: Any) -> str:
+        return document.text_content()
+
+    def anchors(self, document: Any) -> List[Tuple[str, str]]:
+        return [(link.get('href'), link.text_content()) for link in document.iter('a')
+                if link.get('href') is not None]
+
+
+class SelectolaxBackend:
+    """selectolax (lexbor) parser - C-backed, fastest"""
+    name = 'selectolax'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+            self.LexborHTMLParser = LexborHTMLParser
+        except ImportError:
+            raise ImportError("selectolax not installed. Run: pip install selectolax")
+
+    def parse(self, html: str) -> Any:
+        document = self.LexborHTMLParser(html)
+        document.strip_tags(['script', 'style'])
+        return document
+
+    def text(self, document: Any) -> str:
+        return document.root.text() if document.root else ''
+
+    def anchors(self, document: Any) -> List[Tuple[str, str]]:
+        return [(link.attributes.get('href') or '', link.text()) for link in document.css('a[href]')]
+
+
+PARSER_BACKENDS = {
+    'selectolax': SelectolaxBackend,
+    'lxml': LxmlBackend,
+    'html.parser': HTMLParserBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_parser(name: str = SCRAPER_PARSER):
+    """
+    Create a parser backend by name.
+
+    "auto" picks the first installed of selectolax, lxml, html.parser. A
+    named backend that is not installed falls back to html.parser. Backends
+    are stateless, so one instance per name is shared.
+    """
+    if name == 'auto':
+        for backend in PARSER_BACKENDS.values():
+            try:
+                return backend()
+            except ImportError:
+                continue
+
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{name}'. Choose from: auto, {', '.join(PARSER_BACKENDS)}")
+
+    try:
+        return PARSER_BACKENDS[name]()
+    except ImportError as e:
+        print(f"⚠️  {e} - falling back to html.parser")
+        return HTMLParserBackend()
+
+
+def available_parsers() -> List[str]:
+    """Names of the backends that can be used in this environment"""
+    names = []
+    for name, backend in PARSER_BACKENDS.items():
+        try:
+            backend()
+            names.append(name)
+        except ImportError:
+            continue
+    return names
@@ -0,0 +1,358 @@
+"""
+HTTP Fetch Layer
+Pooled HTTP clients used by the web scraper:
+1. PooledFetcher - shared requests.Session with keep-alive and per-host pools (default)
+2. Http2Fetcher - httpx client with optional HTTP/2 (pip install httpx[http2])
+
+Both count requests and newly opened connections per thread, so a caller can
+measure how many TCP/TLS handshakes connection reuse saved (see track_fetches).
+
+fetch() streams a document, rejects unwanted Content-Types before reading the
+body, and stops reading at a byte cap. stream() yields the same capped body
+chunk by chunk, for incremental parsers (e.g. large sitemaps).
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from robots import ROBOTS_USER_AGENT
+
+# Identify as the product token robots.txt rules are matched against, so
+# sites see the same crawler name their User-agent groups address
+DEFAULT_HEADERS = {
+    'User-Agent': f'Mozilla/5.0 (compatible; {ROBOTS_USER_AGENT}/1.0)'
+}
+
+# Number of hosts to keep pools for, and keep-alive connections per host
+FETCH_POOL_HOSTS = int(os.getenv('FETCH_POOL_HOSTS', '64'))
+FETCH_POOL_PER_HOST = int(os.getenv('FETCH_POOL_PER_HOST', '2'))
+FETCH_HTTP2 = os.getenv('FETCH_HTTP2', '').lower() in ('1', 'true', 'yes')
+
+# Body bytes read per page before a download is cut off
+FETCH_MAX_BYTES = int(os.getenv('FETCH_MAX_BYTES', str(2 * 1024 * 1024)))
+FETCH_CHUNK_SIZE = 16 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+
+# ========== Streamed Documents ==========
+
+class UnsupportedContentType(Exception):
+    """Raised by fetch() when a response is not a type the caller accepts"""
+
+
+class FetchedDocument:
+    """A streamed download, possibly cut off at the byte cap"""
+    def __init__(self, url: str, status_code: int, headers, content: bytes,
+                 encoding: Optional[str], truncated: bool):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.truncated = truncated
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', '')
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+def _check_content_type(url: str, content_type: str, content_types):
+    # Servers that send no Content-Type get the benefit of the doubt
+    media_type = content_type.split(';')[0].strip().lower()
+    if content_types and media_type and media_type not in content_types:
+        raise UnsupportedContentType(f"Skipping {url}: Content-Type {media_type}")
+
+
+def _conditional_headers(headers: Optional[Dict[str, str]], etag: Optional[str],
+                         last_modified: Optional[str]) -> Dict[str, str]:
+    conditional = dict(headers or {})
+    if etag:
+        conditional['If-None-Match'] = etag
+    if last_modified:
+        conditional['If-Modified-Since'] = last_modified
+    return conditional
+
+
+def _read_capped(chunks, max_bytes: int):
+    """Read chunks until max_bytes; returns (content, truncated)"""
+    body = bytearray()
+    for chunk in chunks:
+        body.extend(chunk)
+        if len(body) >= max_bytes:
+            return bytes(body[:max_bytes]), True
+    return bytes(body), False
+
+
+def _capped_chunks(chunks, max_bytes: int) -> Iterator[bytes]:
+    """Yield chunks until max_bytes have been read"""
+    remaining = max_bytes
+    for chunk in chunks:
+        yield chunk[:remaining]
+        remaining -= len(chunk)
+        if remaining <= 0:
+            return
+
+
+# ========== Connection Accounting ==========
+
+_thread_stats = threading.local()
+
+
+def _count(field: str):
+    stats = getattr(_thread_stats, 'current', None)
+    if stats is not None:
+        stats[field] += 1
+
+
+@contextmanager
+def track_fetches():
+    """
+    Count requests and new connections made by the current thread.
+
+    Yields a dict that is filled in when the block exits:
+    {requests, connections, handshakes_saved}
+    """
+    previous = getattr(_thread_stats, 'current', None)
+    stats = {'requests': 0, 'connections': 0, 'handshakes_saved': 0}
+    _thread_stats.current = stats
+    try:
+        yield stats
+    finally:
+        stats['handshakes_saved'] = max(0, stats['requests'] - stats['connections'])
+        _thread_stats.current = previous
+        if previous is not None:
+            previous['requests'] += stats['requests']
+            previous['connections'] += stats['connections']
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        _count('requests')
+        return super().urlopen(*args, **kwargs)
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        _count('requests')
+        return super().urlopen(*args, **kwargs)
+
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+# ========== Fetchers ==========
+
+class PooledFetcher:
+    """Shared requests.Session with HTTP keep-alive and bounded per-host pools"""
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10,
+        pool_hosts: int = FETCH_POOL_HOSTS,
+        pool_per_host: int = FETCH_POOL_PER_HOST
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+        # pool_block caps open connections per host at pool_per_host
+        adapter = _CountingAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_per_host,
+            pool_block=True
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('allow_redirects', True)
+        return self.session.get(url, headers=headers, **kwargs)
+
+    def fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = FETCH_MAX_BYTES,
+        content_types=HTML_CONTENT_TYPES,
+        **kwargs
+    ) -> FetchedDocument:
+        """Stream a document, checking Content-Type before reading the body"""
+        response = self.get(url, headers=headers, stream=True, **kwargs)
+        try:
+            response.raise_for_status()
+            _check_content_type(url, response.headers.get('Content-Type', ''), content_types)
+            content, truncated = _read_capped(response.iter_content(FETCH_CHUNK_SIZE), max_bytes)
+            return FetchedDocument(response.url, response.status_code, response.headers,
+                                   content, response.encoding, truncated)
+        finally:
+            # Unread or partially read bodies discard the connection instead of
+            # returning it to the pool
+            response.close()
+
+    def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = FETCH_MAX_BYTES,
+        content_types=None,
+        **kwargs
+    ) -> Iterator[bytes]:
+        """Yield body chunks up to max_bytes, checking Content-Type before the first one"""
+        response = self.get(url, headers=headers, stream=True, **kwargs)
+        try:
+            response.raise_for_status()
+            _check_content_type(url, response.headers.get('Content-Type', ''), content_types)
+            yield from _capped_chunks(response.iter_content(FETCH_CHUNK_SIZE), max_bytes)
+        finally:
+            response.close()
+
+    def revalidate(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                   headers: Optional[Dict[str, str]] = None, **kwargs) -> bool:
+        """Conditional GET; True if the server answers 304 Not Modified"""
+        with self.get(url, headers=_conditional_headers(headers, etag, last_modified), stream=True, **kwargs) as response:
+            return response.status_code == 304
+
+    def close(self):
+        self.session.close()
+
+
+class Http2Fetcher:
+    """httpx client with connection pooling and optional HTTP/2"""
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10,
+        pool_hosts: int = FETCH_POOL_HOSTS,
+        pool_per_host: int = FETCH_POOL_PER_HOST,
+        http2: bool = True
+    ):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("httpx not installed. Run: pip install 'httpx[http2]'")
+
+        self.timeout = timeout
+        # httpx only limits connections globally; with HTTP/2 a single
+        # connection per host carries all requests anyway
+        self.client = httpx.Client(
+            headers=headers or DEFAULT_HEADERS,
+            timeout=timeout,
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_hosts * pool_per_host,
+                max_keepalive_connections=pool_hosts
+            )
+        )
+
+    @staticmethod
+    def _trace(event_name: str, info: Dict):
+        if event_name == 'connection.connect_tcp.complete':
+            _count('connections')
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+        _count('requests')
+        kwargs.pop('allow_redirects', None)
+        kwargs.setdefault('timeout', self.timeout)
+        return self.client.get(url, headers=headers, extensions={'trace': self._trace}, **kwargs)
+
+    def fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = FETCH_MAX_BYTES,
+        content_types=HTML_CONTENT_TYPES,
+        **kwargs
+    ) -> FetchedDocument:
+        """Stream a document, checking Content-Type before reading the body"""
+        _count('requests')
+        kwargs.pop('allow_redirects', None)
+        kwargs.setdefault('timeout', self.timeout)
+        with self.client.stream('GET', url, headers=headers, extensions={'trace': self._trace}, **kwargs) as response:
+            response.raise_for_status()
+            _check_content_type(url, response.headers.get('Content-Type', ''), content_types)
+            content, truncated = _read_capped(response.iter_bytes(FETCH_CHUNK_SIZE), max_bytes)
+            return FetchedDocument(str(response.url), response.status_code, response.headers,
+                                   content, response.encoding, truncated)
+
+    def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = FETCH_MAX_BYTES,
+        content_types=None,
+        **kwargs
+    ) -> Iterator[bytes]:
+        """Yield body chunks up to max_bytes, checking Content-Type before the first one"""
+        _count('requests')
+        kwargs.pop('allow_redirects', None)
+        kwargs.setdefault('timeout', self.timeout)
+        with self.client.stream('GET', url, headers=headers, extensions={'trace': self._trace}, **kwargs) as response:
+            response.raise_for_status()
+            _check_content_type(url, response.headers.get('Content-Type', ''), content_types)
+            yield from _capped_chunks(response.iter_bytes(FETCH_CHUNK_SIZE), max_bytes)
+
+    def revalidate(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                   headers: Optional[Dict[str, str]] = None, **kwargs) -> bool:
+        """Conditional GET; True if the server answers 304 Not Modified"""
+        _count('requests')
+        kwargs.pop('allow_redirects', None)
+        kwargs.setdefault('timeout', self.timeout)
+        conditional = _conditional_headers(headers, etag, last_modified)
+        with self.client.stream('GET', url, headers=conditional, extensions={'trace': self._trace}, **kwargs) as response:
+            return response.status_code == 304
+
+    def close(self):
+        self.client.close()
+
+
+def create_fetcher(http2: bool = FETCH_HTTP2, **kwargs):
+    """Create a fetcher, falling back to PooledFetcher if httpx is missing"""
+    if http2:
+        try:
+            return Http2Fetcher(**kwargs)
+        except ImportError as e:
+            print(f"⚠️  {e} - falling back to HTTP/1.1 connection pool")
+    return PooledFetcher(**kwargs)
+
+
+# Singleton instance
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    """Get or create the shared fetcher singleton"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = create_fetcher()
+    return _fetcher
@@ -0,0 +1,505 @@
+"""
+Job Store
+Durable storage and queue for async lead generation jobs, shared by every
+API worker process:
+1. SQLiteJobStore - SQLite file on local disk (default)
+2. RedisJobStore - Redis server, for workers on several hosts (pip install redis)
+3. MemoryJobStore - in-process stand-in for tests and single-process runs
+
+All three store a job as one JSON document (parameters, status, timestamps and
+the result, stored once) and hand queued jobs out with claim_next(), which
+moves the oldest queued job to 'processing' so only one worker runs it.
+The claiming worker passes its ID as `owner` to update(): every such write
+renews its lease, and is refused once the job was handed to someone else.
+Finished jobs expire after JOB_TTL seconds.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from cache import CACHE_DIR
+
+JOB_STORE_BACKEND = os.getenv('JOB_STORE_BACKEND', 'sqlite').lower()
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', os.path.join(CACHE_DIR, 'jobs.sqlite3'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+# Seconds a job and its result are kept after it was created or finished
+JOB_TTL = float(os.getenv('JOB_TTL', str(24 * 3600)))
+# Seconds without a write from its worker after which a 'processing' job is
+# considered abandoned and queued again (progress reports renew the lease)
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '1800'))
+# Minimum seconds between progress writes of a running job
+JOB_PROGRESS_INTERVAL = float(os.getenv('JOB_PROGRESS_INTERVAL', '1'))
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def new_job(job_id: str, params: Dict, ttl: float) -> Dict:
+    now = time.time()
+    return {
+        'job_id': job_id,
+        'status': 'queued',
+        'params': params,
+        'created_at': datetime.utcnow().isoformat(),
+        'enqueued_at': now,
+        'expires_at': now + ttl,
+        'version': 0,
+    }
+
+
+def apply_update(job: Dict, fields: Dict, ttl: float) -> Dict:
+    """
+    Merge fields into a job and bump its version, so pollers can wait for a
+    change. Finishing a job restarts its TTL and drops the partial result.
+    """
+    job.update(fields)
+    job['version'] = job.get('version', 0) + 1
+    if fields.get('status') in FINISHED_STATUSES:
+        job['expires_at'] = time.time() + ttl
+        job.pop('partial_result', None)
+    return job
+
+
+# Fields reset when an unfinished job is handed back to the queue
+REQUEUE_FIELDS = {'status': 'queued', 'worker_id': None, 'started_at': None}
+
+
+class JobCancelled(Exception):
+    """Raised in a job's thread once its runner gave up on it (see JobProgress.cancel)"""
+
+
+def owned_by(job: Dict, owner: Optional[str]) -> bool:
+    """Whether `owner` may write the job: it still holds its claim (no owner writes regardless)"""
+    return owner is None or (job['status'] == 'processing' and job.get('worker_id') == owner)
+
+
+def owner_fields(fields: Dict, owner: Optional[str]) -> Dict:
+    """A write by the job's owner also renews its lease"""
+    return dict(fields, claimed_at=time.time()) if owner is not None else fields
+
+
+def mark_claimed(job: Dict, worker_id: str) -> Dict:
+    job['status'] = 'processing'
+    job['worker_id'] = worker_id
+    job['claimed_at'] = time.time()
+    job['started_at'] = datetime.utcnow().isoformat()
+    job['version'] = job.get('version', 0) + 1
+    return job
+
+
+class JobProgress:
+    """
+    Per-company progress of a running job, written to the job store as
+    `progress` counters plus a `partial_result` with the companies so far.
+
+    Writes are throttled to one per `interval` seconds; stage changes are
+    written at once. Company dicts are shared with the job, so companies
+    show up enriched in the partial result as soon as they are scraped.
+
+    With an `owner` (the worker_id that claimed the job) every write renews
+    the lease, so a long job is not taken for abandoned while it reports.
+
+    cancel() stops the job at its next progress report: from then on every
+    report raises JobCancelled instead of writing, so a job whose runner
+    gave up never writes to the store again. A report refused because the
+    job was handed to another worker raises JobCancelled as well.
+    """
+    def __init__(self, store, job_id: str, interval: float = JOB_PROGRESS_INTERVAL, owner: Optional[str] = None):
+        self.store = store
+        self.job_id = job_id
+        self.owner = owner
+        self.interval = interval
+        self.companies: List[Dict] = []
+        self.counters = {'stage': 'generating', 'generated': 0, 'to_scrape': 0, 'scraped': 0, 'failed': 0}
+        self._last_write = 0.0
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def shard_generated(self, companies: List[Dict]):
+        """A batch of companies arrived from the LLM (may still hold duplicates)"""
+        self.companies.extend(companies)
+        self.counters['generated'] = len(self.companies)
+        self.flush()
+
+    def generated(self, companies: List[Dict]):
+        """The final, deduplicated list of companies"""
+        self.companies = companies
+        self.counters['generated'] = len(companies)
+        self.flush(force=True)
+
+    def scraping(self, total: int):
+        self.counters['stage'] = 'scraping'
+        self.counters['to_scrape'] = total
+        self.flush(force=True)
+
+    def company_scraped(self, company: Dict, ok: bool):
+        self.counters['scraped' if ok else 'failed'] += 1
+        self.flush(force=self.counters['scraped'] + self.counters['failed'] == self.counters['to_scrape'])
+
+    def flush(self, force: bool = False):
+        if self.cancelled.is_set():
+            raise JobCancelled(self.job_id)
+        now = time.time()
+        if not force and now - self._last_write < self.interval:
+            return
+        self._last_write = now
+        written = self.store.update(self.job_id, owner=self.owner, progress=dict(self.counters),
+                                    partial_result={'companies': self.companies})
+        if not written and self.owner is not None:
+            raise JobCancelled(self.job_id)
+
+
+class MemoryJobStore:
+    """In-process job store; jobs are only visible to this process"""
+    def __init__(self, ttl: float = JOB_TTL, lease: float = JOB_LEASE_SECONDS, max_jobs: int = 10000):
+        self.ttl = ttl
+        self.lease = lease
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, params: Dict) -> Dict:
+        job = new_job(job_id, params, self.ttl)
+        self.purge_expired()
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            return json.loads(json.dumps(job))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['expires_at'] < time.time():
+                return None
+            return json.loads(json.dumps(job))
+
+    def update(self, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not owned_by(job, owner):
+                return False
+            apply_update(job, json.loads(json.dumps(owner_fields(fields, owner))), self.ttl)
+            return True
+
+    def claim_next(self, worker_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                stale = job['status'] == 'processing' and job['claimed_at'] < now - self.lease
+                if job['status'] == 'queued' or stale:
+                    return json.loads(json.dumps(mark_claimed(job, worker_id)))
+        return None
+
+    def requeue(self, job_id: str, owner: Optional[str] = None) -> bool:
+        """Hand a job that is still processing back to the queue, e.g. when a worker drains"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'processing' or not owned_by(job, owner):
+                return False
+            apply_update(job, dict(REQUEUE_FIELDS), self.ttl)
+            return True
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job['expires_at'] < now]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'backend': 'memory', 'jobs': counts}
+
+
+class SQLiteJobStore:
+    """
+    Job store in a SQLite file.
+
+    Works across the worker processes of one host (uvicorn --workers N);
+    claim_next takes a write lock so each job is claimed exactly once.
+    """
+    def __init__(self, path: str = JOB_STORE_PATH, ttl: float = JOB_TTL, lease: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    claimed_at REAL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, enqueued_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at)')
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; claim_next opens its own write transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, params: Dict) -> Dict:
+        job = new_job(job_id, params, self.ttl)
+        self.purge_expired()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, status, data, enqueued_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, job['status'], json.dumps(job), job['enqueued_at'], job['expires_at'])
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT data FROM jobs WHERE job_id = ? AND expires_at >= ?', (job_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+        return self._update(job_id, owner_fields(fields, owner), lambda job: owned_by(job, owner))
+
+    def _update(self, job_id: str, fields: Dict, allowed: Optional[Callable[[Dict], bool]] = None) -> bool:
+        """Apply fields, only if allowed(job) when given"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+                job = json.loads(row[0]) if row is not None else None
+                updated = job is not None and (allowed is None or allowed(job))
+                if updated:
+                    job = apply_update(job, fields, self.ttl)
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, data = ?, claimed_at = ?, expires_at = ? WHERE job_id = ?',
+                        (job['status'], json.dumps(job), job.get('claimed_at'), job['expires_at'], job_id)
+                    )
+                conn.execute('COMMIT')
+                return updated
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def claim_next(self, worker_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    '''SELECT data FROM jobs
+                       WHERE status = 'queued' OR (status = 'processing' AND claimed_at < ?)
+                       ORDER BY enqueued_at LIMIT 1''',
+                    (now - self.lease,)
+                ).fetchone()
+                job = None
+                if row is not None:
+                    job = mark_claimed(json.loads(row[0]), worker_id)
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, data = ?, claimed_at = ? WHERE job_id = ?',
+                        (job['status'], json.dumps(job), job['claimed_at'], job['job_id'])
+                    )
+                conn.execute('COMMIT')
+                return job
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def requeue(self, job_id: str, owner: Optional[str] = None) -> bool:
+        """Hand a job that is still processing back to the queue, e.g. when a worker drains"""
+        return self._update(
+            job_id, dict(REQUEUE_FIELDS), lambda job: job['status'] == 'processing' and owned_by(job, owner)
+        )
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM jobs WHERE expires_at < ?', (time.time(),)).rowcount
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {'backend': 'sqlite', 'path': self.path, 'jobs': dict(rows)}
+
+
+class RedisJobStore:
+    """
+    Job store on a Redis server, for API workers spread over several hosts.
+
+    Each job is a JSON string with a Redis expiry; queued job IDs live in a
+    list and in-flight ones in a sorted set scored by their last lease renewal.
+    """
+    def __init__(self, url: str = REDIS_URL, ttl: float = JOB_TTL, lease: float = JOB_LEASE_SECONDS,
+                 prefix: str = 'leadgen:jobs'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("redis not installed. Run: pip install redis")
+
+        self.redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self.ttl = ttl
+        self.lease = lease
+        self.prefix = prefix
+        self.queue_key = f'{prefix}:queue'
+        self.processing_key = f'{prefix}:processing'
+
+    def _key(self, job_id: str) -> str:
+        return f'{self.prefix}:{job_id}'
+
+    def _save(self, job: Dict, pipe=None):
+        ttl = max(1, int(job['expires_at'] - time.time()))
+        (pipe or self.redis).set(self._key(job['job_id']), json.dumps(job), ex=ttl)
+
+    def create(self, job_id: str, params: Dict) -> Dict:
+        job = new_job(job_id, params, self.ttl)
+        with self.redis.pipeline() as pipe:
+            self._save(job, pipe)
+            pipe.lpush(self.queue_key, job_id)
+            pipe.execute()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        data = self.redis.get(self._key(job_id))
+        return json.loads(data) if data else None
+
+    def _modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]],
+                extra: Optional[Callable] = None) -> Optional[Dict]:
+        """
+        Read-modify-write a job under WATCH, retried if another worker wrote
+        it in between, so concurrent progress updates are never lost.
+        change(job) returns the new job, or None to leave it alone; extra(pipe,
+        job) adds commands to the same transaction.
+        """
+        key = self._key(job_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    data = pipe.get(key)
+                    job = change(json.loads(data)) if data else None
+                    if job is None:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    self._save(job, pipe)
+                    if extra:
+                        extra(pipe, job)
+                    pipe.execute()
+                    return job
+                except self._watch_error:
+                    continue
+
+    def update(self, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+        def change(job):
+            if not owned_by(job, owner):
+                return None
+            return apply_update(job, owner_fields(fields, owner), self.ttl)
+
+        def lease(pipe, job):
+            if job['status'] in FINISHED_STATUSES:
+                pipe.zrem(self.processing_key, job_id)
+            elif owner is not None:
+                # xx: a job already taken back by _requeue_stale is not re-added
+                pipe.zadd(self.processing_key, {job_id: job['claimed_at']}, xx=True)
+
+        return self._modify(job_id, change, lease) is not None
+
+    def claim_next(self, worker_id: str) -> Optional[Dict]:
+        self._requeue_stale()
+        while True:
+            job_id = self.redis.rpop(self.queue_key)
+            if job_id is None:
+                return None
+            job_id = job_id.decode()
+            job = self._modify(
+                job_id,
+                lambda job: mark_claimed(job, worker_id),
+                lambda pipe, job: pipe.zadd(self.processing_key, {job_id: job['claimed_at']})
+            )
+            if job is None:  # expired while queued
+                continue
+            return job
+
+    def requeue(self, job_id: str, owner: Optional[str] = None) -> bool:
+        """Hand a job that is still processing back to the front of the queue"""
+        def change(job):
+            if job['status'] != 'processing' or not owned_by(job, owner):
+                return None
+            return apply_update(job, dict(REQUEUE_FIELDS), self.ttl)
+
+        if self._modify(job_id, change) is None:
+            return False
+        if self.redis.zrem(self.processing_key, job_id):
+            self.redis.rpush(self.queue_key, job_id)
+        return True
+
+    def _requeue_stale(self):
+        stale = self.redis.zrangebyscore(self.processing_key, 0, time.time() - self.lease)
+        for job_id in stale:
+            # zrem succeeds for exactly one worker
+            if self.redis.zrem(self.processing_key, job_id):
+                self.redis.rpush(self.queue_key, job_id)
+
+    def purge_expired(self) -> int:
+        # Job documents expire on their own
+        return 0
+
+    def stats(self) -> Dict:
+        return {
+            'backend': 'redis',
+            'jobs': {
+                'queued': self.redis.llen(self.queue_key),
+                'processing': self.redis.zcard(self.processing_key),
+            },
+        }
+
+
+JOB_STORE_BACKENDS = {
+    'memory': MemoryJobStore,
+    'sqlite': SQLiteJobStore,
+    'redis': RedisJobStore,
+}
+
+
+def create_job_store(backend: str = JOB_STORE_BACKEND, **kwargs):
+    """Create a job store by backend name: memory, sqlite or redis"""
+    if backend not in JOB_STORE_BACKENDS:
+        raise ValueError(f"Unknown JOB_STORE_BACKEND '{backend}'. Choose from: {', '.join(JOB_STORE_BACKENDS)}")
+    return JOB_STORE_BACKENDS[backend](**kwargs)
+
+
+# Singleton instance
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def get_job_store():
+    """Get or create the shared job store singleton"""
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = create_job_store()
+    return _job_store
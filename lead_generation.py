@@ -0,0 +1,122 @@
+"""
+Lead Generation
+The synchronous lead generation pipeline shared by the API (api.py) and the
+job worker (worker.py): LLM generation, optional web scraping and the mapping
+of failures to HTTP errors. Importing it has no side effects, so worker pool
+processes do not build the API app, its stores or its executors.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from generate_health_insurance import GeminiClient
+from job_store import JobCancelled, JobProgress
+from web_scraper import scrape_company_data
+
+logger = logging.getLogger(__name__)
+
+
+def validate_api_key():
+    """Validate that GEMINI_API_KEY is configured"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="GEMINI_API_KEY not configured. Please set it in your .env file"
+        )
+    return True
+
+
+def lead_generation_error(e: Exception) -> HTTPException:
+    """Map a lead generation failure to a user-friendly HTTPException"""
+    error_msg = str(e)
+    error_lower = error_msg.lower()
+    
+    # Check if it's a 503/overload error (after retries exhausted)
+    is_503_error = (
+        '503' in error_msg or 
+        'overloaded' in error_lower or 
+        'unavailable' in error_lower or
+        'model is overloaded' in error_lower or
+        'service unavailable' in error_lower
+    )
+    
+    # Check if it's a rate limit error (429)
+    is_rate_limit = (
+        '429' in error_msg or
+        'rate limit' in error_lower or
+        'too many requests' in error_lower
+    )
+    
+    # Check if it's a connection/timeout error
+    is_connection_error = (
+        'connection' in error_lower or
+        'timeout' in error_lower or
+        'network' in error_lower
+    )
+    
+    if is_503_error:
+        logger.error(f"503/Service Unavailable error after retries: {error_msg}")
+        # Provide user-friendly message
+        user_message = (
+            "The AI service is currently overloaded. We've tried multiple times but the service is still unavailable. "
+            "Please try again in a few minutes."
+        )
+        return HTTPException(
+            status_code=503,
+            detail=f"Lead generation failed: {user_message} (Error: {error_msg})"
+        )
+    elif is_rate_limit:
+        logger.error(f"Rate limit error: {error_msg}")
+        return HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please wait a moment before trying again."
+        )
+    elif is_connection_error:
+        logger.error(f"Connection error: {error_msg}")
+        return HTTPException(
+            status_code=503,
+            detail="Connection error. Please check your internet connection and try again."
+        )
+    else:
+        logger.error(f"Lead generation error: {error_msg}")
+        return HTTPException(
+            status_code=500, 
+            detail=f"Lead generation failed: {error_msg}"
+        )
+
+
+def generate_leads_sync(industry: str, number: int, country: str, enable_scraping: bool = False,
+                        progress: Optional[JobProgress] = None) -> Dict:
+    """Synchronous lead generation with automatic retry handling; reports to `progress` if given"""
+    try:
+        validate_api_key()
+        
+        # Generate leads with AI (includes automatic retry logic for 503 errors);
+        # large requests are split into concurrent smaller calls
+        logger.info(f"Starting lead generation: industry={industry}, number={number}, country={country}")
+        client = GeminiClient()
+        result = client.generate_companies_sharded(
+            industry, number, country,
+            on_shard=progress.shard_generated if progress else None
+        )
+        if progress:
+            progress.generated(result.get('companies', []))
+        
+        # Enhance with web scraping if enabled
+        if enable_scraping:
+            logger.info("Enhancing results with web scraping...")
+            if progress:
+                progress.scraping(sum(1 for c in result.get('companies', []) if c.get('website_url')))
+            result = scrape_company_data(result, on_progress=progress.company_scraped if progress else None)
+        
+        logger.info(f"Successfully generated {len(result.get('companies', []))} leads")
+        return result
+        
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise lead_generation_error(e)
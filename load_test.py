@@ -0,0 +1,136 @@
+"""
+API Load Test
+Checks that /health stays responsive while lead generation jobs with web
+scraping are running on the same server.
+
+1. Baseline: sample /health latency on an idle server
+2. Load: start N concurrent /api/v1/leads/generate requests with web scraping
+   and keep sampling /health until they all finish
+3. Compare p50/p95/p99 of both phases
+
+Usage:
+    python api.py &                                   # or uvicorn api:app
+    python load_test.py                               # 20 scraping jobs
+    python load_test.py --jobs 40 --number 10         # heavier load
+    python load_test.py --max-p99-ms 100              # exit 1 if p99 under load is higher
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict:
+    return {
+        'count': len(samples),
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'max': max(samples) if samples else 0.0,
+    }
+
+
+def sample_health(base_url: str, interval: float, stop: threading.Event, samples: List[float], errors: List[str]):
+    """Request /health every `interval` seconds until stop is set; latencies in ms"""
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}/health", timeout=30)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+        except requests.RequestException as e:
+            errors.append(str(e))
+        stop.wait(interval)
+
+
+def run_job(base_url: str, payload: Dict) -> Dict:
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{base_url}/api/v1/leads/generate", json=payload, timeout=900)
+        status = response.status_code
+    except requests.RequestException as e:
+        status = f"error: {e}"
+    return {'status': status, 'seconds': time.perf_counter() - start}
+
+
+def print_summary(label: str, stats: Dict):
+    print(f"{label:<12}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+          f"{stats['p99']:>10.1f}{stats['max']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='API base URL')
+    parser.add_argument('--jobs', type=int, default=20, help='Concurrent lead generation requests')
+    parser.add_argument('--number', type=int, default=5, help='Companies per request')
+    parser.add_argument('--industry', default='health insurance')
+    parser.add_argument('--country', default='USA')
+    parser.add_argument('--baseline-seconds', type=float, default=5, help='Idle sampling time')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between /health requests')
+    parser.add_argument('--max-p99-ms', type=float, default=None, help='Fail if /health p99 under load exceeds this')
+    args = parser.parse_args()
+    base_url = args.url.rstrip('/')
+
+    print(f"Baseline: sampling {base_url}/health for {args.baseline_seconds:.0f}s...")
+    baseline, errors = [], []
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_health, args=(base_url, args.interval, stop, baseline, errors))
+    sampler.start()
+    time.sleep(args.baseline_seconds)
+    stop.set()
+    sampler.join()
+
+    print(f"Load: {args.jobs} concurrent scraping jobs of {args.number} companies...")
+    loaded = []
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_health, args=(base_url, args.interval, stop, loaded, errors))
+    sampler.start()
+    payload = {
+        'industry': args.industry,
+        'number': args.number,
+        'country': args.country,
+        'enable_web_scraping': True,
+    }
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = list(pool.map(lambda _: run_job(base_url, payload), range(args.jobs)))
+    stop.set()
+    sampler.join()
+
+    print("=" * 58)
+    print(f"{'/health ms':<12}{'samples':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    print("=" * 58)
+    baseline_stats, loaded_stats = summarize(baseline), summarize(loaded)
+    print_summary('idle', baseline_stats)
+    print_summary('under load', loaded_stats)
+    print("=" * 58)
+
+    durations = [job['seconds'] for job in jobs]
+    statuses = {}
+    for job in jobs:
+        statuses[job['status']] = statuses.get(job['status'], 0) + 1
+    print(f"Jobs: {statuses}, median {statistics.median(durations):.1f}s, slowest {max(durations):.1f}s")
+    if errors:
+        print(f"⚠️  {len(errors)} /health requests failed, first: {errors[0]}")
+
+    if args.max_p99_ms is not None and (loaded_stats['p99'] > args.max_p99_ms or errors):
+        print(f"❌ /health p99 {loaded_stats['p99']:.1f}ms exceeds {args.max_p99_ms:.1f}ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Per-Host Rate Limiter
+Politeness scheduling for the web scraper:
+1. TokenBucket - steady request rate with a small burst allowance
+2. HostScheduler - one bucket per host, shared by every scraper thread, that
+   also honors robots.txt Crawl-delay and HTTP Retry-After
+
+Requests to different hosts never wait for each other, so crawling many
+sites runs at network speed, while requests to one host (including several
+companies on the same domain) are spaced out no matter which thread sends them.
+"""
+
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Requests per second, and burst size, allowed against a single host
+SCRAPE_HOST_RATE = float(os.getenv('SCRAPE_HOST_RATE', '1'))
+SCRAPE_HOST_BURST = int(os.getenv('SCRAPE_HOST_BURST', '1'))
+# Upper bounds for server-requested delays (Crawl-delay, Retry-After), in seconds
+SCRAPE_MAX_CRAWL_DELAY = float(os.getenv('SCRAPE_MAX_CRAWL_DELAY', '30'))
+SCRAPE_MAX_RETRY_AFTER = float(os.getenv('SCRAPE_MAX_RETRY_AFTER', '60'))
+
+
+def host_key(url: str) -> str:
+    """Normalize a URL to the host used for politeness limits"""
+    netloc = urlparse(url).netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return netloc
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations.
+
+    reserve() always takes a token and returns how long the caller must wait
+    for it; tokens may go negative, which queues concurrent callers one
+    interval apart instead of releasing them together.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block_for(self, seconds: float):
+        """Make the next reservation wait at least `seconds` (e.g. Retry-After)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def set_rate(self, rate: float, burst: Optional[int] = None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if burst is not None:
+                self.burst = max(1, burst)
+                self.tokens = min(self.tokens, self.burst)
+
+
+class HostScheduler:
+    """One token bucket per host, shared across scraper threads"""
+    def __init__(
+        self,
+        rate: float = SCRAPE_HOST_RATE,
+        burst: int = SCRAPE_HOST_BURST,
+        max_crawl_delay: float = SCRAPE_MAX_CRAWL_DELAY,
+        max_retry_after: float = SCRAPE_MAX_RETRY_AFTER
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_crawl_delay = max_crawl_delay
+        self.max_retry_after = max_retry_after
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str) -> TokenBucket:
+        key = host_key(url)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rate, self.burst)
+                self._stats[key] = {'requests': 0, 'wait_seconds': 0.0, 'retry_after': 0}
+            return self._buckets[key]
+
+    def acquire(self, url: str) -> float:
+        """Block until a request to url's host is allowed; returns seconds waited"""
+        wait = self._bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            stats = self._stats[host_key(url)]
+            stats['requests'] += 1
+            stats['wait_seconds'] += wait
+        return wait
+
+    def set_crawl_delay(self, url: str, delay: float):
+        """Space requests to url's host at least `delay` seconds apart (robots.txt Crawl-delay)"""
+        delay = min(delay, self.max_crawl_delay)
+        if delay <= 0:
+            return
+        rate = min(self.rate, 1 / delay)
+        self._bucket(url).set_rate(rate, burst=1)
+
+    def retry_after(self, url: str, value: Optional[str]) -> Optional[float]:
+        """
+        Pause url's host for the Retry-After period.
+
+        Returns the delay in seconds, or None if the header is missing or
+        asks for longer than max_retry_after (the caller should give up).
+        """
+        delay = parse_retry_after(value)
+        if delay is None or delay > self.max_retry_after:
+            return None
+        self._bucket(url).block_for(delay)
+        with self._lock:
+            self._stats[host_key(url)]['retry_after'] += 1
+        return delay
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {host: dict(stats) for host, stats in self._stats.items()}
+
+
+# Singleton instance
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_host_scheduler() -> HostScheduler:
+    """Get or create the process-wide host scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HostScheduler()
+    return _scheduler
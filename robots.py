@@ -0,0 +1,143 @@
+"""
+robots.txt Rules
+Fetches each host's robots.txt once and caches it for ROBOTS_CACHE_TTL in
+memory and in a SQLite cache shared by every worker process, so repeated
+jobs for the same companies never re-download it.
+
+RobotsRules answers:
+- can_fetch(url): whether a path is allowed for ROBOTS_USER_AGENT
+- crawl_delay: the host's Crawl-delay, fed to the per-host rate limiter
+- sitemaps: Sitemap URLs listed in robots.txt
+
+Following RFC 9309, a missing robots.txt (4xx) allows everything and a
+server error (5xx) or unreachable host disallows everything: a 5xx answer for
+ROBOTS_ERROR_TTL, and no answer at all (timeout, DNS or connection error,
+retried once) only for ROBOTS_UNREACHABLE_TTL, so one network hiccup does not
+drop a host for long.
+"""
+
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from cache import MemoryCache, SQLiteCache, TieredCache
+
+ROBOTS_ENABLED = os.getenv('ROBOTS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Product token matched against User-agent lines; '*' rules apply when no group names it
+ROBOTS_USER_AGENT = os.getenv('ROBOTS_USER_AGENT', 'LeadGenBot')
+ROBOTS_CACHE_TTL = int(os.getenv('ROBOTS_CACHE_TTL', str(24 * 3600)))
+ROBOTS_ERROR_TTL = int(os.getenv('ROBOTS_ERROR_TTL', '3600'))
+ROBOTS_UNREACHABLE_TTL = int(os.getenv('ROBOTS_UNREACHABLE_TTL', '60'))
+ROBOTS_CACHE_MAX_ENTRIES = int(os.getenv('ROBOTS_CACHE_MAX_ENTRIES', '20000'))
+# RFC 9309 asks crawlers to parse at least 500 KiB
+ROBOTS_MAX_BYTES = 512 * 1024
+
+
+# RobotFileParser only understands whole-second Crawl-delay values
+FRACTIONAL_CRAWL_DELAY_RE = re.compile(r'(?im)^(\s*crawl-delay\s*:\s*)(\d*\.\d+)')
+
+
+def robots_url(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme or 'https'}://{parsed.netloc}/robots.txt"
+
+
+class RobotsRules:
+    """Parsed robots.txt for one host"""
+    def __init__(self, text: str = '', allow_all: bool = False, disallow_all: bool = False,
+                 user_agent: str = ROBOTS_USER_AGENT):
+        self.user_agent = user_agent
+        self.parser = RobotFileParser()
+        # Round fractional delays up so they are not silently dropped
+        text = FRACTIONAL_CRAWL_DELAY_RE.sub(lambda m: f"{m.group(1)}{math.ceil(float(m.group(2)))}", text)
+        self.parser.parse(text.splitlines())
+        # RobotFileParser's own flags for "no robots.txt" / "unreachable"
+        self.parser.allow_all = allow_all
+        self.parser.disallow_all = disallow_all
+
+    @classmethod
+    def from_cached(cls, value: Dict, user_agent: str = ROBOTS_USER_AGENT) -> 'RobotsRules':
+        status = value.get('status')
+        if status is None or status >= 500:
+            return cls(disallow_all=True, user_agent=user_agent)
+        if status >= 400:
+            return cls(allow_all=True, user_agent=user_agent)
+        return cls(value.get('text', ''), user_agent=user_agent)
+
+    def can_fetch(self, url: str) -> bool:
+        return self.parser.can_fetch(self.user_agent, url)
+
+    @property
+    def crawl_delay(self) -> Optional[float]:
+        delay = self.parser.crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return self.parser.site_maps() or []
+
+
+class RobotsCache:
+    """robots.txt per host, cached across jobs and worker processes"""
+    def __init__(self, cache=None, user_agent: str = ROBOTS_USER_AGENT, ttl: int = ROBOTS_CACHE_TTL,
+                 error_ttl: int = ROBOTS_ERROR_TTL, unreachable_ttl: int = ROBOTS_UNREACHABLE_TTL):
+        self.cache = cache
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.unreachable_ttl = unreachable_ttl
+
+    def ttl_for(self, status: Optional[int]) -> int:
+        if status is None:
+            return self.unreachable_ttl
+        return self.error_ttl if status >= 500 else self.ttl
+
+    def rules_for(self, url: str, fetcher, scheduler=None, headers: Optional[Dict[str, str]] = None,
+                  timeout: float = 10) -> RobotsRules:
+        """Rules for url's host, downloading robots.txt if it is not cached"""
+        key = robots_url(url)
+        entry = self.cache.get(key) if self.cache else None
+        if entry is not None:
+            return RobotsRules.from_cached(entry.value, self.user_agent)
+
+        value = self._download(key, fetcher, scheduler, headers, timeout)
+        if value['status'] is None:
+            # No response at all is often transient: try once more
+            value = self._download(key, fetcher, scheduler, headers, timeout)
+        if self.cache:
+            self.cache.set(key, value, ttl=self.ttl_for(value['status']))
+        return RobotsRules.from_cached(value, self.user_agent)
+
+    def _download(self, url: str, fetcher, scheduler, headers, timeout) -> Dict:
+        if scheduler:
+            scheduler.acquire(url)
+        try:
+            document = fetcher.fetch(url, headers=headers, timeout=timeout,
+                                     max_bytes=ROBOTS_MAX_BYTES, content_types=None)
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            status = response.status_code if response is not None else None
+            print(f"  - robots.txt {url}: {status or str(e)}")
+            return {'status': status, 'text': ''}
+        return {'status': document.status_code, 'text': document.text}
+
+
+_robots_cache = None
+_robots_cache_lock = threading.Lock()
+
+def get_robots_cache() -> Optional[RobotsCache]:
+    """Get or create the shared robots.txt cache (None if ROBOTS_ENABLED is off)"""
+    global _robots_cache
+    if not ROBOTS_ENABLED:
+        return None
+    with _robots_cache_lock:
+        if _robots_cache is None:
+            _robots_cache = RobotsCache(TieredCache(
+                MemoryCache(ttl=ROBOTS_CACHE_TTL, max_entries=1000),
+                SQLiteCache('robots', ttl=ROBOTS_CACHE_TTL, max_entries=ROBOTS_CACHE_MAX_ENTRIES)
+            ))
+    return _robots_cache
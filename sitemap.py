@@ -0,0 +1,217 @@
+"""
+Sitemap Contact Discovery
+Finds likely contact pages from a site's sitemap.xml instead of guessing from
+homepage links:
+1. contact_score(url) - contact-likelihood of a URL from its path alone
+2. SitemapDiscovery - streams sitemaps and sitemap indexes (optionally
+   gzipped) through an incremental XML parser and keeps only the top-k
+   scoring URLs, so even sitemaps with tens of thousands of entries are
+   never held in memory
+
+Reading stops at SITEMAP_MAX_FILES sitemaps, SITEMAP_MAX_URLS entries or
+SITEMAP_MAX_BYTES per file, and as soon as top-k high-confidence pages
+(score >= STRONG_CONTACT_SCORE) have been found.
+"""
+
+import heapq
+import os
+import re
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from rate_limiter import host_key
+
+SITEMAP_DISCOVERY = os.getenv('SITEMAP_DISCOVERY', 'true').lower() in ('1', 'true', 'yes')
+SITEMAP_MAX_FILES = int(os.getenv('SITEMAP_MAX_FILES', '3'))
+SITEMAP_MAX_URLS = int(os.getenv('SITEMAP_MAX_URLS', '50000'))
+SITEMAP_MAX_BYTES = int(os.getenv('SITEMAP_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Path patterns and their contact-likelihood weight; the best match counts
+CONTACT_PATH_SCORES = (
+    (re.compile(r'contact|kontakt|contacto|contatti|get-in-touch|reach-us|write-to-us'), 10.0),
+    (re.compile(r'impressum|imprint|legal-notice|mentions-legales|aviso-legal'), 6.0),
+    (re.compile(r'about|team|offices|locations|leadership|who-we-are'), 3.0),
+    (re.compile(r'support|help|customer-service'), 2.0),
+    (re.compile(r'connect'), 1.0),
+)
+# Sections that mention "contact" or "about" without being contact pages
+LOW_VALUE_PATH_RE = re.compile(
+    r'/(blog|news|press|articles?|posts?|products?|shop|store|careers|jobs|tags?|categor(y|ies)|authors?|events?)(/|$)'
+    r'|/page/\d+|\.(pdf|jpe?g|png|gif|zip|docx?)$'
+)
+# Score at which a page is treated as "the" contact page
+STRONG_CONTACT_SCORE = 8.0
+
+# Child sitemaps likely to list pages rather than posts or products
+PAGE_SITEMAP_RE = re.compile(r'page|main|general|static|site')
+BULK_SITEMAP_RE = re.compile(r'post|product|blog|news|tag|categor|author|image|video')
+
+
+def contact_score(url: str) -> float:
+    """Contact-likelihood of a URL from its path; 0 means not worth fetching"""
+    parsed = urlparse(url)
+    path = parsed.path.lower().rstrip('/')
+    segments = [segment for segment in path.split('/') if segment]
+    if not segments:
+        return 0.0
+
+    last = segments[-1]
+    score = 0.0
+    for pattern, weight in CONTACT_PATH_SCORES:
+        if pattern.search(last):
+            score = max(score, weight)
+        elif pattern.search(path):
+            score = max(score, weight / 2)
+    if score == 0:
+        return 0.0
+
+    # Prefer short paths (/contact over /en/regions/emea/offices/contact)
+    score -= 0.5 * max(0, len(segments) - 1)
+    if parsed.query:
+        score -= 1.0
+    if LOW_VALUE_PATH_RE.search(path):
+        score = min(score, 1.0)
+    return max(score, 0.0)
+
+
+def rank_contact_urls(urls: Iterable[str], top_k: int) -> List[str]:
+    """Top-k URLs by contact_score, best first; zero scores are dropped"""
+    scored = [(contact_score(url), -index, url) for index, url in enumerate(urls)]
+    best = heapq.nlargest(top_k, (item for item in scored if item[0] > 0))
+    return [url for _, _, url in best]
+
+
+def _sitemap_priority(url: str) -> int:
+    lower = urlparse(url).path.lower().replace('sitemap', '')
+    if PAGE_SITEMAP_RE.search(lower):
+        return 0
+    if BULK_SITEMAP_RE.search(lower):
+        return 2
+    return 1
+
+
+def iter_sitemap_entries(chunks: Iterable[bytes]) -> Iterator[Tuple[str, str]]:
+    """
+    Incrementally parse a sitemap or sitemap index.
+
+    Yields ('url', loc) for page entries and ('sitemap', loc) for child
+    sitemaps. gzip-compressed bodies are inflated on the fly; parsing stops
+    quietly at the first XML error.
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    decompressor = None
+    root = None
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                first = False
+                if chunk[:2] == b'\x1f\x8b':
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    continue
+                tag = element.tag.rsplit('}', 1)[-1]
+                if tag in ('url', 'sitemap'):
+                    loc = element.find('{*}loc')  # any or no namespace
+                    if loc is not None and loc.text:
+                        yield tag, loc.text.strip()
+                    # Drop finished entries so memory stays flat
+                    root.clear()
+    except (ParseError, zlib.error):
+        return
+
+
+class SitemapDiscovery:
+    """
+    Top-k contact page candidates for one site from its sitemaps.
+
+    `fetcher` is an http_fetcher fetcher (needs stream()); `acquire`, if
+    given, is called with each sitemap URL before it is requested (per-host
+    rate limiting), and `allowed` filters URLs (robots.txt).
+    """
+    def __init__(
+        self,
+        fetcher,
+        top_k: int = 3,
+        acquire: Optional[Callable[[str], float]] = None,
+        allowed: Optional[Callable[[str], bool]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10,
+        max_files: int = SITEMAP_MAX_FILES,
+        max_urls: int = SITEMAP_MAX_URLS,
+        max_bytes: int = SITEMAP_MAX_BYTES
+    ):
+        self.fetcher = fetcher
+        self.top_k = top_k
+        self.acquire = acquire
+        self.allowed = allowed
+        self.headers = headers
+        self.timeout = timeout
+        self.max_files = max_files
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.stats = {'files': 0, 'urls_seen': 0, 'stopped_early': False}
+
+    def discover(self, base_url: str, sitemap_urls: Optional[List[str]] = None) -> List[str]:
+        """Best contact page URLs on base_url's host, best first"""
+        host = host_key(base_url)
+        pending = list(sitemap_urls or [urljoin(base_url, '/sitemap.xml')])
+        seen_sitemaps = set()
+        best: List[Tuple[float, int, str]] = []  # min-heap of the top-k
+
+        while pending and self.stats['files'] < self.max_files and not self.stats['stopped_early']:
+            pending.sort(key=_sitemap_priority)
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen_sitemaps:
+                continue
+            seen_sitemaps.add(sitemap_url)
+            self.stats['files'] += 1
+
+            entries = self._entries(sitemap_url)
+            try:
+                for kind, loc in entries:
+                    if kind == 'sitemap':
+                        pending.append(loc)
+                        continue
+                    self.stats['urls_seen'] += 1
+                    if self.stats['urls_seen'] > self.max_urls:
+                        self.stats['stopped_early'] = True
+                        break
+                    if host_key(loc) != host:
+                        continue
+                    score = contact_score(loc)
+                    if score <= 0 or (len(best) >= self.top_k and score <= best[0][0]):
+                        continue
+                    if self.allowed and not self.allowed(loc):
+                        continue
+                    item = (score, -self.stats['urls_seen'], loc)
+                    if len(best) < self.top_k:
+                        heapq.heappush(best, item)
+                    else:
+                        heapq.heapreplace(best, item)
+                    if len(best) >= self.top_k and best[0][0] >= STRONG_CONTACT_SCORE:
+                        self.stats['stopped_early'] = True
+                        break
+            finally:
+                # Closes the download when we stop reading early
+                entries.close()
+
+        return [loc for _, _, loc in sorted(best, reverse=True)]
+
+    def _entries(self, sitemap_url: str) -> Iterator[Tuple[str, str]]:
+        if self.acquire:
+            self.acquire(sitemap_url)
+        try:
+            chunks = self.fetcher.stream(sitemap_url, headers=self.headers, timeout=self.timeout,
+                                         max_bytes=self.max_bytes)
+            yield from iter_sitemap_entries(chunks)
+        except Exception as e:
+            print(f"  - Sitemap {sitemap_url}: {str(e)}")
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Modules read their configuration at import time: keep caches and queues
+# out of the working tree and make the API importable without real keys
+os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='leadgen-tests-'))
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+"""Email endpoints queue messages in the outbox instead of sending inline"""
+
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from email_outbox import EmailOutbox
+from job_store import MemoryJobStore
+
+
+class UnusedSender:
+    """Configured email service; the request must never send through it"""
+    method = 'stub'
+
+    def send_bulk(self, emails):
+        raise AssertionError("send-bulk sent inline instead of queueing")
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    outbox = EmailOutbox(path=str(tmp_path / 'outbox.sqlite3'))
+    monkeypatch.setattr(api, 'email_outbox', outbox)
+    monkeypatch.setattr(api, 'get_email_sender', UnusedSender)
+    return outbox
+
+
+def test_send_bulk_queues_every_recipient(outbox):
+    # Without lifespan events, so no dispatcher delivers the queued messages
+    client = TestClient(api.app)
+    response = client.post('/api/v1/email/send-bulk', json={
+        'from_email': 'agent@broker.com',
+        'subject': 'Coverage',
+        'body': '<p>Hello</p>',
+        'recipients': [{'to_email': 'a@acme.com'}, {'to_email': 'b@acme.com', 'subject': 'Custom'}],
+        'attachments': [{'filename': 'plan.txt', 'content': base64.b64encode(b'plan').decode()}],
+        'cc_sender': True,
+    })
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body['queued'] == 2
+    assert [result['to_email'] for result in body['results']] == ['a@acme.com', 'b@acme.com']
+
+    messages = [outbox.get(result['message_id']) for result in body['results']]
+    assert [message['status'] for message in messages] == ['queued', 'queued']
+    assert messages[0]['email']['subject'] == 'Coverage'
+    assert messages[1]['email']['subject'] == 'Custom'
+    assert messages[0]['email']['cc_email'] == 'agent@broker.com'
+
+    status = client.get(body['results'][0]['status_url']).json()
+    assert status['status'] == 'queued'
+
+    emails = outbox.load_emails(outbox.claim_due(10))
+    assert [email.attachments[0].content for email in emails] == [b'plan', b'plan']
+
+
+def test_send_bulk_without_email_service(outbox, monkeypatch):
+    def unconfigured():
+        raise ValueError("No email service configured")
+
+    monkeypatch.setattr(api, 'get_email_sender', unconfigured)
+    response = TestClient(api.app).post('/api/v1/email/send-bulk', json={
+        'from_email': 'agent@broker.com', 'subject': 'Coverage', 'body': 'Hello',
+        'recipients': [{'to_email': 'a@acme.com'}],
+    })
+    assert response.status_code == 400
+    assert outbox.claim_due(10) == []
+
+
+def test_campaign_skips_malformed_job_companies(outbox, monkeypatch):
+    store = MemoryJobStore()
+    monkeypatch.setattr(api, 'job_store', store)
+    store.create('job-1', {})
+    store.update('job-1', status='completed', result={'companies': [
+        {'company_name': 'Acme', 'contact_email': 'hi@acme.com'},
+        {'website_url': 'https://nameless.com', 'contact_email': 'hi@nameless.com'},
+        {'company_name': 'Stringy', 'notable_customers': 'Globex, Initech', 'contact_email': 'hi@stringy.com'},
+        'not a company',
+    ]})
+
+    response = TestClient(api.app).post('/api/v1/email/campaign', json={
+        'from_email': 'agent@broker.com', 'subject': 'Coverage for {{company_name}}', 'body': 'Hello',
+        'job_id': 'job-1',
+    })
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body['total'] == 4
+    assert body['queued'] == 1
+    assert body['skipped'] == 3
+    queued, *skipped = body['results']
+    assert queued['to_email'] == 'hi@acme.com'
+    assert [result['company_name'] for result in skipped] == [None, 'Stringy', None]
+    assert all(result['reason'].startswith('Invalid lead data') for result in skipped)
+    assert 'notable_customers' in skipped[1]['reason']
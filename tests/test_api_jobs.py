@@ -0,0 +1,66 @@
+"""Jobs run inside the API process when it shuts down mid-job"""
+
+import asyncio
+import time
+
+import pytest
+
+import api
+from job_store import SQLiteJobStore
+
+PARAMS = {'industry': 'insurance', 'number': 5, 'country': 'US', 'enable_web_scraping': False}
+
+
+def reporting_job(industry, number, country, enable_scraping, progress):
+    """Reports progress every 0.05s for a second, like a job scraping companies"""
+    for _ in range(20):
+        time.sleep(0.05)
+        progress.shard_generated([{'company_name': 'A'}])
+    return {'companies': [{'company_name': 'A'}]}
+
+
+def silent_job(industry, number, country, enable_scraping, progress):
+    """One long call without progress reports, like a slow LLM request"""
+    time.sleep(1.5)
+    return {'companies': []}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteJobStore(path=str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setattr(api, 'job_store', store)
+    monkeypatch.setattr(api, 'JOB_CANCEL_GRACE', 0.5)
+    store.create('job-1', PARAMS)
+    return store
+
+
+async def cancel_running_job(store):
+    job = store.claim_next('api-worker')
+    task = asyncio.create_task(api.run_job(job))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_cancelled_job_stops_then_is_requeued(store, monkeypatch):
+    monkeypatch.setattr(api, 'generate_leads_sync', reporting_job)
+    asyncio.run(cancel_running_job(store))
+
+    job = store.get('job-1')
+    assert job['status'] == 'queued'
+    version = job['version']
+    # The thread stopped: nothing writes to the job any more
+    time.sleep(1.2)
+    assert store.get('job-1')['version'] == version
+
+
+def test_job_that_cannot_stop_is_marked_failed(store, monkeypatch):
+    monkeypatch.setattr(api, 'generate_leads_sync', silent_job)
+    asyncio.run(cancel_running_job(store))
+
+    assert store.get('job-1')['status'] == 'failed'
+    # Not handed to another worker, and the thread never overwrites the outcome
+    assert store.claim_next('other-worker') is None
+    time.sleep(1.5)
+    assert store.get('job-1')['status'] == 'failed'
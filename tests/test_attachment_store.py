@@ -0,0 +1,38 @@
+"""Content-addressed attachment store: one copy of the bytes per ID"""
+
+import pytest
+
+from attachment_store import AttachmentStore
+from email_attachments import Attachment
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AttachmentStore(path=str(tmp_path / 'attachments.sqlite3'))
+
+
+def test_same_bytes_keep_the_first_name(store):
+    first = store.put(Attachment('brochure.pdf', b'%PDF brochure', 'application/pdf'))
+    again = store.put(Attachment('brochure-v2.pdf', b'%PDF brochure', 'application/octet-stream'))
+
+    assert again['attachment_id'] == first['attachment_id']
+    assert first['deduplicated'] is False
+    assert again['deduplicated'] is True
+    assert again['filename'] == 'brochure.pdf'
+    assert again['mimetype'] == 'application/pdf'
+
+    # Both the in-memory copy and the one read back from disk
+    for source in (store, AttachmentStore(path=store.path)):
+        attachment = source.get(first['attachment_id'])
+        assert (attachment.filename, attachment.mimetype) == ('brochure.pdf', 'application/pdf')
+    assert store.metadata(first['attachment_id'])['filename'] == 'brochure.pdf'
+    assert store.stats()['attachments'] == 1
+
+
+def test_least_recently_used_is_evicted(store):
+    store.max_bytes = 10
+    old = store.put(Attachment('old.txt', b'123456', 'text/plain'))
+    new = store.put(Attachment('new.txt', b'abcdef', 'text/plain'))
+
+    assert store.get(old['attachment_id']) is None
+    assert store.get(new['attachment_id']).content == b'abcdef'
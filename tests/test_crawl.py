@@ -0,0 +1,106 @@
+"""
+Crawl politeness against the stub websites of benchmark_crawl: per-host
+rate, robots.txt Disallow and Crawl-delay, Retry-After and CrawlBudget.
+127.0.0.1 sets a Crawl-delay, the other hosts only the scheduler rate.
+"""
+
+from collections import defaultdict
+
+import pytest
+
+import benchmark_crawl
+from benchmark_crawl import StubSite, min_gap, start_stub_hosts
+from cache import MemoryCache
+from rate_limiter import HostScheduler
+from robots import ROBOTS_USER_AGENT, RobotsCache, RobotsRules
+from web_scraper import CrawlBudget, WebScraper
+
+RATE = 4  # requests per second per host
+# Timer granularity: a gap may come in a few milliseconds short
+SLACK = 0.05
+
+
+@pytest.fixture
+def hosts(monkeypatch):
+    monkeypatch.setattr(StubSite, 'requests_log', defaultdict(list))
+    monkeypatch.setattr(StubSite, 'throttled', set())
+    monkeypatch.setattr(benchmark_crawl, 'CRAWL_DELAY_SECONDS', 1)
+    servers = start_stub_hosts(2)
+    yield [f'http://{host}:{port}/' for host, port in (server.server_address for server in servers)]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def scrape(url, scheduler, **budget):
+    robots = RobotsCache(MemoryCache(ttl=3600))
+    scraper = WebScraper(cache=False, scheduler=scheduler, robots=robots, budget=CrawlBudget(**budget))
+    return scraper.scrape_website(url)
+
+
+def requests_to(url):
+    host = url.split('/')[2]
+    return StubSite.requests_log[host]
+
+
+def test_host_rate_and_robots_rules(hosts):
+    scheduler = HostScheduler(rate=RATE, burst=1)
+    delayed, plain = hosts
+    results = [scrape(url, scheduler, byte_budget=0, time_budget=0) for url in hosts]
+
+    for url, result in zip(hosts, results):
+        paths = [path for _, path in requests_to(url)]
+        assert paths[0] == '/robots.txt'
+        # Disallowed by robots.txt: never requested, counted as blocked
+        assert '/about' not in paths
+        assert result['page_stats']['robots_blocked'] >= 1
+        assert result['contact_email']
+
+    # Scheduler rate on a host without Crawl-delay
+    assert min_gap(t for t, _ in requests_to(plain)) >= 1 / RATE - SLACK
+    # Crawl-delay overrides the faster scheduler rate
+    assert min_gap(t for t, _ in requests_to(delayed)) >= benchmark_crawl.CRAWL_DELAY_SECONDS - SLACK
+
+
+def test_retry_after_pauses_the_host(hosts):
+    scheduler = HostScheduler(rate=RATE, burst=1)
+    url = hosts[1]
+    result = scrape(url, scheduler, byte_budget=0, time_budget=0)
+
+    log = requests_to(url)
+    support = [t for t, path in log if path == '/support']
+    assert len(support) == 2  # 429, then the retry
+    assert support[1] - support[0] >= benchmark_crawl.RETRY_AFTER_SECONDS - SLACK
+    assert result['page_stats']['retry_after'] == 1
+
+
+def test_byte_budget_stops_after_homepage(hosts):
+    scheduler = HostScheduler(rate=RATE, burst=1)
+    url = hosts[1]
+    result = scrape(url, scheduler, byte_budget=1, time_budget=0)
+
+    crawl = result['crawl_stats']
+    assert crawl['stop_reason'] == 'byte_budget'
+    assert crawl['pages_fetched'] == 1
+    assert crawl['pages_skipped'] >= 1
+    assert [path for _, path in requests_to(url)] == ['/robots.txt', '/']
+
+
+def test_time_budget_stops_after_homepage(hosts):
+    scheduler = HostScheduler(rate=RATE, burst=1)
+    url = hosts[1]
+    result = scrape(url, scheduler, byte_budget=0, time_budget=0.01)
+
+    crawl = result['crawl_stats']
+    assert crawl['stop_reason'] == 'time_budget'
+    assert crawl['pages_fetched'] == 1
+    assert '/contact' not in [path for _, path in requests_to(url)]
+
+
+def test_user_agent_names_the_robots_token():
+    user_agent = WebScraper(cache=False, robots=False).headers['User-Agent']
+    assert ROBOTS_USER_AGENT in user_agent
+    # A group addressed to the crawler by name applies to what it sends
+    rules = RobotsRules(f'User-agent: {ROBOTS_USER_AGENT}\nDisallow: /private\n')
+    assert not rules.can_fetch('https://acme-insurance.com/private/contact')
+    assert rules.can_fetch('https://acme-insurance.com/contact')
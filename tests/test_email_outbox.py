@@ -0,0 +1,85 @@
+"""Outbox delivery when a claimed message cannot be loaded back"""
+
+import sqlite3
+import time
+
+import pytest
+
+from email_attachments import Attachment
+from email_outbox import EmailOutbox, OutboxDispatcher
+from email_sender import OutboundEmail
+
+
+class RecordingSender:
+    method = 'stub'
+
+    def __init__(self):
+        self.sent = []
+
+    def send_bulk(self, emails):
+        self.sent.extend(emails)
+        return [{'success': True, 'permanent': False, 'method': self.method, 'message': 'sent'} for _ in emails]
+
+
+def make_email(to_email, content):
+    return OutboundEmail(from_email='agent@broker.com', to_email=to_email, subject='Coverage', contents='Hello',
+                         attachments=[Attachment('plan.txt', content, 'text/plain')])
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return EmailOutbox(path=str(tmp_path / 'outbox.sqlite3'))
+
+
+def test_unloadable_message_fails_alone(outbox):
+    broken, good = outbox.enqueue_many([make_email('a@acme.com', b'lost'), make_email('b@acme.com', b'plan')])
+    with sqlite3.connect(outbox.path) as conn:
+        conn.execute('DELETE FROM attachment_blobs WHERE content = ?', (b'lost',))
+
+    sender = RecordingSender()
+    dispatcher = OutboxDispatcher(outbox, sender_factory=lambda: sender)
+    assert dispatcher.dispatch_once() == 2
+
+    assert [email.to_email for email in sender.sent] == ['b@acme.com']
+    assert outbox.get(good['message_id'])['status'] == 'sent'
+    failed = outbox.get(broken['message_id'])
+    assert failed['status'] == 'failed'
+    assert 'Could not load message' in failed['last_error']
+
+
+def test_load_error_counts_against_attempts(outbox, monkeypatch):
+    message = outbox.enqueue(make_email('a@acme.com', b'plan'))
+
+    def locked(messages, shared=None):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(outbox, 'load_emails', locked)
+    sender = RecordingSender()
+    dispatcher = OutboxDispatcher(outbox, sender_factory=lambda: sender, max_attempts=2, base_delay=0)
+
+    dispatcher.dispatch_once()
+    assert outbox.get(message['message_id'])['status'] == 'queued'
+    dispatcher.dispatch_once()
+    final = outbox.get(message['message_id'])
+    assert final['status'] == 'failed'
+    assert final['attempts'] == 2
+    assert sender.sent == []
+
+
+def test_expired_lease_after_last_attempt_fails(tmp_path):
+    outbox = EmailOutbox(path=str(tmp_path / 'outbox.sqlite3'), lease=0.1)
+    message = outbox.enqueue(make_email('a@acme.com', b'plan'))
+
+    # Each claim is abandoned mid-send, as if the send killed the dispatcher
+    for attempt in (1, 2):
+        claimed = outbox.claim_due(10, max_attempts=2)
+        assert [item['attempts'] for item in claimed] == [attempt]
+        time.sleep(0.2)
+
+    assert outbox.claim_due(10, max_attempts=2) == []
+    failed = outbox.get(message['message_id'])
+    assert failed['status'] == 'failed'
+    assert failed['attempts'] == 2
+    assert 'No result after 2 attempts' in failed['last_error']
+    with sqlite3.connect(outbox.path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM attachment_blobs').fetchone()[0] == 0
@@ -0,0 +1,108 @@
+"""
+Every installed parser backend must produce the same links and emails as
+the html.parser fallback on the same pages.
+"""
+
+import pytest
+
+from email_extractor import EmailExtractor
+from html_parsers import HTMLParserBackend, available_parsers, get_parser
+from web_scraper import classify_links
+
+BASE_URL = 'https://acme-insurance.com/'
+
+PAGES = {
+    'links': '''
+        <html><body>
+          <a href="/contact-us">Contact</a>
+          <a href="https://acme-insurance.com/about">About us</a>
+          <a href="/team">Help</a>
+          <a href="https://www.linkedin.com/company/acme">LinkedIn</a>
+          <a href="https://www.linkedin.com/feed/">Feed</a>
+          <a href="https://twitter.com/intent/tweet?text=hi">Share</a>
+          <a href="https://twitter.com/acme">Twitter</a>
+          <a href="//facebook.com/acme">Facebook</a>
+          <a href="/pricing">Pricing</a>
+          <a name="top">No href</a>
+        </body></html>
+    ''',
+    'mailto': '''
+        <html><body>
+          <p>Write to <a href="mailto:sales@acme-insurance.com?subject=Quote">sales</a></p>
+          <a href=" MAILTO:Claims@acme-insurance.com ">claims</a>
+          <p>Support: support@acme-insurance.com, or info at info@acme-insurance.com.</p>
+          <p>Placeholder: you@example.com</p>
+        </body></html>
+    ''',
+    'script_style': '''
+        <html><head>
+          <style>.hidden-from-text { content: "style@acme-insurance.com"; }</style>
+          <script>var contact = "script@acme-insurance.com";</script>
+        </head><body>
+          <p>Visible: hello@acme-insurance.com</p>
+          <script type="application/ld+json">{"email": "ld@acme-insurance.com"}</script>
+          <a href="/contact">Contact</a>
+        </body></html>
+    ''',
+    'malformed': '''
+        <html><body>
+          <div><p>Unclosed paragraph with agent@acme-insurance.com
+          <a href="/contact">Contact <b>us</a></b>
+          <a href="https://instagram.com/acme">Instagram
+          <table><tr><td>quotes@acme-insurance.com</td></table>
+          <a href='mailto:broker@acme-insurance.com'>broker</a>
+    ''',
+    'empty': '',
+}
+
+
+def extract(backend, html):
+    document = backend.parse(html)
+    links = classify_links(backend.anchors(document), BASE_URL)
+    emails = EmailExtractor().extract(backend.text(document))
+    return links, emails
+
+
+@pytest.fixture(params=available_parsers())
+def backend(request):
+    return get_parser(request.param)
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_backend_matches_html_parser(backend, page):
+    assert extract(backend, PAGES[page]) == extract(HTMLParserBackend(), PAGES[page])
+
+
+def test_links_are_classified(backend):
+    links, _ = extract(backend, PAGES['links'])
+    assert links['social']['linkedin'] == 'https://www.linkedin.com/company/acme'
+    assert links['social']['twitter'] == 'https://twitter.com/acme'
+    assert links['social']['facebook'] == 'https://facebook.com/acme'
+    assert set(links['contact']) == {
+        'https://acme-insurance.com/contact-us',
+        'https://acme-insurance.com/about',
+        'https://acme-insurance.com/team',
+    }
+
+
+def test_mailto_and_text_emails(backend):
+    links, emails = extract(backend, PAGES['mailto'])
+    assert links['mailto'] == {'sales@acme-insurance.com', 'Claims@acme-insurance.com'}
+    assert {'support@acme-insurance.com', 'info@acme-insurance.com'} <= emails
+    assert 'you@example.com' not in emails
+
+
+def test_script_and_style_are_not_text(backend):
+    document = backend.parse(PAGES['script_style'])
+    text = backend.text(document)
+    assert 'hello@acme-insurance.com' in text
+    for hidden in ('style@', 'script@', 'ld@'):
+        assert hidden not in text
+
+
+def test_malformed_markup(backend):
+    links, emails = extract(backend, PAGES['malformed'])
+    assert links['mailto'] == {'broker@acme-insurance.com'}
+    assert links['social']['instagram'] == 'https://instagram.com/acme'
+    assert 'https://acme-insurance.com/contact' in links['contact']
+    assert {'agent@acme-insurance.com', 'quotes@acme-insurance.com'} <= emails
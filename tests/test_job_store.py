@@ -0,0 +1,231 @@
+"""
+Shared contract of the job store backends: every backend runs the same
+tests. Redis runs only when the redis package is installed and a server
+answers at REDIS_URL.
+"""
+
+import threading
+import time
+import uuid
+
+import pytest
+
+from job_store import JobCancelled, JobProgress, MemoryJobStore, RedisJobStore, SQLiteJobStore, apply_update
+
+PARAMS = {'industry': 'insurance', 'number': 5, 'country': 'US', 'enable_web_scraping': False}
+
+
+def make_store(backend, tmp_path, **kwargs):
+    if backend == 'memory':
+        return MemoryJobStore(**kwargs)
+    if backend == 'sqlite':
+        return SQLiteJobStore(path=str(tmp_path / 'jobs.sqlite3'), **kwargs)
+    pytest.importorskip('redis')
+    store = RedisJobStore(prefix=f'leadgen-test:{uuid.uuid4().hex}', **kwargs)
+    try:
+        store.redis.ping()
+    except Exception:
+        pytest.skip('No Redis server at REDIS_URL')
+    return store
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store_factory(request, tmp_path):
+    stores = []
+
+    def factory(**kwargs):
+        stores.append(make_store(request.param, tmp_path, **kwargs))
+        return stores[-1]
+
+    yield factory
+    for store in stores:
+        if isinstance(store, RedisJobStore):
+            keys = list(store.redis.scan_iter(f'{store.prefix}:*'))
+            if keys:
+                store.redis.delete(*keys)
+
+
+def test_apply_update_bumps_version_and_finishes():
+    job = {'job_id': 'j', 'status': 'processing', 'version': 3, 'expires_at': 0, 'partial_result': {'companies': []}}
+    apply_update(job, {'progress': {'generated': 1}}, ttl=60)
+    assert job['version'] == 4
+    assert 'partial_result' in job
+
+    apply_update(job, {'status': 'completed', 'result': {'companies': []}}, ttl=60)
+    assert job['version'] == 5
+    assert 'partial_result' not in job
+    assert job['expires_at'] > time.time() + 50
+
+
+def test_create_and_get(store_factory):
+    store = store_factory()
+    created = store.create('job-1', PARAMS)
+    job = store.get('job-1')
+    assert job['status'] == 'queued'
+    assert job['params'] == PARAMS
+    assert job['version'] == created['version'] == 0
+    assert store.get('missing') is None
+
+
+def test_claim_is_exclusive_and_oldest_first(store_factory):
+    store = store_factory()
+    store.create('job-1', PARAMS)
+    time.sleep(0.01)
+    store.create('job-2', PARAMS)
+
+    first = store.claim_next('worker-a')
+    second = store.claim_next('worker-b')
+    assert first['job_id'] == 'job-1'
+    assert second['job_id'] == 'job-2'
+    assert store.claim_next('worker-c') is None
+
+    job = store.get('job-1')
+    assert job['status'] == 'processing'
+    assert job['worker_id'] == 'worker-a'
+    assert job['version'] == 1
+
+
+def test_expired_lease_is_claimed_again(store_factory):
+    store = store_factory(lease=0.2)
+    store.create('job-1', PARAMS)
+    assert store.claim_next('worker-a')['job_id'] == 'job-1'
+    assert store.claim_next('worker-b') is None
+
+    time.sleep(0.3)
+    reclaimed = store.claim_next('worker-b')
+    assert reclaimed['job_id'] == 'job-1'
+    assert reclaimed['worker_id'] == 'worker-b'
+
+
+def test_update_bumps_version(store_factory):
+    store = store_factory()
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+    store.update('job-1', progress={'generated': 2}, partial_result={'companies': [{'company_name': 'A'}]})
+    job = store.get('job-1')
+    assert job['version'] == 2
+    assert job['partial_result']['companies'][0]['company_name'] == 'A'
+
+    store.update('job-1', status='completed', result={'companies': []})
+    job = store.get('job-1')
+    assert job['version'] == 3
+    assert job['status'] == 'completed'
+    assert 'partial_result' not in job
+    # Finished jobs are never handed out again
+    assert store.claim_next('worker-b') is None
+
+
+def test_concurrent_updates_are_not_lost(store_factory):
+    store = store_factory()
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+
+    def writer(field):
+        for i in range(25):
+            store.update('job-1', **{field: i})
+
+    threads = [threading.Thread(target=writer, args=(field,)) for field in ('progress_a', 'progress_b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    job = store.get('job-1')
+    assert job['version'] == 1 + 50
+    assert job['progress_a'] == job['progress_b'] == 24
+
+
+def test_progress_keeps_a_long_job_claimed(store_factory):
+    store = store_factory(lease=0.5)
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+    progress = JobProgress(store, 'job-1', interval=0.1, owner='worker-a')
+
+    # Runs for three leases, reporting progress all along
+    deadline = time.time() + 1.5
+    while time.time() < deadline:
+        progress.shard_generated([{'company_name': 'A'}])
+        assert store.claim_next('worker-b') is None
+        time.sleep(0.05)
+
+    assert store.update('job-1', owner='worker-a', status='completed', result={'companies': []})
+    job = store.get('job-1')
+    assert job['status'] == 'completed'
+    assert job['worker_id'] == 'worker-a'
+
+
+def test_reclaimed_job_refuses_the_old_owner(store_factory):
+    store = store_factory(lease=0.2)
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+    time.sleep(0.3)  # silent past its lease
+    assert store.claim_next('worker-b')['worker_id'] == 'worker-b'
+
+    assert store.update('job-1', owner='worker-a', status='completed', result={'companies': []}) is False
+    assert store.requeue('job-1', owner='worker-a') is False
+    with pytest.raises(JobCancelled):
+        JobProgress(store, 'job-1', owner='worker-a').flush(force=True)
+
+    job = store.get('job-1')
+    assert job['status'] == 'processing'
+    assert job['worker_id'] == 'worker-b'
+    assert store.update('job-1', owner='worker-b', status='completed', result={'companies': []})
+
+
+def test_requeue_hands_job_back(store_factory):
+    store = store_factory()
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+    store.requeue('job-1')
+
+    job = store.get('job-1')
+    assert job['status'] == 'queued'
+    assert job['worker_id'] is None
+    claimed = store.claim_next('worker-b')
+    assert claimed['job_id'] == 'job-1'
+    assert claimed['worker_id'] == 'worker-b'
+
+
+def test_status_long_poll_wakes_on_update(store_factory, monkeypatch):
+    from fastapi.testclient import TestClient
+    import api
+
+    store = store_factory()
+    monkeypatch.setattr(api, 'job_store', store)
+    monkeypatch.setattr(api, 'JOB_STATUS_WAIT_INTERVAL', 0.05)
+    store.create('job-1', PARAMS)
+    store.claim_next('worker-a')
+    version = store.get('job-1')['version']
+
+    timer = threading.Timer(0.3, store.update, args=('job-1',), kwargs={'progress': {'generated': 3}})
+    timer.start()
+    try:
+        # Without lifespan events, so no job workers claim from the store
+        client = TestClient(api.app)
+        start = time.time()
+        response = client.get('/api/v1/leads/status/job-1', params={'version': version, 'wait': 10})
+        elapsed = time.time() - start
+    finally:
+        timer.cancel()
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body['version'] > version
+    assert body['progress'] == {'generated': 3}
+    assert 0.2 < elapsed < 5
+
+
+def test_status_long_poll_times_out_unchanged(store_factory, monkeypatch):
+    from fastapi.testclient import TestClient
+    import api
+
+    store = store_factory()
+    monkeypatch.setattr(api, 'job_store', store)
+    monkeypatch.setattr(api, 'JOB_STATUS_WAIT_INTERVAL', 0.05)
+    store.create('job-1', PARAMS)
+    version = store.get('job-1')['version']
+
+    start = time.time()
+    body = TestClient(api.app).get('/api/v1/leads/status/job-1', params={'version': version, 'wait': 0.3}).json()
+    assert body['version'] == version
+    assert time.time() - start >= 0.3
@@ -0,0 +1,79 @@
+"""robots.txt download outcomes and how long each is cached"""
+
+import requests
+
+from robots import RobotsCache
+
+URL = 'https://acme-insurance.com/contact'
+
+
+class RecordingCache:
+    def __init__(self):
+        self.ttls = {}
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        self.ttls[key] = ttl
+
+
+class Document:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class ScriptedFetcher:
+    """Answers robots.txt requests from a list of documents or exceptions"""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def fetch(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def server_error():
+    response = requests.Response()
+    response.status_code = 503
+    return requests.HTTPError('503 Server Error', response=response)
+
+
+def rules(*outcomes):
+    cache = RecordingCache()
+    robots = RobotsCache(cache, ttl=86400, error_ttl=3600, unreachable_ttl=60)
+    fetcher = ScriptedFetcher(*outcomes)
+    return robots.rules_for(URL, fetcher), fetcher.calls, cache.ttls['https://acme-insurance.com/robots.txt']
+
+
+def test_single_timeout_is_retried():
+    result, calls, ttl = rules(requests.Timeout('read timed out'), Document(200, 'User-agent: *\nDisallow: /private\n'))
+    assert calls == 2
+    assert result.can_fetch(URL)
+    assert not result.can_fetch('https://acme-insurance.com/private')
+    assert ttl == 86400
+
+
+def test_unreachable_host_is_blocked_briefly():
+    result, calls, ttl = rules(requests.Timeout('read timed out'), requests.ConnectionError('DNS failure'))
+    assert calls == 2
+    assert not result.can_fetch(URL)
+    assert ttl == 60
+
+
+def test_server_error_is_blocked_for_the_error_ttl():
+    result, calls, ttl = rules(server_error())
+    assert calls == 1
+    assert not result.can_fetch(URL)
+    assert ttl == 3600
+
+
+def test_missing_robots_txt_allows_everything():
+    result, calls, ttl = rules(Document(404))
+    assert result.can_fetch(URL)
+    assert ttl == 86400
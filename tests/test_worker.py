@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import worker
+from job_store import SQLiteJobStore
+
+JOB_SECONDS = 3
+
+
+def slow_job(job):
+    """Stand-in for process_job: takes a while, then stores its result"""
+    time.sleep(JOB_SECONDS)
+    store = SQLiteJobStore(path=job['params']['store_path'])
+    store.update(job['job_id'], status='completed', result={'companies': []})
+    return {'job_id': job['job_id'], 'status': 'completed', 'pid': 0, 'seconds': JOB_SECONDS}
+
+
+def start_worker(tmp_path, monkeypatch, **kwargs):
+    store_path = str(tmp_path / 'jobs.sqlite3')
+    store = SQLiteJobStore(path=store_path)
+    store.create('job-1', {'store_path': store_path})
+    monkeypatch.setattr(worker, 'process_job', slow_job)
+
+    w = worker.Worker(processes=1, poll_interval=0.05, report_interval=3600, **kwargs)
+    w.store = store
+    thread = threading.Thread(target=w.run)
+    thread.start()
+    deadline = time.time() + 5
+    while store.get('job-1')['status'] != 'processing' and time.time() < deadline:
+        time.sleep(0.05)
+    return w, store, thread
+
+
+def test_hard_stop_kills_running_job_before_requeueing(tmp_path, monkeypatch):
+    w, store, thread = start_worker(tmp_path, monkeypatch)
+    time.sleep(0.3)  # the job is running in the pool process
+
+    start = time.time()
+    w.draining.set()
+    w.stopping.set()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert time.time() - start < JOB_SECONDS - 1
+
+    assert store.get('job-1')['status'] == 'queued'
+    # The killed process never gets to write its result
+    time.sleep(JOB_SECONDS)
+    assert store.get('job-1')['status'] == 'queued'
+
+
+def test_drain_timeout_kills_running_job(tmp_path, monkeypatch):
+    w, store, thread = start_worker(tmp_path, monkeypatch, drain_timeout=0.5)
+    w.draining.set()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    time.sleep(JOB_SECONDS)
+    assert store.get('job-1')['status'] == 'queued'
+
+
+def test_drain_waits_for_running_job(tmp_path, monkeypatch):
+    w, store, thread = start_worker(tmp_path, monkeypatch)
+    w.draining.set()
+    thread.join(timeout=JOB_SECONDS + 10)
+    assert store.get('job-1')['status'] == 'completed'
+
+
+def test_requeue_leaves_finished_job_alone(tmp_path):
+    store = SQLiteJobStore(path=str(tmp_path / 'jobs.sqlite3'))
+    store.create('job-1', {})
+    store.claim_next('worker-a')
+    store.update('job-1', status='completed', result={'companies': []})
+    assert store.requeue('job-1') is False
+    assert store.get('job-1')['status'] == 'completed'
+
+
+def test_job_code_does_not_load_the_api():
+    # Pool processes import the pipeline, not the API with its stores and executors
+    code = "import sys, lead_generation; sys.exit('api' in sys.modules)"
+    completed = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert completed.returncode == 0
@@ -1,144 +1,497 @@
 # To run this code you need to install the following dependencies:
 # pip install beautifulsoup4 requests
+# Optional HTTP/2 support: pip install 'httpx[http2]' and set FETCH_HTTP2=true
 
+import os
 import re
-import requests
+import asyncio
+import threading
+import time
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import time
-from typing import Dict, List, Set, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Set, Optional, Tuple
+
+from cache import SQLiteCache
+from http_fetcher import DEFAULT_HEADERS, get_fetcher, track_fetches, UnsupportedContentType
+from rate_limiter import HostScheduler, get_host_scheduler, host_key
+from robots import RobotsRules, get_robots_cache
+from sitemap import SITEMAP_DISCOVERY, STRONG_CONTACT_SCORE, SitemapDiscovery, contact_score, rank_contact_urls
+from html_parsers import HTMLParserBackend, get_parser
+from email_extractor import MAILTO_RE, EmailExtractor, get_email_extractor
+
+# Concurrency limits for scrape_company_data: total sites in flight, and
+# sites in flight that share a host (subsidiaries, shared CDNs, ...)
+SCRAPE_MAX_WORKERS = int(os.getenv('SCRAPE_MAX_WORKERS', '8'))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv('SCRAPE_PER_HOST_LIMIT', '1'))
+
+# Persistent scrape-result cache keyed by domain (see get_scrape_cache)
+SCRAPE_CACHE_ENABLED = os.getenv('SCRAPE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SCRAPE_CACHE_TTL = float(os.getenv('SCRAPE_CACHE_TTL', str(24 * 3600)))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv('SCRAPE_CACHE_MAX_ENTRIES', '5000'))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv('SCRAPE_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+# Contact pages fetched per site (best-ranked first)
+SCRAPE_CONTACT_PAGES = int(os.getenv('SCRAPE_CONTACT_PAGES', '3'))
+PRIORITY_EMAIL_KEYWORDS = ('contact', 'info', 'hello', 'support', 'sales', 'business')
+
+# Per-company crawl budget (see CrawlBudget): stop once a priority email on the
+# site's own domain and SCRAPE_STOP_SOCIALS social profiles are found, or once
+# SCRAPE_TIME_BUDGET seconds / SCRAPE_BYTE_BUDGET bytes are spent (0 = no limit)
+SCRAPE_EARLY_STOP = os.getenv('SCRAPE_EARLY_STOP', 'true').lower() in ('1', 'true', 'yes')
+SCRAPE_STOP_SOCIALS = int(os.getenv('SCRAPE_STOP_SOCIALS', '2'))
+SCRAPE_TIME_BUDGET = float(os.getenv('SCRAPE_TIME_BUDGET', '30'))
+SCRAPE_BYTE_BUDGET = int(os.getenv('SCRAPE_BYTE_BUDGET', str(4 * 1024 * 1024)))
+
+# ========== Link Classification ==========
+
+# Social platform lookup by host (subdomains like www./m./uk. are stripped)
+SOCIAL_HOSTS = {
+    'linkedin.com': 'linkedin',
+    'twitter.com': 'twitter',
+    'x.com': 'twitter',
+    'facebook.com': 'facebook',
+    'instagram.com': 'instagram',
+    'youtube.com': 'youtube',
+    'youtu.be': 'youtube',
+}
+# Share/embed links that are not the company's own profile
+SOCIAL_EXCLUDED_PATHS = {
+    'twitter': ('/intent/',),
+    'facebook': ('/sharer',),
+    'youtube': ('/embed/', '/watch?'),
+}
+LINKEDIN_PROFILE_PATHS = ('/company', '/in')
+
+CONTACT_KEYWORDS_RE = re.compile(r'contact|about|support|help|get-in-touch|reach-us|connect')
+
+
+def social_platform(host: str) -> Optional[str]:
+    """Map a host (or any of its parent domains) to a social platform"""
+    host = host.lower()
+    while host:
+        if host in SOCIAL_HOSTS:
+            return SOCIAL_HOSTS[host]
+        dot = host.find('.')
+        if dot == -1:
+            return None
+        host = host[dot + 1:]
+    return None
+
+
+def classify_links(anchors, base_url: str) -> Dict:
+    """
+    Sort page anchors into buckets in a single pass.
+    
+    Args:
+        anchors: Iterable of (href, link_text) pairs
+        base_url: URL of the page the anchors came from
+    
+    Returns:
+        dict: {mailto: set of emails, social: {platform: url},
+               contact: same-host contact candidate URLs, ignored: int}
+    """
+    mailto = set()
+    social = {
+        'linkedin': None,
+        'twitter': None,
+        'facebook': None,
+        'instagram': None,
+        'youtube': None
+    }
+    contact = []
+    ignored = 0
+    base_netloc = urlparse(base_url).netloc
+    
+    for href, link_text in anchors:
+        href = href.strip()
+        lower = href.lower()
+        
+        if lower.startswith('mailto:'):
+            email_match = MAILTO_RE.match(href)
+            if email_match:
+                mailto.add(email_match.group(1))
+            continue
+        
+        if lower.startswith(('http:', 'https:', '//')):
+            parsed = urlparse(lower)
+            platform = social_platform(parsed.hostname or '')
+            if platform:
+                if social[platform]:
+                    continue
+                if platform == 'linkedin' and not parsed.path.startswith(LINKEDIN_PROFILE_PATHS):
+                    continue
+                if any(excluded in lower for excluded in SOCIAL_EXCLUDED_PATHS.get(platform, ())):
+                    continue
+                social[platform] = href if lower.startswith('http') else urljoin(base_url, href)
+                continue
+        
+        if CONTACT_KEYWORDS_RE.search(lower) or CONTACT_KEYWORDS_RE.search(link_text.lower()):
+            full_url = urljoin(base_url, href)
+            # Make sure it's from the same domain
+            if urlparse(full_url).netloc == base_netloc:
+                if full_url not in contact:
+                    contact.append(full_url)
+                continue
+        
+        ignored += 1
+    
+    return {'mailto': mailto, 'social': social, 'contact': contact, 'ignored': ignored}
+
+
+def soup_anchors(soup: BeautifulSoup) -> List[tuple]:
+    """(href, link_text) pairs for every <a href> in a BeautifulSoup document"""
+    return HTMLParserBackend().anchors(soup)
+
+
+def has_priority_email(emails: Set[str], base_url: str) -> bool:
+    """A priority mailbox (info@, contact@, ...) on the site's own domain or a subdomain"""
+    site = (urlparse(base_url).hostname or '').lower()
+    if site.startswith('www.'):
+        site = site[4:]
+    for email in emails:
+        local, _, domain = email.lower().partition('@')
+        same_site = domain == site or site.endswith('.' + domain) or domain.endswith('.' + site)
+        if same_site and any(keyword in local for keyword in PRIORITY_EMAIL_KEYWORDS):
+            return True
+    return False
+
+
+class CrawlBudget:
+    """Stop conditions for crawling one company's website"""
+    def __init__(
+        self,
+        stop_socials: int = SCRAPE_STOP_SOCIALS,
+        time_budget: float = SCRAPE_TIME_BUDGET,
+        byte_budget: int = SCRAPE_BYTE_BUDGET,
+        early_stop: bool = SCRAPE_EARLY_STOP
+    ):
+        self.stop_socials = stop_socials
+        self.time_budget = time_budget
+        self.byte_budget = byte_budget
+        self.early_stop = early_stop
+        self.started = time.monotonic()
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def stop_reason(self, emails: Set[str], social_media: Dict[str, Optional[str]], base_url: str,
+                    bytes_downloaded: int) -> Optional[str]:
+        """Why crawling should stop now ('found', 'time_budget', 'byte_budget'), or None"""
+        if self.early_stop and has_priority_email(emails, base_url):
+            if sum(1 for url in social_media.values() if url) >= self.stop_socials:
+                return 'found'
+        if self.time_budget and self.elapsed() >= self.time_budget:
+            return 'time_budget'
+        if self.byte_budget and bytes_downloaded >= self.byte_budget:
+            return 'byte_budget'
+        return None
+
+
+class ScrapedPage:
+    """A fetched document, parsed once and shared by every extractor"""
+    def __init__(self, url: str, html: str, size: int, parser=None, headers=None):
+        self.url = url
+        self.size = size  # bytes downloaded
+        self.headers = headers or {}
+        self.parser = parser or get_parser()
+        self.document = self.parser.parse(html)
+        self._text = None
+        self._links = None
+    
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.parser.text(self.document)
+        return self._text
+    
+    @property
+    def links(self) -> Dict:
+        """Anchors classified once, see classify_links"""
+        if self._links is None:
+            self._links = classify_links(self.parser.anchors(self.document), self.url)
+        return self._links
+
 
 class WebScraper:
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    def __init__(self, fetcher=None, parser=None, cache=None, scheduler: Optional[HostScheduler] = None,
+                 robots=None, budget: Optional[CrawlBudget] = None):
+        self.headers = dict(DEFAULT_HEADERS)
         self.timeout = 10
         self.visited_urls = set()
+        # Pooled HTTP client shared across scrapers (keep-alive, per-host pools);
+        # pass any object with get()/fetch() like http_fetcher.PooledFetcher to swap it out
+        self.fetcher = fetcher or get_fetcher()
+        # HTML parser backend (see html_parsers, SCRAPER_PARSER)
+        self.parser = parser or get_parser()
+        self.email_extractor: EmailExtractor = get_email_extractor()
+        # Scrape-result cache; None uses the shared one, False disables caching
+        self.cache = get_scrape_cache() if cache is None else (cache or None)
+        # Per-host politeness (rate, Crawl-delay, Retry-After) shared by all scrapers
+        self.scheduler = scheduler or get_host_scheduler()
+        # robots.txt rules cache; None uses the shared one, False ignores robots.txt
+        self.robots = get_robots_cache() if robots is None else (robots or None)
+        self.robots_rules: Optional[RobotsRules] = None
+        # Per-company stop conditions, restarted for every website
+        self.budget = budget or CrawlBudget()
+        self.crawl_stats = self._new_crawl_stats()
+        self.homepage = None
+        self.page_stats = self._new_page_stats()
         
+    @staticmethod
+    def _new_page_stats() -> Dict:
+        return {
+            'pages_parsed': 0,
+            'bytes_downloaded': 0,
+            'parses_saved': 0,
+            'bytes_saved': 0,
+            'pages_skipped': 0,    # not HTML/text, body never read
+            'pages_truncated': 0,  # cut off at FETCH_MAX_BYTES
+            'throttle_wait_seconds': 0.0,  # time spent waiting for per-host rate limits
+            'retry_after': 0,      # 429/503 responses retried after Retry-After
+            'robots_blocked': 0,   # URLs not fetched because robots.txt disallows them
+            'sitemap': None,       # sitemap discovery stats, if sitemaps were read
+            'pages': []            # per page: url, bytes_read, truncated, content_type
+        }
+    
+    @staticmethod
+    def _new_crawl_stats() -> Dict:
+        return {
+            'pages_fetched': 0,
+            'pages_skipped': 0,         # contact pages not fetched because the crawl stopped early
+            'stop_reason': None,        # found / time_budget / byte_budget / cache, None if crawled fully
+            'elapsed_seconds': 0.0,
+            'time_saved_seconds': 0.0   # pages_skipped x average time per fetched page
+        }
+    
     def extract_emails(self, text: str) -> Set[str]:
-        """Extract email addresses from text using regex"""
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = set(re.findall(email_pattern, text))
-        
-        # Filter out common non-contact emails
-        excluded_patterns = ['example.com', 'domain.com', 'email.com', 'yourcompany.com', 
-                           'company.com', 'test.com', 'sample.com', 'placeholder']
-        
-        filtered_emails = set()
-        for email in emails:
-            if not any(pattern in email.lower() for pattern in excluded_patterns):
-                # Also filter out image file extensions that might be caught
-                if not email.lower().endswith(('.png', '.jpg', '.gif', '.svg')):
-                    filtered_emails.add(email)
-        
-        return filtered_emails
+        """Extract email addresses from text, minus placeholders (see email_extractor)"""
+        return self.email_extractor.extract(text)
     
     def extract_social_media(self, soup: BeautifulSoup, base_url: str) -> Dict[str, Optional[str]]:
         """Extract social media links from the page"""
-        social_media = {
-            'linkedin': None,
-            'twitter': None,
-            'facebook': None,
-            'instagram': None,
-            'youtube': None
-        }
-        
-        # Find all links
-        links = soup.find_all('a', href=True)
-        
-        for link in links:
-            href = link['href'].lower()
-            
-            # LinkedIn
-            if 'linkedin.com/company' in href or 'linkedin.com/in' in href:
-                if not social_media['linkedin']:
-                    social_media['linkedin'] = link['href'] if link['href'].startswith('http') else urljoin(base_url, link['href'])
-            
-            # Twitter/X
-            elif 'twitter.com' in href or 'x.com' in href:
-                if not social_media['twitter'] and '/intent/' not in href:
-                    social_media['twitter'] = link['href'] if link['href'].startswith('http') else urljoin(base_url, link['href'])
-            
-            # Facebook
-            elif 'facebook.com' in href:
-                if not social_media['facebook'] and '/sharer' not in href:
-                    social_media['facebook'] = link['href'] if link['href'].startswith('http') else urljoin(base_url, link['href'])
-            
-            # Instagram
-            elif 'instagram.com' in href:
-                if not social_media['instagram']:
-                    social_media['instagram'] = link['href'] if link['href'].startswith('http') else urljoin(base_url, link['href'])
-            
-            # YouTube
-            elif 'youtube.com' in href or 'youtu.be' in href:
-                if not social_media['youtube'] and '/embed/' not in href and '/watch?' not in href:
-                    social_media['youtube'] = link['href'] if link['href'].startswith('http') else urljoin(base_url, link['href'])
-        
-        return social_media
+        return classify_links(soup_anchors(soup), base_url)['social']
     
     def find_contact_page_urls(self, soup: BeautifulSoup, base_url: str) -> List[str]:
         """Find potential contact page URLs"""
-        contact_urls = []
-        contact_keywords = ['contact', 'contact-us', 'contactus', 'about', 'about-us', 
-                          'support', 'help', 'get-in-touch', 'reach-us', 'connect']
+        return self.select_contact_urls(classify_links(soup_anchors(soup), base_url)['contact'])
+    
+    def select_contact_urls(self, candidates: List[str]) -> List[str]:
+        """Pick the best-ranked contact pages worth fetching from candidates"""
+        contact_urls = [url for url in dict.fromkeys(candidates) if url not in self.visited_urls and self.allowed(url)]
+        return rank_contact_urls(contact_urls, SCRAPE_CONTACT_PAGES)
+    
+    def discover_contact_urls(self, base_url: str, homepage: 'ScrapedPage') -> List[str]:
+        """
+        Contact pages from homepage links, plus the site's sitemaps when the
+        homepage links to no obvious contact page
+        """
+        contact_urls = self.select_contact_urls(homepage.links['contact'])
+        if not SITEMAP_DISCOVERY or (contact_urls and contact_score(contact_urls[0]) >= STRONG_CONTACT_SCORE):
+            return contact_urls
         
-        links = soup.find_all('a', href=True)
+        discovery = SitemapDiscovery(
+            self.fetcher,
+            top_k=SCRAPE_CONTACT_PAGES,
+            acquire=self.scheduler.acquire,
+            allowed=self.allowed,
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        sitemap_urls = discovery.discover(base_url, self.robots_rules.sitemaps if self.robots_rules else None)
+        self.page_stats['sitemap'] = dict(discovery.stats, candidates=len(sitemap_urls))
+        return self.select_contact_urls(contact_urls + sitemap_urls)
+    
+    def load_robots(self, base_url: str) -> Optional[RobotsRules]:
+        """Load the site's robots.txt rules and apply its Crawl-delay to the scheduler"""
+        self.robots_rules = None
+        if not self.robots:
+            return None
+        self.robots_rules = self.robots.rules_for(
+            base_url, self.fetcher, self.scheduler, headers=self.headers, timeout=self.timeout
+        )
+        if self.robots_rules.crawl_delay:
+            self.scheduler.set_crawl_delay(base_url, self.robots_rules.crawl_delay)
+        return self.robots_rules
+    
+    def allowed(self, url: str) -> bool:
+        """robots.txt check for url; counts blocked URLs in page_stats"""
+        if self.robots_rules is None or self.robots_rules.can_fetch(url):
+            return True
+        self.page_stats['robots_blocked'] += 1
+        return False
+    
+    def fetch_page(self, url: str) -> Optional['ScrapedPage']:
+        """Download and parse a page once; None if the request fails"""
+        try:
+            document = self._polite_fetch(url)
+        except UnsupportedContentType as e:
+            print(f"  - {str(e)}")
+            self.page_stats['pages_skipped'] += 1
+            return None
+        except Exception as e:
+            print(f"Error scraping {url}: {str(e)}")
+            return None
         
-        for link in links:
-            href = link['href'].lower()
-            link_text = link.get_text().lower()
-            
-            # Check if it's a contact-related link
-            if any(keyword in href or keyword in link_text for keyword in contact_keywords):
-                full_url = urljoin(base_url, link['href'])
-                
-                # Make sure it's from the same domain
-                if urlparse(full_url).netloc == urlparse(base_url).netloc:
-                    if full_url not in contact_urls and full_url not in self.visited_urls:
-                        contact_urls.append(full_url)
+        self.page_stats['pages'].append({
+            'url': url,
+            'bytes_read': document.size,
+            'truncated': document.truncated,
+            'content_type': document.content_type
+        })
+        self.page_stats['bytes_downloaded'] += document.size
+        if document.truncated:
+            self.page_stats['pages_truncated'] += 1
+        
+        try:
+            page = ScrapedPage(url, document.text, document.size, self.parser, document.headers)
+            self.page_stats['pages_parsed'] += 1
+            return page
+        except Exception as e:
+            print(f"Error scraping {url}: {str(e)}")
+            return None
+    
+    def _polite_fetch(self, url: str):
+        """Fetch once the host's rate limit allows; retry once after a 429/503 Retry-After"""
+        self.page_stats['throttle_wait_seconds'] += self.scheduler.acquire(url)
+        try:
+            return self.fetcher.fetch(url, headers=self.headers, timeout=self.timeout)
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if response is None or response.status_code not in (429, 503):
+                raise
+            delay = self.scheduler.retry_after(url, response.headers.get('Retry-After'))
+            if delay is None:
+                raise
+            print(f"  - {url} asked to retry after {delay:.0f}s")
+            self.page_stats['retry_after'] += 1
+            self.page_stats['throttle_wait_seconds'] += self.scheduler.acquire(url)
+            return self.fetcher.fetch(url, headers=self.headers, timeout=self.timeout)
+    
+    def extract_page(self, page: 'ScrapedPage') -> tuple[Set[str], Dict[str, Optional[str]]]:
+        """Extract emails and social media from an already parsed page"""
+        # Extract emails from page text and HTML
+        emails = self.extract_emails(page.text)
         
-        return contact_urls[:5]  # Limit to first 5 contact pages
+        # Mailto and social links come from the single classification pass
+        emails.update(page.links['mailto'])
+        social_media = dict(page.links['social'])
+        
+        return emails, social_media
     
     def scrape_page(self, url: str) -> tuple[Set[str], Dict[str, Optional[str]]]:
         """Scrape a single page for emails and social media"""
-        emails = set()
-        social_media = {
-            'linkedin': None,
-            'twitter': None,
-            'facebook': None,
-            'instagram': None,
-            'youtube': None
-        }
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout, allow_redirects=True)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract emails from page text and HTML
-            page_text = soup.get_text()
-            emails = self.extract_emails(page_text)
-            
-            # Also check mailto links
-            mailto_links = soup.find_all('a', href=re.compile(r'^mailto:', re.IGNORECASE))
-            for mailto in mailto_links:
-                email_match = re.search(r'mailto:([^\?\"\'>\s]+)', mailto['href'], re.IGNORECASE)
-                if email_match:
-                    emails.add(email_match.group(1))
-            
-            # Extract social media
-            social_media = self.extract_social_media(soup, url)
-            
-            return emails, social_media
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error scraping {url}: {str(e)}")
-            return emails, social_media
+        page = self.fetch_page(url)
+        if page is None:
+            return set(), {
+                'linkedin': None,
+                'twitter': None,
+                'facebook': None,
+                'instagram': None,
+                'youtube': None
+            }
+        return self.extract_page(page)
     
     def scrape_website(self, base_url: str) -> Dict:
         """Scrape the entire website for contact info and social media"""
+        # fetch_stats: requests made, connections opened, handshakes saved by keep-alive
+        # page_stats: documents parsed/downloaded, and the re-downloads and
+        # re-parses avoided by reusing the homepage for contact-link discovery
+        # crawl_stats: pages fetched/skipped under the crawl budget and why it stopped
+        self.page_stats = self._new_page_stats()
+        self.crawl_stats = self._new_crawl_stats()
+        self.robots_rules = None
+        self.budget.start()
+        with track_fetches() as fetch_stats:
+            result = self._cached_result(base_url)
+            if result is None:
+                result = self._scrape_website(base_url)
+                self._store_result(base_url, result)
+            else:
+                self.crawl_stats['stop_reason'] = 'cache'
+        self._finish_crawl_stats()
+        result['fetch_stats'] = fetch_stats
+        result['page_stats'] = self.page_stats
+        result['crawl_stats'] = self.crawl_stats
+        if self.robots_rules is not None:
+            result['robots'] = {
+                'crawl_delay': self.robots_rules.crawl_delay,
+                'sitemaps': self.robots_rules.sitemaps
+            }
+        return result
+    
+    def _finish_crawl_stats(self):
+        elapsed = self.budget.elapsed()
+        fetched = len(self.page_stats['pages'])
+        self.crawl_stats['pages_fetched'] = fetched
+        self.crawl_stats['elapsed_seconds'] = round(elapsed, 3)
+        if fetched:
+            self.crawl_stats['time_saved_seconds'] = round(self.crawl_stats['pages_skipped'] * elapsed / fetched, 3)
+    
+    def _stop_crawl(self, emails: Set[str], social_media: Dict, base_url: str, remaining: int) -> bool:
+        """Check the crawl budget; records the reason and skipped pages when stopping"""
+        reason = self.budget.stop_reason(emails, social_media, base_url, self.page_stats['bytes_downloaded'])
+        if reason is None:
+            return False
+        self.crawl_stats['stop_reason'] = reason
+        self.crawl_stats['pages_skipped'] += remaining
+        print(f"  - Stopping early ({reason}), skipping {remaining} pages")
+        return True
+    
+    def _cached_result(self, base_url: str) -> Optional[Dict]:
+        """Serve a fresh cache entry, or revalidate a stale one with a conditional GET"""
+        if not self.cache:
+            return None
+        
+        key = host_key(base_url)
+        entry = self.cache.get(key, allow_expired=True)
+        if entry is None:
+            return None
+        
+        if entry.is_fresh:
+            status = 'hit'
+        else:
+            etag = entry.metadata.get('etag')
+            last_modified = entry.metadata.get('last_modified')
+            if not (etag or last_modified):
+                return None
+            try:
+                self.scheduler.acquire(base_url)
+                not_modified = self.fetcher.revalidate(
+                    base_url, etag, last_modified, headers=self.headers, timeout=self.timeout
+                )
+            except Exception as e:
+                print(f"  - Revalidation failed for {base_url}: {str(e)}")
+                return None
+            if not not_modified:
+                return None
+            self.cache.touch(key)
+            status = 'revalidated'
+        
+        print(f"\nScraping: {base_url} (cache {status}, {int(entry.age)}s old)")
+        result = dict(entry.value)
+        result['cache'] = status
+        return result
+    
+    def _store_result(self, base_url: str, result: Dict):
+        result['cache'] = 'miss'
+        # Only cache sites whose homepage could actually be fetched
+        if not self.cache or self.homepage is None:
+            return
+        self.cache.set(
+            host_key(base_url),
+            {key: result[key] for key in ('contact_email', 'all_emails', 'social_media')},
+            metadata={
+                'url': base_url,
+                'etag': self.homepage.headers.get('ETag'),
+                'last_modified': self.homepage.headers.get('Last-Modified')
+            }
+        )
+    
+    def _scrape_website(self, base_url: str) -> Dict:
         print(f"\nScraping: {base_url}")
         
         all_emails = set()
@@ -151,11 +504,20 @@ class WebScraper:
         }
         
         self.visited_urls = set()
+        self.homepage = None
         
         try:
+            # robots.txt: allowed paths, Crawl-delay and sitemaps for this host
+            self.load_robots(base_url)
+            
             # First, scrape the homepage
             self.visited_urls.add(base_url)
-            emails, social_media = self.scrape_page(base_url)
+            if not self.allowed(base_url):
+                print(f"  - Homepage disallowed by robots.txt")
+                homepage = None
+            else:
+                homepage = self.homepage = self.fetch_page(base_url)
+            emails, social_media = self.extract_page(homepage) if homepage else (set(), {})
             all_emails.update(emails)
             
             # Update social media (keep first found)
@@ -165,16 +527,21 @@ class WebScraper:
             
             print(f"  - Homepage scraped: {len(emails)} emails found")
             
-            # Get the homepage soup to find contact pages
-            response = requests.get(base_url, headers=self.headers, timeout=self.timeout)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find and scrape contact pages
-            contact_urls = self.find_contact_page_urls(soup, base_url)
+            # Find and scrape contact pages, reusing the parsed homepage;
+            # sitemaps are only read if the budget allows more pages
+            contact_urls = []
+            if homepage:
+                linked = self.select_contact_urls(homepage.links['contact'])
+                if not self._stop_crawl(all_emails, final_social_media, base_url, len(linked)):
+                    contact_urls = self.discover_contact_urls(base_url, homepage)
+                self.page_stats['parses_saved'] += 1
+                self.page_stats['bytes_saved'] += homepage.size
             print(f"  - Found {len(contact_urls)} potential contact pages")
             
-            for contact_url in contact_urls:
-                time.sleep(1)  # Be respectful to the server
+            # Pacing between requests to this host comes from self.scheduler
+            for position, contact_url in enumerate(contact_urls):
+                if self._stop_crawl(all_emails, final_social_media, base_url, len(contact_urls) - position):
+                    break
                 self.visited_urls.add(contact_url)
                 
                 emails, social_media = self.scrape_page(contact_url)
@@ -193,9 +560,8 @@ class WebScraper:
             
             if email_list:
                 # Prioritize emails with contact, info, sales, support keywords
-                priority_keywords = ['contact', 'info', 'hello', 'support', 'sales', 'business']
                 for email in email_list:
-                    if any(keyword in email.lower() for keyword in priority_keywords):
+                    if any(keyword in email.lower() for keyword in PRIORITY_EMAIL_KEYWORDS):
                         primary_email = email
                         break
                 
@@ -220,47 +586,186 @@ class WebScraper:
                 'social_media': final_social_media
             }
 
-def scrape_company_data(company_data: Dict) -> Dict:
-    """Enhance company data with scraped information"""
-    scraper = WebScraper()
+class HostSlots:
+    """Caps how many scrapes may run against the same host at once"""
+    def __init__(self, per_host_limit: int = SCRAPE_PER_HOST_LIMIT):
+        self.per_host_limit = max(1, per_host_limit)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+
+    def for_url(self, url: str) -> threading.Semaphore:
+        key = host_key(url)
+        with self._lock:
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._semaphores[key]
+
+
+_scrape_cache = None
+_scrape_cache_lock = threading.Lock()
+
+def get_scrape_cache() -> Optional[SQLiteCache]:
+    """Get or create the shared scrape-result cache (None if disabled)"""
+    global _scrape_cache
+    if not SCRAPE_CACHE_ENABLED:
+        return None
+    with _scrape_cache_lock:
+        if _scrape_cache is None:
+            _scrape_cache = SQLiteCache(
+                'scrape_results',
+                ttl=SCRAPE_CACHE_TTL,
+                max_entries=SCRAPE_CACHE_MAX_ENTRIES,
+                max_bytes=SCRAPE_CACHE_MAX_BYTES
+            )
+    return _scrape_cache
+
+
+def merge_scraped_data(company: Dict, scraped_data: Dict) -> Dict:
+    """Merge the result of WebScraper.scrape_website into a company dict"""
+    # Store LLM email as separate field before overwriting
+    if company.get('contact_email'):
+        company['contact_email_llm'] = company['contact_email']
     
-    for company in company_data.get('companies', []):
-        website_url = company.get('website_url')
-        
-        if website_url:
-            scraped_data = scraper.scrape_website(website_url)
-            
-            # Store LLM email as separate field before overwriting
-            if company.get('contact_email'):
-                company['contact_email_llm'] = company['contact_email']
-            
-            # Update contact email with scraped data (prioritize scraped as it's real-time)
-            if scraped_data['contact_email']:
-                company['contact_email'] = scraped_data['contact_email']
-            
-            # Store all emails found
-            company['additional_emails'] = scraped_data['all_emails']
-            
-            # Keep LLM social media in original field
-            # Add scraped social media as verified/real-time data
-            if scraped_data['social_media']:
-                company['social_media_scraped'] = {}
-                for platform, url in scraped_data['social_media'].items():
-                    if url:
-                        company['social_media_scraped'][platform] = url
-            
-            # Also fill in missing LLM social media with scraped data
-            for platform, url in scraped_data['social_media'].items():
-                if url and (not company.get('social_media', {}).get(platform)):
-                    if 'social_media' not in company:
-                        company['social_media'] = {}
-                    company['social_media'][platform] = url
-            
-            # Small delay between companies
-            time.sleep(2)
+    # Update contact email with scraped data (prioritize scraped as it's real-time)
+    if scraped_data['contact_email']:
+        company['contact_email'] = scraped_data['contact_email']
+    
+    # Store all emails found
+    company['additional_emails'] = scraped_data['all_emails']
+    
+    # Keep LLM social media in original field
+    # Add scraped social media as verified/real-time data
+    if scraped_data['social_media']:
+        company['social_media_scraped'] = {}
+        for platform, url in scraped_data['social_media'].items():
+            if url:
+                company['social_media_scraped'][platform] = url
+    
+    # Also fill in missing LLM social media with scraped data
+    for platform, url in scraped_data['social_media'].items():
+        if url and (not company.get('social_media', {}).get(platform)):
+            if 'social_media' not in company:
+                company['social_media'] = {}
+            company['social_media'][platform] = url
+    
+    return company
+
+
+def _scrape_with_slots(host_slots: HostSlots, fetcher, website_url: str) -> Dict:
+    # WebScraper keeps per-site state (visited_urls), so one per company
+    with host_slots.for_url(website_url):
+        return WebScraper(fetcher).scrape_website(website_url)
+
+
+def scrape_company_data(
+    company_data: Dict,
+    max_workers: int = SCRAPE_MAX_WORKERS,
+    per_host_limit: int = SCRAPE_PER_HOST_LIMIT,
+    fetcher=None,
+    on_progress: Optional[Callable[[Dict, bool], None]] = None
+) -> Dict:
+    """
+    Enhance company data with scraped information.
+    
+    Websites are scraped concurrently: at most `max_workers` sites at once and
+    at most `per_host_limit` at once for any single host, so total latency
+    tracks the slowest site rather than the sum of all of them. All scrapers
+    share one pooled `fetcher` (defaults to http_fetcher.get_fetcher()).
+    
+    on_progress(company, ok) is called from the calling thread as each
+    website finishes; ok is False if scraping it raised.
+    """
+    companies = [c for c in company_data.get('companies', []) if c.get('website_url')]
+    if not companies:
+        return company_data
+    
+    host_slots = HostSlots(per_host_limit)
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(companies)))) as pool:
+        futures = {pool.submit(_scrape_with_slots, host_slots, fetcher, c['website_url']): c for c in companies}
+        for future in as_completed(futures):
+            company = futures[future]
+            try:
+                scraped_data = future.result()
+            except Exception as e:
+                print(f"  - Error scraping {company['website_url']}: {str(e)}")
+                if on_progress:
+                    on_progress(company, False)
+                continue
+            merge_scraped_data(company, scraped_data)
+            if on_progress:
+                on_progress(company, True)
     
     return company_data
 
+
+async def scrape_company_stream(
+    companies: AsyncIterable[Dict],
+    enable_scraping: bool = True,
+    max_workers: int = SCRAPE_MAX_WORKERS,
+    per_host_limit: int = SCRAPE_PER_HOST_LIMIT,
+    fetcher=None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Scrape companies as they arrive from an async source (e.g. GeminiClient.stream_companies).
+    
+    Yields (event, company) pairs in completion order:
+    - ('company', company): as soon as a company arrives, before scraping
+    - ('enriched', company): once its website was scraped and merged in
+    - ('scrape_failed', company): if scraping raised
+    
+    Scrapes run on a thread pool with the same global and per-host caps as
+    scrape_company_data, and start while later companies are still being
+    generated. Errors from the source are re-raised after in-flight scrapes finish.
+    """
+    loop = asyncio.get_running_loop()
+    host_slots = HostSlots(per_host_limit)
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    events: asyncio.Queue = asyncio.Queue()
+    pending = set()
+    source_error = []
+    
+    async def enrich(company: Dict):
+        try:
+            scraped_data = await loop.run_in_executor(
+                pool, _scrape_with_slots, host_slots, fetcher, company['website_url']
+            )
+            merge_scraped_data(company, scraped_data)
+            await events.put(('enriched', company))
+        except Exception as e:
+            print(f"  - Error scraping {company['website_url']}: {str(e)}")
+            await events.put(('scrape_failed', company))
+    
+    async def consume():
+        try:
+            async for company in companies:
+                await events.put(('company', company))
+                if enable_scraping and company.get('website_url'):
+                    task = asyncio.ensure_future(enrich(company))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+        except Exception as e:
+            source_error.append(e)
+        finally:
+            if pending:
+                await asyncio.wait(set(pending))
+            await events.put(None)
+    
+    producer = asyncio.ensure_future(consume())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        if source_error:
+            raise source_error[0]
+    finally:
+        producer.cancel()
+        for task in list(pending):
+            task.cancel()
+        pool.shutdown(wait=False)
+
 if __name__ == '__main__':
     # Example usage
     scraper = WebScraper()
@@ -0,0 +1,220 @@
+"""
+Lead Generation Worker
+Runs async lead generation jobs outside the API process. The parent process
+claims jobs from the shared job store (see job_store.py) and runs them in a
+process pool, so LLM calls and scraping never compete with request handling.
+
+Run the API in enqueue-only mode and scale workers separately:
+    JOB_WORKERS=0 uvicorn api:app --workers 4
+    python -m worker                       # one process per core
+    python -m worker --processes 8
+
+Both sides must share the job store: the same SQLite file on one host, or
+JOB_STORE_BACKEND=redis across hosts.
+
+SIGTERM/SIGINT drains the worker: it stops claiming jobs and waits for the
+running ones; a second signal (or --drain-timeout) kills the pool processes,
+hands their unfinished jobs back to the queue and exits.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict
+
+from job_store import JOB_STORE_BACKEND, JobProgress, get_job_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('worker')
+
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', str(os.cpu_count() or 1)))
+WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '1'))
+WORKER_REPORT_INTERVAL = float(os.getenv('WORKER_REPORT_INTERVAL', '60'))
+# Seconds to wait for running jobs on shutdown (0 waits until they finish)
+WORKER_DRAIN_TIMEOUT = float(os.getenv('WORKER_DRAIN_TIMEOUT', '0'))
+
+
+def process_job(job: Dict) -> Dict:
+    """Run one claimed job in a pool process and store its outcome"""
+    # Imported here so the parent process never loads the LLM client or scraper
+    from lead_generation import generate_leads_sync
+
+    store = get_job_store()
+    params = job['params']
+    # Writes only land while this worker still holds the job (see job_store)
+    owner = job['worker_id']
+    start = time.time()
+    try:
+        result = generate_leads_sync(
+            params['industry'],
+            params['number'],
+            params['country'],
+            params['enable_web_scraping'],
+            JobProgress(store, job['job_id'], owner=owner)
+        )
+        stored = store.update(job['job_id'], owner=owner, status='completed',
+                              completed_at=datetime.utcnow().isoformat(), result=result)
+        status = 'completed'
+    except Exception as e:
+        stored = store.update(job['job_id'], owner=owner, status='failed',
+                              completed_at=datetime.utcnow().isoformat(), error=str(e))
+        status = 'failed'
+    if not stored:
+        logger.warning(f"Job {job['job_id']} was handed to another worker, dropping this run's {status} result")
+    return {'job_id': job['job_id'], 'status': status, 'pid': os.getpid(), 'seconds': time.time() - start}
+
+
+def _ignore_signals():
+    # Pool processes finish their job; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class ThroughputReport:
+    """Jobs and busy time per pool process"""
+    def __init__(self):
+        self.started = time.time()
+        self.per_process: Dict[int, Dict] = {}
+
+    def record(self, outcome: Dict):
+        stats = self.per_process.setdefault(outcome['pid'], {'completed': 0, 'failed': 0, 'busy_seconds': 0.0})
+        stats[outcome['status']] += 1
+        stats['busy_seconds'] += outcome['seconds']
+
+    def log(self):
+        elapsed_minutes = max(time.time() - self.started, 1e-9) / 60
+        total = 0
+        for pid, stats in sorted(self.per_process.items()):
+            jobs = stats['completed'] + stats['failed']
+            total += jobs
+            logger.info(
+                f"  process {pid}: {jobs} jobs ({stats['failed']} failed), "
+                f"{jobs / elapsed_minutes:.2f} jobs/min, "
+                f"{stats['busy_seconds'] / max(jobs, 1):.1f}s per job"
+            )
+        logger.info(f"📊 Throughput: {total} jobs, {total / elapsed_minutes:.2f} jobs/min overall")
+
+
+class Worker:
+    """Claims jobs from the job store and runs them in a process pool"""
+    def __init__(self, processes: int = WORKER_PROCESSES, poll_interval: float = WORKER_POLL_INTERVAL,
+                 report_interval: float = WORKER_REPORT_INTERVAL, drain_timeout: float = WORKER_DRAIN_TIMEOUT):
+        self.processes = max(1, processes)
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        self.drain_timeout = drain_timeout
+        self.store = get_job_store()
+        self.worker_id = f"worker-{os.getpid()}"
+        self.report = ThroughputReport()
+        self.draining = threading.Event()
+        self.stopping = threading.Event()
+        self.running: Dict = {}  # future -> job_id
+
+    def handle_signal(self, signum, frame):
+        if self.draining.is_set():
+            logger.warning("Second signal received, killing running jobs")
+            self.stopping.set()
+        else:
+            logger.info(f"Draining: finishing {len(self.running)} running jobs, no new jobs will be claimed")
+            self.draining.set()
+
+    def _collect(self, timeout: float):
+        """Wait up to timeout for running jobs and record the finished ones"""
+        if not self.running:
+            return
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            job_id = self.running.pop(future)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # The pool process died; leave the job to another worker
+                logger.error(f"Job {job_id} crashed its worker process: {e}")
+                self.store.requeue(job_id, owner=self.worker_id)
+                continue
+            self.report.record(outcome)
+            logger.info(f"Job {job_id} {outcome['status']} in {outcome['seconds']:.1f}s (process {outcome['pid']})")
+
+    @staticmethod
+    def _kill_pool(pool: ProcessPoolExecutor):
+        """
+        Kill the pool processes. They ignore SIGTERM/SIGINT (see
+        _ignore_signals) and interpreter exit would wait for them, so without
+        this an abandoned job keeps running and writes its result after it
+        was handed to another worker.
+        """
+        # ProcessPoolExecutor has no public handle on its processes
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        for process in processes:
+            process.kill()
+        for process in processes:
+            process.join(timeout=10)
+
+    def run(self):
+        logger.info(f"🚀 Worker {self.worker_id}: {self.processes} processes, job store {self.store.stats()}")
+        last_report = time.time()
+        pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_ignore_signals)
+        drain_started = None
+        try:
+            while not self.stopping.is_set():
+                if self.draining.is_set():
+                    drain_started = drain_started or time.time()
+                    if not self.running:
+                        break
+                    if self.drain_timeout and time.time() - drain_started > self.drain_timeout:
+                        logger.warning(f"Drain timeout of {self.drain_timeout:.0f}s reached")
+                        break
+                elif len(self.running) < self.processes:
+                    job = self.store.claim_next(self.worker_id)
+                    if job is not None:
+                        self.running[pool.submit(process_job, job)] = job['job_id']
+                        continue
+                    if not self.running:
+                        self.draining.wait(self.poll_interval)
+                        continue
+
+                self._collect(timeout=self.poll_interval)
+
+                if time.time() - last_report >= self.report_interval:
+                    self.report.log()
+                    last_report = time.time()
+        finally:
+            if self.running:
+                self._kill_pool(pool)
+                for job_id in self.running.values():
+                    # A job that finished just before the kill keeps its result
+                    if self.store.requeue(job_id, owner=self.worker_id):
+                        logger.info(f"Returning unfinished job {job_id} to the queue")
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.report.log()
+            logger.info(f"🛑 Worker {self.worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=WORKER_PROCESSES, help='Jobs run in parallel')
+    parser.add_argument('--drain-timeout', type=float, default=WORKER_DRAIN_TIMEOUT,
+                        help='Seconds to wait for running jobs on shutdown (0 = until done)')
+    args = parser.parse_args()
+
+    if JOB_STORE_BACKEND == 'memory':
+        logger.error("JOB_STORE_BACKEND=memory is private to one process; use sqlite or redis with a separate worker")
+        sys.exit(1)
+
+    worker = Worker(processes=args.processes, drain_timeout=args.drain_timeout)
+    signal.signal(signal.SIGTERM, worker.handle_signal)
+    signal.signal(signal.SIGINT, worker.handle_signal)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()